@@ -0,0 +1,122 @@
+import datetime as dt
+import json
+from typing import Any
+
+import pytest
+from requests import Response
+
+from stpmex import Client
+from stpmex.types import Pais
+from tests.conftest import PKEY
+
+ORDEN_CONSULTADA = dict(
+    causaDevolucion=0,
+    clavePago='',
+    claveRastreo='CR1564969083',
+    conceptoPago='Transferencia FISA',
+    conceptoPago2='',
+    cuentaBeneficiario='021180063738941801',
+    cuentaBeneficiario2='',
+    cuentaOrdenante='646180102607000012',
+    empresa='TAMIZI',
+    estado='LQ',
+    fechaOperacion=20200907,
+    folioOrigen='000435414377354285915413',
+    idCliente='000435414377354285915413',
+    idEF=7838161,
+    institucionContraparte=40021,
+    institucionOperante=90646,
+    medioEntrega=3,
+    monto=1.2,
+    nombreBeneficiario='Bartolo Trujillo',
+    nombreBeneficiario2='',
+    nombreOrdenante='TAMIZI',
+    prioridad=0,
+    referenciaCobranza='',
+    referenciaNumerica=6879256,
+    rfcCurpBeneficiario='',
+    rfcCurpBeneficiario2='',
+    rfcCurpOrdenante='ND',
+    tipoCuentaBeneficiario=40,
+    tipoCuentaOrdenante=40,
+    tipoPago=1,
+    topologia='V',
+    tsCaptura=1599325894839,
+    tsLiquidacion=1599325895204,
+    usuario='tamizi',
+)
+
+
+def por_orden(benchmark: Any, num_ordenes: int) -> None:
+    """
+    Guarda el costo por orden en extra_info para comparar corridas con
+    distinto número de órdenes (pytest-benchmark --benchmark-compare)
+    """
+    benchmark.extra_info['ordenes'] = num_ordenes
+    if benchmark.stats:  # None con --benchmark-disable
+        media = benchmark.stats.stats.mean
+        benchmark.extra_info['us_por_orden'] = media / num_ordenes * 1e6
+
+
+def consulta_lst(num_ordenes: int) -> list:
+    return [
+        dict(ORDEN_CONSULTADA, claveRastreo=f'CR{i:010}')
+        for i in range(num_ordenes)
+    ]
+
+
+def consulta_body(num_ordenes: int) -> bytes:
+    resp = dict(resultado=dict(id=1, lst=consulta_lst(num_ordenes)))
+    return json.dumps(resp).encode('utf-8')
+
+
+def make_response(body: bytes, status_code: int = 200) -> Response:
+    response = Response()
+    response.status_code = status_code
+    response.headers['Content-Type'] = 'application/json'
+    response._content = body
+    return response
+
+
+@pytest.fixture(scope='session')
+def client() -> Client:
+    return Client('TAMIZI', PKEY, '12345678')
+
+
+ORDEN = dict(
+    institucionContraparte='40072',
+    monto=1.2,
+    cuentaBeneficiario='072691004495711499',
+    nombreBeneficiario='Ricardo Sanchez',
+    rfcCurpBeneficiario='ND',
+    conceptoPago='Prueba',
+    referenciaNumerica=5273144,
+    claveRastreo='CR1564969083',
+    cuentaOrdenante='646180110400000007',
+)
+
+
+@pytest.fixture(scope='session')
+def orden(client):
+    return client.ordenes(**ORDEN)
+
+
+CUENTA = dict(
+    # fija, para comparar corridas entre versiones
+    cuenta='646180157000000004',
+    nombre='Eduardo,Marco',
+    apellidoPaterno='Salvador',
+    apellidoMaterno='Hernandez-Muñoz',
+    rfcCurp='SAHE800416HDFABC01',
+    fechaNacimiento=dt.date(1980, 4, 14),
+    genero='H',
+    entidadFederativa=1,
+    actividadEconomica='30',
+    paisNacimiento=Pais.MX,
+    email='asdasd@domain.com',
+)
+
+
+@pytest.fixture(scope='session')
+def cuenta(client):
+    return client.cuentas(**CUENTA)
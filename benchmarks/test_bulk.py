@@ -0,0 +1,43 @@
+import pytest
+from pydantic import ValidationError
+
+from stpmex.bulk import valida_ordenes
+
+from .conftest import ORDEN
+
+
+def columnas_ordenes(num_ordenes: int) -> dict:
+    columnas = {campo: [valor] * num_ordenes for campo, valor in ORDEN.items()}
+    # una de cada 10 con error
+    columnas['monto'] = [
+        -1.0 if i % 10 == 0 else 1.2 for i in range(num_ordenes)
+    ]
+    return columnas
+
+
+def valida_por_fila(resource, columnas: dict, num_ordenes: int) -> list:
+    errores = []
+    for i in range(num_ordenes):
+        try:
+            resource(**{campo: col[i] for campo, col in columnas.items()})
+        except ValidationError:
+            errores.append(i)
+    return errores
+
+
+@pytest.mark.parametrize('num_ordenes', [10_000])
+def test_valida_por_fila(benchmark, client, num_ordenes):
+    benchmark.group = f'validar {num_ordenes} órdenes'
+    columnas = columnas_ordenes(num_ordenes)
+    errores = benchmark.pedantic(
+        valida_por_fila, (client.ordenes, columnas, num_ordenes), rounds=1
+    )
+    assert len(errores) == num_ordenes // 10
+
+
+@pytest.mark.parametrize('num_ordenes', [10_000, 100_000])
+def test_valida_ordenes(benchmark, num_ordenes):
+    benchmark.group = f'validar {num_ordenes} órdenes'
+    columnas = columnas_ordenes(num_ordenes)
+    resultado = benchmark(valida_ordenes, columnas)
+    assert resultado.mask.sum() == num_ordenes // 10
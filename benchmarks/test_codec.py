@@ -0,0 +1,40 @@
+import pytest
+
+from stpmex.client import _check_resp, _unwrap_resultado
+from stpmex.codec import JsonCodec, OrjsonCodec
+
+from .conftest import consulta_body, make_response
+
+NUM_ORDENES = [1_000, 10_000]
+
+
+@pytest.mark.parametrize('num_ordenes', NUM_ORDENES)
+def test_respuesta_tres_decodificaciones(benchmark, num_ordenes):
+    """
+    Referencia: como se procesaban las respuestas antes, decodificando el
+    json en _check_response (2 veces) y en request
+    """
+    response = make_response(consulta_body(num_ordenes))
+
+    def procesa():
+        response.json()
+        _check_resp(response.json())
+        return _unwrap_resultado(response.json())
+
+    benchmark.group = f'respuesta {num_ordenes}'
+    assert len(benchmark(procesa)['lst']) == num_ordenes
+
+
+@pytest.mark.parametrize('num_ordenes', NUM_ORDENES)
+@pytest.mark.parametrize(
+    'codec', [JsonCodec(), OrjsonCodec()], ids=['json', 'orjson']
+)
+def test_respuesta(benchmark, client, codec, num_ordenes):
+    client.codec = codec
+    response = make_response(consulta_body(num_ordenes))
+
+    def procesa():
+        return _unwrap_resultado(client._check_response(response))
+
+    benchmark.group = f'respuesta {num_ordenes}'
+    assert len(benchmark(procesa)['lst']) == num_ordenes
@@ -0,0 +1,18 @@
+import pytest
+
+from stpmex.resources import OrdenConsultada
+
+from .conftest import consulta_lst, por_orden
+
+
+@pytest.mark.parametrize('num_ordenes', [10_000, 100_000])
+def test_sanitize_consulta(benchmark, client, num_ordenes):
+    lst = consulta_lst(num_ordenes)
+    sanitize = client.ordenes._sanitize_consulta
+    benchmark.group = f'sanitize consulta {num_ordenes}'
+    ordenes = benchmark.pedantic(
+        lambda: [sanitize(orden) for orden in lst], rounds=5, warmup_rounds=1
+    )
+    por_orden(benchmark, num_ordenes)
+    assert len(ordenes) == num_ordenes
+    assert isinstance(ordenes[-1], OrdenConsultada)
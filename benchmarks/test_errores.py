@@ -0,0 +1,83 @@
+import pytest
+
+from stpmex.client import _check_resp
+from stpmex.exc import (
+    ClaveRastreoAlreadyInUse,
+    DuplicatedAccount,
+    PldRejected,
+    StpmexException,
+)
+
+from .conftest import make_response
+
+# del primer caso de _raise_description_error_exc al último, y los de
+# _raise_description_exc
+ERRORES = [
+    (
+        dict(
+            resultado=dict(
+                descripcionError='La clave de rastreo CR1 ya fue utilizada',
+                id=-1,
+            )
+        ),
+        ClaveRastreoAlreadyInUse,
+    ),
+    (
+        dict(
+            resultado=dict(
+                descripcionError='Orden sin cuenta ordenante. '
+                'Se rechaza por PLD',
+                id=-200,
+            )
+        ),
+        PldRejected,
+    ),
+    (
+        dict(resultado=dict(descripcionError='desconocido', id=9999)),
+        StpmexException,
+    ),
+    (dict(descripcion='Cuenta Duplicada', id=3), DuplicatedAccount),
+    (dict(descripcion='desconocido', id=9999), StpmexException),
+]
+
+
+def _excepcion(resp):
+    try:
+        _check_resp(resp)
+    except StpmexException as exc:
+        return exc
+
+
+@pytest.mark.parametrize(
+    'resp,excepcion',
+    ERRORES,
+    ids=[
+        'rastreo_duplicada',
+        'pld',
+        'error_desconocido',
+        'cuenta_duplicada',
+        'descripcion_desconocida',
+    ],
+)
+def test_check_resp_error(benchmark, resp, excepcion):
+    benchmark.group = 'mapeo de errores'
+    assert type(benchmark(_excepcion, resp)) is excepcion
+
+
+def test_check_response_error(benchmark, client):
+    resp, excepcion = ERRORES[1]
+    response = make_response(client.codec.dumps(resp))
+
+    def check():
+        try:
+            client._check_response(response)
+        except StpmexException as exc:
+            return exc
+
+    benchmark.group = 'mapeo de errores'
+    assert type(benchmark(check)) is excepcion
+
+
+def test_check_resp_ok(benchmark):
+    benchmark.group = 'mapeo de errores'
+    benchmark(_check_resp, dict(resultado=dict(id=123)))
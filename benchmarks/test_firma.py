@@ -0,0 +1,36 @@
+from enum import Enum
+
+from stpmex.auth import ORDEN_FIELDNAMES, compute_signature
+
+
+def join_fields_referencia(obj, fieldnames):
+    """
+    Referencia: join_fields antes de compile_join
+    """
+    joined_fields = []
+    for field in fieldnames:
+        value = getattr(obj, field, None)
+        if isinstance(value, float):
+            value = f'{value:.2f}'
+        elif isinstance(value, Enum) and value:
+            value = value.value
+        elif value is None:
+            value = ''
+        joined_fields.append(str(value))
+    return '||' + '|'.join(joined_fields) + '||'
+
+
+def test_cadena_original_referencia(benchmark, orden):
+    benchmark.group = 'firma de una orden'
+    cadena = benchmark(join_fields_referencia, orden, ORDEN_FIELDNAMES)
+    assert cadena == orden._cadena_original()
+
+
+def test_cadena_original(benchmark, orden):
+    benchmark.group = 'firma de una orden'
+    benchmark(orden._cadena_original)
+
+
+def test_rsa_sign(benchmark, client, orden):
+    benchmark.group = 'firma de una orden'
+    benchmark(compute_signature, client.pkey, orden._cadena_original())
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+
+MARCA = '-- stpmex --'
+
+# Presupuesto en milisegundos (-X importtime, sin el arranque de python).
+# Antes de diferir las importaciones `import stpmex` tomaba ~290 ms
+PRESUPUESTOS = {
+    'import stpmex': 20,
+    # requests y cryptography, sin pydantic ni los catálogos
+    'from stpmex import Client': 200,
+}
+
+
+def importtime(codigo: str) -> float:
+    """
+    Milisegundos que toma importar `codigo` en un proceso nuevo
+    """
+    proceso = subprocess.run(
+        [
+            sys.executable,
+            '-X',
+            'importtime',
+            '-c',
+            f'import sys; sys.stderr.write({MARCA!r} + "\\n"); {codigo}',
+        ],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    lineas = proceso.stderr.splitlines()
+    inicio = lineas.index(MARCA) + 1
+    total = 0
+    for linea in lineas[inicio:]:
+        _, acumulado, nombre = linea.split('|')
+        if not nombre.startswith('  '):  # solo los de primer nivel
+            total += int(acumulado)
+    return total / 1000
+
+
+@pytest.mark.parametrize('codigo', list(PRESUPUESTOS))
+def test_import_time(benchmark, codigo):
+    benchmark.group = 'import time'
+    benchmark.pedantic(importtime, args=(codigo,), rounds=5, warmup_rounds=1)
+    # el mínimo es el que menos ruido tiene del resto de la máquina
+    ms = min(importtime(codigo) for _ in range(3))
+    benchmark.extra_info['importtime_ms'] = ms
+    assert ms < PRESUPUESTOS[codigo]
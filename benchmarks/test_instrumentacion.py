@@ -0,0 +1,38 @@
+import pytest
+import requests_mock
+
+from stpmex import Client
+from stpmex.instrumentacion import Observer
+from stpmex.metricas import Metricas
+from tests.conftest import PKEY
+
+from .conftest import ORDEN
+
+
+@pytest.fixture
+def cliente():
+    cliente = Client('TAMIZI', PKEY, '12345678')
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        yield cliente
+
+
+def test_registra_sin_observers(benchmark, cliente):
+    """
+    Referencia: sin observers solo se revisa la lista vacía
+    """
+    benchmark.group = 'instrumentación'
+    benchmark(cliente.ordenes.registra, **ORDEN)
+
+
+def test_registra_con_observer(benchmark, cliente):
+    benchmark.group = 'instrumentación'
+    cliente.instrumentacion.agrega(Observer())
+    benchmark(cliente.ordenes.registra, **ORDEN)
+
+
+def test_registra_con_metricas(benchmark, cliente):
+    benchmark.group = 'instrumentación'
+    cliente.metricas = Metricas(cliente)
+    cliente.instrumentacion.agrega(cliente.metricas)
+    benchmark(cliente.ordenes.registra, **ORDEN)
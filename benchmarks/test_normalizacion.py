@@ -0,0 +1,70 @@
+import random
+import re
+import unicodedata
+
+import pytest
+
+from stpmex.types import _normalize, _stp_format, unicode_to_ascii
+
+NOMBRES = """
+    José María Juan Guadalupe Francisco Ana Jesús Sofía Luis Verónica Martín
+    Andrés Mónica Ramón
+""".split()
+APELLIDOS = """
+    Hernández García Martínez López González Pérez Rodríguez Sánchez Ramírez
+    Cruz Flores Gómez Muñoz Núñez Ortiz Díaz Vázquez Castillo Jiménez Peña
+""".split()
+CONCEPTOS = ['Nómina quincenal', 'Pago de nómina', 'Aguinaldo', 'Bono']
+
+
+def nombres(num: int, empleados: int = 2_000) -> list:
+    """
+    `num` nombres de una nómina de `empleados` personas, cada una se repite
+    una vez por pago. Los nombres más comunes aparecen más (zipf).
+    """
+    rnd = random.Random(0)
+    plantilla = [
+        ' '.join(
+            [
+                rnd.choice(NOMBRES),
+                APELLIDOS[min(int(rnd.paretovariate(1)) - 1, 19)],
+                rnd.choice(APELLIDOS),
+            ]
+        )
+        for _ in range(empleados)
+    ]
+    return [rnd.choice(plantilla + CONCEPTOS) for _ in range(num)]
+
+
+def normaliza_referencia(texto: str) -> str:
+    """
+    Referencia: unicode_to_ascii y StpStr.validate sin cache
+    """
+    v = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore')
+    return re.sub(r'[-,.]', ' ', v.decode('ascii')).upper()
+
+
+def normaliza(texto: str) -> str:
+    return _stp_format(unicode_to_ascii(texto))
+
+
+@pytest.fixture(scope='module')
+def textos():
+    return nombres(10_000)
+
+
+@pytest.mark.parametrize(
+    'funcion', [normaliza_referencia, normaliza], ids=['referencia', 'cache']
+)
+def test_normaliza_nombres(benchmark, textos, funcion):
+    _normalize.cache_clear()
+    _stp_format.cache_clear()
+    benchmark.group = 'normalizar 10k nombres'
+    resultado = benchmark(lambda: [funcion(texto) for texto in textos])
+    assert resultado == [normaliza_referencia(texto) for texto in textos]
+
+
+def test_normaliza_ascii(benchmark):
+    benchmark.group = 'normalizar ascii'
+    textos = [normaliza_referencia(texto) for texto in nombres(10_000)]
+    benchmark(lambda: [unicode_to_ascii(texto) for texto in textos])
@@ -0,0 +1,32 @@
+import requests_mock
+
+SALDO_XML = (
+    "<?xml version='1.0' encoding='UTF-8'?>"
+    '<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/">'
+    '<S:Body><ns0:consultaSaldoCuentaResponse '
+    'xmlns:ns0="http://h2h.integration.spei.enlacefi.lgec.com/"><return>'
+    '<cargosPendientes>0.00</cargosPendientes><saldo>10000.00</saldo>'
+    '</return></ns0:consultaSaldoCuentaResponse></S:Body></S:Envelope>'
+)
+CLABE = '646180157000000004'
+
+
+def test_parse_saldo(benchmark, client):
+    benchmark.group = 'consulta de saldo'
+    assert benchmark(client.saldos._parse_saldo, SALDO_XML) == 10000.0
+
+
+def test_soap_consulta(benchmark, client):
+    benchmark.group = 'consulta de saldo'
+    benchmark(client.saldos._soap_consulta, CLABE)
+
+
+def test_consulta(benchmark, client):
+    """
+    Incluye el transporte de requests_mock, sirve para ver qué tanto pesa
+    el parseo del XML en la consulta completa
+    """
+    benchmark.group = 'consulta de saldo'
+    with requests_mock.mock() as m:
+        m.post(client.soap_url, text=SALDO_XML)
+        assert benchmark(client.saldos.consulta, CLABE) == 10000.0
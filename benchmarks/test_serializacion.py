@@ -0,0 +1,52 @@
+import datetime as dt
+from dataclasses import asdict
+
+import pytest
+
+from stpmex.utils import strftime
+
+FIRMA = 'firma'
+
+
+def to_dict_referencia(resource, firma):
+    """
+    Referencia: Resource.to_dict con dataclasses.asdict
+    """
+    base = dict()
+    for k, v in asdict(resource).items():
+        if isinstance(v, dt.date):
+            base[k] = strftime(v)
+        elif v is not None:
+            base[k] = v
+    firma = firma or resource.firma
+    return {**base, **dict(firma=firma, empresa=resource.empresa)}
+
+
+@pytest.fixture(params=['orden', 'cuenta'])
+def resource(request):
+    return request.getfixturevalue(request.param)
+
+
+def test_to_dict_referencia(benchmark, resource):
+    benchmark.group = f'to_dict {type(resource).__name__}'
+    datos = benchmark(to_dict_referencia, resource, FIRMA)
+    assert datos == resource.to_dict(FIRMA)
+
+
+def test_to_dict(benchmark, resource):
+    benchmark.group = f'to_dict {type(resource).__name__}'
+    benchmark(resource.to_dict, FIRMA)
+
+
+def test_to_dict_firmado(benchmark, resource):
+    """
+    to_dict completo: cadena original, firma RSA y payload
+    """
+    benchmark.group = f'to_dict firmado {type(resource).__name__}'
+    benchmark(resource.to_dict)
+
+
+def test_to_dict_cadena_original(benchmark, resource):
+    benchmark.group = f'to_dict firmado {type(resource).__name__}'
+    cadena = resource._cadena_original()
+    benchmark(resource.to_dict, cadena_original=cadena)
@@ -0,0 +1,12 @@
+from .conftest import ORDEN
+
+
+def test_orden(benchmark, client):
+    benchmark.group = 'crear orden'
+    benchmark(client.ordenes, **ORDEN)
+
+
+def test_orden_from_trusted(benchmark, client):
+    benchmark.group = 'crear orden'
+    orden = benchmark(client.ordenes.from_trusted, **ORDEN)
+    assert orden == client.ordenes(**ORDEN)
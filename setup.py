@@ -10,6 +10,12 @@ install_requires = [
     'requests>=2.24,<2.26',
 ]
 
+extras_require = {
+    'async': ['httpx>=0.18,<1.0'],  # AsyncClient
+    'orjson': ['orjson>=3.0'],  # stpmex.codec.OrjsonCodec
+    'numpy': ['numpy>=1.17'],  # stpmex.bulk
+}
+
 
 with open('README.md', 'r') as f:
     long_description = f.read()
@@ -28,6 +34,7 @@ setup(
     package_data=dict(stpmex=['py.typed']),
     python_requires='>=3.6',
     install_requires=install_requires,
+    extras_require=extras_require,
     classifiers=[
         'Programming Language :: Python :: 3',
         'Programming Language :: Python :: 3.6',
@@ -1,4 +1,7 @@
-__all__ = ['__version__', 'Client']
+__all__ = ['__version__', 'AsyncClient', 'Client']
 
-from .client import Client
+from .lazy import lazy_imports
 from .version import __version__
+
+# el cliente importa requests y cryptography, solo se cargan al usarlo
+lazy_imports(globals(), {'AsyncClient': '.client', 'Client': '.client'})
@@ -1,9 +1,28 @@
-from base64 import b64encode
+import hashlib
+import threading
+from base64 import b64decode, b64encode
+from collections import OrderedDict
 from enum import Enum
-from typing import List
+from functools import lru_cache
+from operator import attrgetter
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Tuple,
+)
 
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.asymmetric.rsa import (
+    RSAPrivateKey,
+    RSAPublicKey,
+)
 from cryptography.hazmat.primitives.hashes import SHA256
 
 CUENTA_FIELDNAMES = """
@@ -52,18 +71,74 @@ ORDEN_FIELDNAMES = """
 SIGN_DIGEST = 'RSA-SHA256'
 
 
-def join_fields(obj: 'Resource', fieldnames: List[str]) -> bytes:  # noqa: F821
-    joined_fields = []
-    for field in fieldnames:
-        value = getattr(obj, field, None)
-        if isinstance(value, float):
-            value = f'{value:.2f}'
-        elif isinstance(value, Enum) and value:
-            value = value.value
-        elif value is None:
-            value = ''
-        joined_fields.append(str(value))
-    return '||' + '|'.join(joined_fields) + '||'
+def join_fields(obj: 'Resource', fieldnames: List[str]) -> str:  # noqa: F821
+    return compile_join(tuple(fieldnames))(obj)
+
+
+@lru_cache(maxsize=None)
+def compile_join(
+    fieldnames: Tuple[str, ...], ausentes: FrozenSet[str] = frozenset()
+) -> Callable[[Any], str]:
+    """
+    Función que arma la cadena original `||campo1|campo2|...||` de un
+    objeto. Los campos se leen con un solo attrgetter, cada valor se
+    formatea según su tipo (ver _formatter) y los `ausentes`, que la clase
+    no tiene, ya van vacíos en el template.
+    """
+    presentes = [field for field in fieldnames if field not in ausentes]
+    template = '|'.join(
+        '' if field in ausentes else '{}' for field in fieldnames
+    )
+    template = f'||{template}||'
+    getter = attrgetter(*presentes, '__class__')
+    formatters = _FORMATTERS
+
+    def join(obj: Any) -> str:
+        try:
+            values = getter(obj)[:-1]
+        except AttributeError:
+            values = [getattr(obj, field, None) for field in presentes]
+        try:
+            return template.format(*[formatters[type(v)](v) for v in values])
+        except KeyError:
+            for value in values:
+                _formatter(type(value))
+            return join(obj)
+
+    return join
+
+
+def _format_float(value: float) -> str:
+    return f'{value:.2f}'
+
+
+def _format_enum(value: Enum) -> str:
+    return str(value.value) if value else str(value)
+
+
+def _format_none(value: None) -> str:
+    return ''
+
+
+_FORMATTERS: Dict[type, Callable[[Any], str]] = {
+    str: str,
+    int: str,
+    float: _format_float,
+    type(None): _format_none,
+}
+
+
+def _formatter(cls: type) -> Callable[[Any], str]:
+    if cls in _FORMATTERS:
+        return _FORMATTERS[cls]
+    if issubclass(cls, float):
+        formatter = _format_float
+    elif issubclass(cls, Enum):
+        formatter = _format_enum
+    else:
+        formatter = str
+    _FORMATTERS[cls] = formatter
+    return formatter
 
 
 def compute_signature(pkey: RSAPrivateKey, text: str) -> str:
@@ -73,3 +148,117 @@ def compute_signature(pkey: RSAPrivateKey, text: str) -> str:
         SHA256(),
     )
     return b64encode(signature).decode('ascii')
+
+
+def verify_signature(public_key: RSAPublicKey, text: str, firma: str) -> bool:
+    try:
+        public_key.verify(
+            b64decode(firma),
+            text.encode('utf-8'),
+            padding.PKCS1v15(),
+            SHA256(),
+        )
+    except (InvalidSignature, ValueError):  # ValueError: base64 inválido
+        return False
+    return True
+
+
+def cadena_consulta(empresa: str, consulta: Dict[str, Any]) -> str:
+    """
+    Cadena original de las consultas de órdenes y saldos
+    """
+    return (
+        f"|||"
+        f"{empresa}|"
+        f"{consulta.get('fechaOperacion', '')}||"
+        f"{consulta.get('claveRastreo', '')}|"
+        f"{consulta.get('institucionOperante', '')}"
+        f"||||||||||||||||||||||||||||||"
+    )
+
+
+def key_fingerprint(pkey: RSAPrivateKey) -> str:
+    public_key = pkey.public_key().public_bytes(
+        serialization.Encoding.DER,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return hashlib.sha256(public_key).hexdigest()
+
+
+class SignatureCache:
+    """
+    LRU de firmas por (huella de la llave, texto firmado). Las firmas
+    PKCS#1 v1.5 son deterministas, así que las consultas que se repiten
+    (recibidas del día, saldos) no necesitan volver a firmarse.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._firmas: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute_signature(
+        self,
+        signer: 'stpmex.signers.Signer',  # noqa: F821
+        text: str,
+        sign: Optional[Callable[[str], str]] = None,
+    ) -> str:
+        """
+        sign reemplaza a signer.sign en los fallos, e.g. Client.sign para
+        contar la firma
+        """
+        key = (signer.fingerprint, text)
+        firma = self._busca(key)
+        if firma is None:
+            firma = (sign or signer.sign)(text)
+            self._guarda(key, firma)
+        return firma
+
+    async def compute_signature_async(
+        self,
+        signer: 'stpmex.signers.Signer',  # noqa: F821
+        text: str,
+        sign_async: Optional[Callable[[str], Awaitable[str]]] = None,
+    ) -> str:
+        """
+        Igual que compute_signature pero firma con signer.sign_async, para
+        no bloquear el event loop
+        """
+        key = (signer.fingerprint, text)
+        firma = self._busca(key)
+        if firma is None:
+            firma = await (sign_async or signer.sign_async)(text)
+            self._guarda(key, firma)
+        return firma
+
+    def _busca(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            try:
+                firma = self._firmas[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._firmas.move_to_end(key)
+            self.hits += 1
+        return firma
+
+    def _guarda(self, key: Tuple[str, str], firma: str) -> None:
+        with self._lock:
+            self._firmas[key] = firma
+            while len(self._firmas) > self.maxsize:
+                self._firmas.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            size=len(self._firmas),
+            maxsize=self.maxsize,
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._firmas.clear()
+            self.hits = self.misses = 0
@@ -0,0 +1,449 @@
+"""
+Validación de lotes completos con NumPy, e.g. archivos con miles de órdenes
+o cuentas, sin crear un objeto de pydantic por fila. Recibe las columnas
+(un dict de listas, un pandas.DataFrame, etc.) y regresa qué filas tienen
+errores con los mismos mensajes que dan los validadores de Orden y
+CuentaFisica:
+
+resultado = valida_ordenes(columnas)
+resultado.mask  # np.ndarray de bool, True en las filas con error
+resultado.mensajes()  # {fila: ['cuentaBeneficiario: ...', ...]}
+
+Las filas válidas se pueden crear después con Orden.from_trusted. Requiere
+numpy: `pip install stpmex[numpy]`
+"""
+from typing import Any, Dict, List, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from .instituciones import Catalogo, catalogo
+from .paises import Pais
+
+Columnas = Mapping[str, Sequence[Any]]
+Mensaje = Union[str, np.ndarray]
+
+CLABE_WEIGHTS = np.array([3, 7, 1, 3, 7, 1, 3, 7, 1, 3, 7, 1, 3, 7, 1, 3, 7])
+CURP_LETRAS = [0, 1, 2, 3, 10, 11, 12, 13, 14, 15]
+CURP_DIGITOS = [4, 5, 6, 7, 8, 9, 17]
+REQUIRED = 'field required'
+NOT_DIGITS = 'value is not all digits'
+
+
+class ResultadoValidacion:
+    """
+    Errores por campo de un lote de `n` filas. Cada error es una máscara
+    de las filas que lo tienen y su mensaje (o un arreglo con el mensaje
+    de cada fila).
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self._errores: List[Tuple[str, np.ndarray, Mensaje]] = []
+
+    def _agrega(self, campo: str, mask: np.ndarray, mensaje: Mensaje) -> None:
+        if mask.any():
+            self._errores.append((campo, mask, mensaje))
+
+    @property
+    def mask(self) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool)
+        for _, error, _ in self._errores:
+            mask |= error
+        return mask
+
+    @property
+    def validas(self) -> np.ndarray:
+        return ~self.mask
+
+    def errores(self, fila: int) -> List[Tuple[str, str]]:
+        """
+        (campo, mensaje) de cada error de la fila
+        """
+        return [
+            (campo, mensaje if isinstance(mensaje, str) else mensaje[fila])
+            for campo, mask, mensaje in self._errores
+            if mask[fila]
+        ]
+
+    def mensajes(self) -> Dict[int, List[str]]:
+        return {
+            int(fila): [
+                f'{campo}: {mensaje}' for campo, mensaje in self.errores(fila)
+            ]
+            for fila in np.flatnonzero(self.mask)
+        }
+
+
+def valida_ordenes(columnas: Columnas) -> ResultadoValidacion:
+    """
+    Mismas reglas que stpmex.resources.Orden
+    """
+    n = _num_filas(columnas)
+    resultado = ResultadoValidacion(n)
+    instituciones = catalogo()
+
+    _valida_monto(resultado, columnas, n)
+    for campo in ['conceptoPago', 'nombreBeneficiario']:
+        _valida_str(resultado, campo, *_texto(columnas, campo, n), True)
+    _valida_str(
+        resultado, 'nombreOrdenante', *_texto(columnas, 'nombreOrdenante', n)
+    )
+
+    texto, presente = _texto(columnas, 'cuentaBeneficiario', n)
+    _valida_requerido(resultado, 'cuentaBeneficiario', presente)
+    _valida_cuenta_beneficiario(resultado, texto, presente, instituciones)
+
+    texto, presente = _texto(columnas, 'cuentaOrdenante', n)
+    _valida_requerido(resultado, 'cuentaOrdenante', presente)
+    _valida_clabe(resultado, 'cuentaOrdenante', texto, presente, instituciones)
+
+    texto, presente = _texto(columnas, 'institucionContraparte', n)
+    _valida_requerido(resultado, 'institucionContraparte', presente)
+    digitos = _valida_digitos(
+        resultado, 'institucionContraparte', texto, presente, 5
+    )
+    codigos = np.array(list(instituciones.codigos))
+    no_banco = digitos & ~np.isin(texto, codigos)
+    mensajes = np.char.add(texto, ' no se corresponde a un banco')
+    resultado._agrega('institucionContraparte', no_banco, mensajes)
+
+    texto, presente = _texto(columnas, 'institucionOperante', n)
+    _valida_digitos(resultado, 'institucionOperante', texto, presente, 5)
+
+    for campo in ['rfcCurpBeneficiario', 'rfcCurpOrdenante']:
+        texto, presente = _texto(columnas, campo, n, strip=False)
+        _valida_longitud(resultado, campo, texto, presente, None, 18)
+
+    _valida_referencia_numerica(resultado, columnas, n)
+    return resultado
+
+
+def valida_cuentas(columnas: Columnas) -> ResultadoValidacion:
+    """
+    Mismas reglas que stpmex.resources.CuentaFisica
+    """
+    n = _num_filas(columnas)
+    resultado = ResultadoValidacion(n)
+
+    texto, presente = _texto(columnas, 'cuenta', n)
+    _valida_requerido(resultado, 'cuenta', presente)
+    _valida_clabe(resultado, 'cuenta', texto, presente, catalogo())
+
+    texto, presente = _texto(columnas, 'rfcCurp', n, strip=False)
+    _valida_requerido(resultado, 'rfcCurp', presente)
+    _valida_rfc_curp(resultado, texto, presente)
+
+    for campo in ['nombre', 'apellidoPaterno']:
+        _valida_str(resultado, campo, *_texto(columnas, campo, n), True)
+    _valida_str(
+        resultado, 'apellidoMaterno', *_texto(columnas, 'apellidoMaterno', n)
+    )
+
+    _, presente = _texto(columnas, 'fechaNacimiento', n)
+    _valida_requerido(resultado, 'fechaNacimiento', presente)
+
+    valores, presente = _valores(columnas, 'paisNacimiento', n)
+    _valida_requerido(resultado, 'paisNacimiento', presente)
+    paises = [pais.value for pais in Pais] + list(Pais)
+    valido = ~presente | np.isin(valores, np.array(paises, dtype=object))
+    permitidos = ', '.join(repr(pais.value) for pais in Pais)
+    resultado._agrega(
+        'paisNacimiento',
+        ~valido,
+        f'value is not a valid enumeration member; permitted: {permitidos}',
+    )
+
+    texto, presente = _texto(columnas, 'cp', n)
+    _valida_digitos(resultado, 'cp', texto, presente, 5)
+    texto, presente = _texto(columnas, 'email', n, strip=False)
+    _valida_longitud(resultado, 'email', texto, presente, None, 150)
+    return resultado
+
+
+def _num_filas(columnas: Columnas) -> int:
+    # len de cada columna por nombre, DataFrame.values no es un método
+    longitudes = {len(columnas[campo]) for campo in columnas}
+    if len(longitudes) > 1:
+        raise ValueError(
+            'Todas las columnas deben tener el mismo número de filas'
+        )
+    return longitudes.pop() if longitudes else 0
+
+
+def _valores(
+    columnas: Columnas, campo: str, n: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Valores de la columna como objetos y máscara de los presentes, i.e.
+    que no son None ni NaN
+    """
+    if campo not in columnas:
+        return np.full(n, None, dtype=object), np.zeros(n, dtype=bool)
+    valores = np.empty(n, dtype=object)
+    valores[:] = list(columnas[campo])
+    presente = np.not_equal(valores, None)
+    presente &= valores == valores  # NaN
+    return valores, presente
+
+
+def _texto(
+    columnas: Columnas, campo: str, n: int, strip: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    valores, presente = _valores(columnas, campo, n)
+    texto = np.where(presente, valores, '').astype(str)
+    if strip:
+        texto = np.char.strip(texto)
+    return texto, presente
+
+
+def _digitos(texto: np.ndarray, ancho: int) -> np.ndarray:
+    """
+    Matriz (filas, ancho) con los dígitos de cadenas de `ancho` dígitos
+    """
+    codigos = np.ascontiguousarray(texto.astype(f'U{ancho}'))
+    return codigos.view(np.uint32).reshape(-1, ancho).astype(np.int64) - 48
+
+
+def _valida_requerido(
+    resultado: ResultadoValidacion, campo: str, presente: np.ndarray
+) -> None:
+    resultado._agrega(campo, ~presente, REQUIRED)
+
+
+def _valida_longitud(
+    resultado: ResultadoValidacion,
+    campo: str,
+    texto: np.ndarray,
+    presente: np.ndarray,
+    min_length: int = None,
+    max_length: int = None,
+) -> np.ndarray:
+    """
+    Regresa la máscara de las filas presentes con longitud válida
+    """
+    longitud = np.char.str_len(texto)
+    valido = presente.copy()
+    if min_length is not None:
+        corto = presente & (longitud < min_length)
+        mensaje = f'ensure this value has at least {min_length} characters'
+        resultado._agrega(campo, corto, mensaje)
+        valido &= ~corto
+    if max_length is not None:
+        largo = presente & (longitud > max_length)
+        mensaje = f'ensure this value has at most {max_length} characters'
+        resultado._agrega(campo, largo, mensaje)
+        valido &= ~largo
+    return valido
+
+
+def _valida_str(
+    resultado: ResultadoValidacion,
+    campo: str,
+    texto: np.ndarray,
+    presente: np.ndarray,
+    requerido: bool = False,
+) -> None:
+    """
+    truncated_str y truncated_stp_str: no vacíos después de strip
+    """
+    if requerido:
+        _valida_requerido(resultado, campo, presente)
+    _valida_longitud(resultado, campo, texto, presente, 1)
+
+
+def _valida_digitos(
+    resultado: ResultadoValidacion,
+    campo: str,
+    texto: np.ndarray,
+    presente: np.ndarray,
+    longitud: int,
+) -> np.ndarray:
+    valido = _valida_longitud(
+        resultado, campo, texto, presente, longitud, longitud
+    )
+    no_digitos = valido & ~np.char.isdigit(texto)
+    resultado._agrega(campo, no_digitos, NOT_DIGITS)
+    return valido & ~no_digitos
+
+
+def _valida_clabe(
+    resultado: ResultadoValidacion,
+    campo: str,
+    texto: np.ndarray,
+    presente: np.ndarray,
+    instituciones: Catalogo,
+    bloqueadas: bool = False,
+) -> None:
+    """
+    clabe.types.Clabe y, con bloqueadas, BeneficiarioClabe
+    """
+    candidatas = _valida_digitos(resultado, campo, texto, presente, 18)
+    filas = np.flatnonzero(candidatas)
+    matriz = _digitos(texto[filas], 18)
+
+    prefijos = matriz[:, 0] * 100 + matriz[:, 1] * 10 + matriz[:, 2]
+    bancos = np.full(1000, '', dtype=object)
+    for abm, banxico in instituciones.por_prefijo.items():
+        bancos[int(abm)] = banxico
+    banxico = bancos[prefijos]
+    sin_banco = banxico == ''
+    resultado._agrega(
+        campo,
+        _en_filas(resultado.n, filas, sin_banco),
+        'código de banco no es válido',
+    )
+
+    control = (
+        10 - (matriz[:, :17] * CLABE_WEIGHTS % 10).sum(axis=1) % 10
+    ) % 10
+    mal_control = ~sin_banco & (control != matriz[:, 17])
+    resultado._agrega(
+        campo,
+        _en_filas(resultado.n, filas, mal_control),
+        'clabe dígito de control no es válido',
+    )
+    if not bloqueadas:
+        return
+
+    bloqueada = (
+        ~sin_banco
+        & ~mal_control
+        & np.isin(
+            banxico, np.array(list(instituciones.bloqueadas), dtype=object)
+        )
+    )
+    mensajes = np.full(resultado.n, '', dtype=object)
+    for fila, codigo in zip(filas[bloqueada], banxico[bloqueada]):
+        mensajes[
+            fila
+        ] = f'{instituciones.nombres[codigo]} has been blocked by STP.'
+    resultado._agrega(
+        campo, _en_filas(resultado.n, filas, bloqueada), mensajes
+    )
+
+
+def _valida_cuenta_beneficiario(
+    resultado: ResultadoValidacion,
+    texto: np.ndarray,
+    presente: np.ndarray,
+    instituciones: Catalogo,
+) -> None:
+    """
+    Union[BeneficiarioClabe, PaymentCardNumber, MxPhoneNumber]. Por la
+    longitud se escoge el tipo que aplica y se dan solo sus errores.
+    """
+    campo = 'cuentaBeneficiario'
+    longitud = np.char.str_len(texto)
+    tarjeta = presente & (longitud == 16)
+    telefono = presente & (longitud == 10)
+    clabe = presente & ~tarjeta & ~telefono
+    _valida_clabe(
+        resultado, campo, texto, clabe, instituciones, bloqueadas=True
+    )
+    _valida_digitos(resultado, campo, texto, telefono, 10)
+
+    tarjeta = _valida_digitos(resultado, campo, texto, tarjeta, 16)
+    filas = np.flatnonzero(tarjeta)
+    matriz = _digitos(texto[filas], 16)
+    # Luhn: se duplican los dígitos en posiciones pares, sin el último
+    dobles = matriz[:, :15:2] * 2
+    suma = (
+        np.where(dobles > 9, dobles - 9, dobles).sum(axis=1)
+        + matriz[:, 1:15:2].sum(axis=1)
+        + matriz[:, 15]
+    )
+    no_luhn = suma % 10 != 0
+    resultado._agrega(
+        campo,
+        _en_filas(resultado.n, filas, no_luhn),
+        'card number is not luhn valid',
+    )
+
+
+def _valida_rfc_curp(
+    resultado: ResultadoValidacion, texto: np.ndarray, presente: np.ndarray
+) -> None:
+    """
+    Union[Curp, Rfc]: las de 18 caracteres deben ser CURP y el resto RFC
+    """
+    campo = 'rfcCurp'
+    longitud = np.char.str_len(texto)
+    curp = presente & (longitud == 18)
+    _valida_longitud(resultado, campo, texto, presente & ~curp, 12, 13)
+
+    filas = np.flatnonzero(curp)
+    codigos = (
+        np.ascontiguousarray(texto[filas].astype('U18'))
+        .view(np.uint32)
+        .reshape(-1, 18)
+    )
+    letras = (codigos >= ord('A')) & (codigos <= ord('Z'))
+    digitos = (codigos >= ord('0')) & (codigos <= ord('9'))
+    valida = (
+        letras[:, CURP_LETRAS].all(axis=1)
+        & digitos[:, CURP_DIGITOS].all(axis=1)
+        & (letras[:, 16] | digitos[:, 16] | (codigos[:, 16] == ord('|')))
+    )
+    resultado._agrega(
+        campo,
+        _en_filas(resultado.n, filas, ~valida),
+        'string does not match regex '
+        '"^[A-Z]{4}[0-9]{6}[A-Z]{6}[A-Z|0-9][0-9]$"',
+    )
+
+
+def _valida_monto(
+    resultado: ResultadoValidacion, columnas: Columnas, n: int
+) -> None:
+    """
+    StrictPositiveFloat: solo float, mayor a 0
+    """
+    valores, presente = _valores(columnas, 'monto', n)
+    _valida_requerido(resultado, 'monto', presente)
+    es_float = np.fromiter(
+        (isinstance(valor, float) for valor in valores), dtype=bool, count=n
+    )
+    resultado._agrega(
+        'monto', presente & ~es_float, 'value is not a valid float'
+    )
+    montos = np.where(presente & es_float, valores, 1.0).astype(float)
+    resultado._agrega(
+        'monto', montos <= 0, 'ensure this value is greater than 0'
+    )
+
+
+def _valida_referencia_numerica(
+    resultado: ResultadoValidacion, columnas: Columnas, n: int
+) -> None:
+    valores, presente = _valores(columnas, 'referenciaNumerica', n)
+    referencias = np.ones(n, dtype=np.int64)
+    es_int = np.ones(n, dtype=bool)
+    # como el int_validator de pydantic, se convierte valor por valor
+    for fila in np.flatnonzero(presente):
+        try:
+            # acotado para que quepa en int64, el rango lo revisa abajo
+            referencias[fila] = min(max(int(valores[fila]), 0), 10 ** 7)
+        except (TypeError, ValueError, OverflowError):
+            es_int[fila] = False
+    resultado._agrega(
+        'referenciaNumerica', ~es_int, 'value is not a valid integer'
+    )
+    resultado._agrega(
+        'referenciaNumerica',
+        referencias <= 0,
+        'ensure this value is greater than 0',
+    )
+    resultado._agrega(
+        'referenciaNumerica',
+        referencias >= 10 ** 7,
+        'ensure this value is less than 10000000',
+    )
+
+
+def _en_filas(n: int, filas: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Máscara de n filas a partir de la máscara de un subconjunto de filas
+    """
+    completa = np.zeros(n, dtype=bool)
+    completa[filas[mask]] = True
+    return completa
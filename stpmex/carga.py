@@ -0,0 +1,384 @@
+"""
+Generador de carga sobre el cliente. Envía órdenes, altas de cuentas y
+consultas con una concurrencia fija o a una tasa objetivo y reporta
+throughput, latencias p50/p95/p99 y errores por clase de excepción:
+
+python -m stpmex.carga --simulador --llave llave.pem --passphrase ... \\
+    --concurrencia 20 --duracion 30 --mezcla orden=8,consulta=1,cuenta=1
+
+Con --tasa las peticiones se programan a esa tasa sin esperar respuestas
+(lazo abierto) y la latencia se mide desde el momento programado, así
+que incluye la espera cuando los workers no alcanzan.
+"""
+import argparse
+import datetime as dt
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from clabe import compute_control_digit
+
+from .client import Client
+from .resources.ordenes import STP_BANK_CODE
+from .utils import ClaveRastreoGenerator
+
+CUENTA_ORDENANTE = '646180110400000007'
+PERCENTILES = (50, 95, 99)
+MEZCLA = dict(orden=1.0)
+
+ORDEN = dict(
+    institucionContraparte='40072',
+    monto=1.2,
+    cuentaBeneficiario='072691004495711499',
+    nombreBeneficiario='Ricardo Sanchez',
+    rfcCurpBeneficiario='ND',
+    conceptoPago='Prueba de carga',
+    referenciaNumerica=1,
+)
+CUENTA = dict(
+    nombre='Eduardo',
+    apellidoPaterno='Salvador',
+    rfcCurp='SAHE800416HDFABC01',
+    fechaNacimiento=dt.date(1980, 4, 14),
+    genero='H',
+    entidadFederativa=1,
+    actividadEconomica='30',
+    paisNacimiento=187,
+)
+
+
+def percentil(valores: Sequence[float], p: float) -> float:
+    """
+    Percentil por rango más cercano de `valores` ya ordenados
+    """
+    if not valores:
+        return 0.0
+    rango = max(math.ceil(p / 100 * len(valores)), 1)
+    return valores[rango - 1]
+
+
+class Resultado:
+    """
+    Latencias (segundos) de las llamadas exitosas por operación y errores
+    por clase de excepción
+    """
+
+    def __init__(self):
+        self.latencias: Dict[str, List[float]] = defaultdict(list)
+        self.errores: Dict[str, Counter] = defaultdict(Counter)
+        self.inicio = time.monotonic()
+        self.fin = self.inicio
+        self._lock = threading.Lock()
+
+    def registra(
+        self,
+        operacion: str,
+        latencia: float,
+        exc: Optional[BaseException] = None,
+    ) -> None:
+        with self._lock:
+            if exc is None:
+                self.latencias[operacion].append(latencia)
+            else:
+                self.errores[operacion][type(exc).__name__] += 1
+
+    @property
+    def duracion(self) -> float:
+        return self.fin - self.inicio
+
+    def reporte(self) -> Dict[str, Any]:
+        operaciones = {}
+        todas: List[float] = []
+        errores: Counter = Counter()
+        for operacion in sorted(set(self.latencias) | set(self.errores)):
+            latencias = sorted(self.latencias[operacion])
+            todas.extend(latencias)
+            errores.update(self.errores[operacion])
+            operaciones[operacion] = self._resumen(
+                latencias, self.errores[operacion]
+            )
+        reporte = self._resumen(sorted(todas), errores)
+        reporte['duracion'] = round(self.duracion, 3)
+        reporte['operaciones'] = operaciones
+        return reporte
+
+    def _resumen(
+        self, latencias: List[float], errores: Counter
+    ) -> Dict[str, Any]:
+        total = len(latencias) + sum(errores.values())
+        resumen = dict(
+            total=total,
+            exitosas=len(latencias),
+            throughput=round(total / self.duracion, 2) if self.duracion else 0,
+        )
+        for p in PERCENTILES:
+            resumen[f'p{p}_ms'] = round(percentil(latencias, p) * 1000, 3)
+        resumen['errores'] = dict(errores.most_common())
+        return resumen
+
+    def __str__(self) -> str:
+        reporte = self.reporte()
+        lineas = [
+            f'{reporte["total"]} llamadas en {reporte["duracion"]} s, '
+            f'{reporte["throughput"]}/s'
+        ]
+        for operacion, resumen in reporte['operaciones'].items():
+            percentiles = ' '.join(
+                f'p{p}={resumen[f"p{p}_ms"]}ms' for p in PERCENTILES
+            )
+            lineas.append(
+                f'  {operacion}: {resumen["exitosas"]}/{resumen["total"]} '
+                f'ok, {resumen["throughput"]}/s, {percentiles}'
+            )
+            for clase, num in resumen['errores'].items():
+                lineas.append(f'    {clase}: {num}')
+        return '\n'.join(lineas)
+
+
+class Carga:
+    """
+    Operaciones de la carga sobre un Client:
+
+    - orden: registra una orden con clave de rastreo nueva
+    - cuenta: alta de una cuenta física con CLABE aleatoria
+    - consulta: consulta por clave de rastreo de una orden ya registrada
+    - saldo: consulta SOAP del saldo de la cuenta ordenante
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        cuenta_ordenante: str = CUENTA_ORDENANTE,
+        prefijo: str = 'CARGA',
+        semilla: Optional[int] = None,
+    ):
+        self.client = client
+        self.cuenta_ordenante = cuenta_ordenante
+        self.claves = ClaveRastreoGenerator(prefijo)
+        self.registradas: Deque[str] = deque(maxlen=1000)
+        self.operaciones: Dict[str, Callable[[], Any]] = dict(
+            orden=self.orden,
+            cuenta=self.cuenta,
+            consulta=self.consulta,
+            saldo=self.saldo,
+        )
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+
+    def orden(self) -> None:
+        orden = self.client.ordenes.registra(
+            **ORDEN,
+            cuentaOrdenante=self.cuenta_ordenante,
+            claveRastreo=self.claves(),
+        )
+        self.registradas.append(orden.claveRastreo)
+
+    def cuenta(self) -> None:
+        with self._lock:
+            numero = f'6461801570{self._random.randrange(10 ** 7):07}'
+        cuenta = numero + compute_control_digit(numero)
+        self.client.cuentas.alta(**CUENTA, cuenta=cuenta)
+
+    def consulta(self) -> None:
+        with self._lock:
+            clave = self._random.choice(self.registradas or ['SINORDENES'])
+        self.client.ordenes.consulta_clave_rastreo(clave, STP_BANK_CODE)
+
+    def saldo(self) -> None:
+        self.client.saldos.consulta(self.cuenta_ordenante)
+
+    def ejecuta(
+        self,
+        mezcla: Mapping[str, float] = MEZCLA,
+        concurrencia: int = 10,
+        tasa: Optional[float] = None,
+        duracion: Optional[float] = None,
+        total: Optional[int] = None,
+    ) -> Resultado:
+        """
+        Corre hasta `duracion` segundos o `total` llamadas. mezcla:
+        operación -> peso. Con tasa (llamadas por segundo) las llamadas se
+        programan en lazo abierto con `concurrencia` workers, sin tasa cada
+        worker hace una llamada tras otra.
+        """
+        if duracion is None and total is None:
+            raise ValueError('Se requiere duracion o total')
+        for operacion in mezcla:
+            if operacion not in self.operaciones:
+                raise ValueError(f'Operación desconocida: {operacion}')
+        nombres, pesos = zip(*mezcla.items())
+        limite = time.monotonic() + duracion if duracion else float('inf')
+        total = total if total is not None else sys.maxsize
+        resultado = Resultado()
+        if tasa:
+            self._lazo_abierto(
+                nombres, pesos, concurrencia, tasa, limite, total, resultado
+            )
+        else:
+            self._lazo_cerrado(
+                nombres, pesos, concurrencia, limite, total, resultado
+            )
+        resultado.fin = time.monotonic()
+        return resultado
+
+    def _elige(
+        self, nombres: Tuple[str, ...], pesos: Tuple[float, ...]
+    ) -> str:
+        with self._lock:
+            return self._random.choices(nombres, pesos)[0]
+
+    def _llama(
+        self, operacion: str, inicio: float, resultado: Resultado
+    ) -> None:
+        try:
+            self.operaciones[operacion]()
+        except Exception as exc:
+            resultado.registra(operacion, time.monotonic() - inicio, exc)
+        else:
+            resultado.registra(operacion, time.monotonic() - inicio)
+
+    def _lazo_cerrado(
+        self,
+        nombres: Tuple[str, ...],
+        pesos: Tuple[float, ...],
+        concurrencia: int,
+        limite: float,
+        total: int,
+        resultado: Resultado,
+    ) -> None:
+        llamadas = iter(range(total))
+
+        def worker() -> None:
+            # next() sobre range_iterator es atómico con el GIL
+            while next(llamadas, None) is not None:
+                inicio = time.monotonic()
+                if inicio >= limite:
+                    return
+                self._llama(self._elige(nombres, pesos), inicio, resultado)
+
+        workers = [
+            threading.Thread(target=worker) for _ in range(concurrencia)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    def _lazo_abierto(
+        self,
+        nombres: Tuple[str, ...],
+        pesos: Tuple[float, ...],
+        concurrencia: int,
+        tasa: float,
+        limite: float,
+        total: int,
+        resultado: Resultado,
+    ) -> None:
+        inicio = time.monotonic()
+        with ThreadPoolExecutor(concurrencia) as pool:
+            for i in range(total):
+                programada = inicio + i / tasa
+                if programada >= limite:
+                    break
+                time.sleep(max(programada - time.monotonic(), 0))
+                operacion = self._elige(nombres, pesos)
+                pool.submit(self._llama, operacion, programada, resultado)
+
+
+def _mezcla(valor: str) -> Dict[str, float]:
+    mezcla = {}
+    for parte in valor.split(','):
+        operacion, _, peso = parte.partition('=')
+        mezcla[operacion.strip()] = float(peso or 1)
+    return mezcla
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Resultado:
+    parser = argparse.ArgumentParser(description='Generador de carga')
+    parser.add_argument('--empresa', default='TAMIZI')
+    parser.add_argument('--llave', required=True, help='llave privada PEM')
+    parser.add_argument('--passphrase', help='si la llave está cifrada')
+    parser.add_argument('--base-url', help='requerido sin --simulador')
+    parser.add_argument('--soap-url')
+    parser.add_argument(
+        '--simulador',
+        action='store_true',
+        help='levanta un stpmex.simulador local con la llave',
+    )
+    parser.add_argument('--cuenta-ordenante', default=CUENTA_ORDENANTE)
+    parser.add_argument('--mezcla', type=_mezcla, default=MEZCLA)
+    parser.add_argument('--concurrencia', type=int, default=10)
+    parser.add_argument('--tasa', type=float)
+    parser.add_argument('--duracion', type=float)
+    parser.add_argument('--total', type=int)
+    parser.add_argument('--semilla', type=int)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    if args.duracion is None and args.total is None:
+        parser.error('se requiere --duracion o --total')
+    # sin base_url el cliente usaría producción
+    if args.base_url is None and not args.simulador:
+        parser.error('se requiere --base-url o --simulador')
+
+    with open(args.llave) as f:
+        priv_key = f.read()
+    client = Client(
+        args.empresa,
+        priv_key,
+        args.passphrase,
+        base_url=args.base_url,
+        soap_url=args.soap_url,
+        pool_maxsize=args.concurrencia,
+        session_per_thread=True,
+    )
+    servidor = None
+    if args.simulador:
+        from .simulador import Simulador, SimuladorServer
+
+        simulador = Simulador(
+            client.pkey.public_key(),
+            saldos={args.cuenta_ordenante: 10.0 ** 12},
+        )
+        servidor = SimuladorServer(simulador)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        client.base_url = servidor.base_url
+        client.soap_url = servidor.soap_url
+
+    carga = Carga(client, args.cuenta_ordenante, semilla=args.semilla)
+    try:
+        resultado = carga.ejecuta(
+            args.mezcla,
+            args.concurrencia,
+            args.tasa,
+            args.duracion,
+            args.total,
+        )
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+            servidor.server_close()
+    if args.json:
+        print(json.dumps(resultado.reporte(), indent=2))
+    else:
+        print(resultado)
+    return resultado
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -1,11 +1,25 @@
 import re
-from typing import Any, ClassVar, Dict, List, NoReturn, Union
+import threading
+from importlib import import_module
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NoReturn,
+    Optional,
+    Type,
+    Union,
+)
 
-from cryptography.exceptions import UnsupportedAlgorithm
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import serialization
 from requests import Response, Session
+from requests.adapters import DEFAULT_POOLBLOCK, DEFAULT_POOLSIZE, HTTPAdapter
 
+from .auth import SignatureCache
+from .codec import JsonCodec, default_codec
 from .exc import (
     AccountDoesNotExist,
     BankCodeClabeMismatch,
@@ -15,7 +29,6 @@ from .exc import (
     InvalidAmount,
     InvalidField,
     InvalidInstitution,
-    InvalidPassphrase,
     InvalidRfcOrCurp,
     InvalidTrackingKey,
     MandatoryField,
@@ -26,57 +39,278 @@ from .exc import (
     SignatureValidationError,
     StpmexException,
 )
-from .resources import CuentaFisica, Orden, Resource, Saldo
+from .instrumentacion import Instrumentacion, Observer, actual, fase
+from .metricas import Metricas
+from .middleware import Middleware, Peticion, encadena
+from .signers import BulkSigner, RsaSigner, Signer
+from .streaming import JsonArrayStream
 from .version import __version__ as client_version
 
+if TYPE_CHECKING:
+    from .resources import CuentaFisica, Orden, Saldo
+    from .resources.consultas import RecibidasCache
+
 DEMO_HOST = 'https://demo.stpmex.com:7024'
 PROD_HOST = 'https://prod.stpmex.com'
+USER_AGENT = f'stpmex-python/{client_version}'
+STREAM_CHUNK_SIZE = 64 * 1024
+JSON_HEADERS = {'Content-Type': 'application/json'}
+_lazy_lock = threading.Lock()
+
+
+class LazyResource:
+    """
+    El recurso se importa y se liga al cliente la primera vez que se usa,
+    así un cliente que solo consulta saldos no carga cuentas ni órdenes
+    """
+
+    def __init__(self, modulo: str, nombre: str):
+        self.modulo = modulo
+        self.nombre = nombre
+
+    def __set_name__(self, owner: type, attr: str) -> None:
+        self.attr = attr
+
+    def __get__(self, client: Optional['BaseClient'], owner: type) -> Any:
+        resource = getattr(
+            import_module(self.modulo, __package__), self.nombre
+        )
+        if client is None:
+            return resource
+        with _lazy_lock:
+            # otro thread pudo ligarlo mientras esperábamos
+            bound = client.__dict__.get(self.attr)
+            if bound is None:
+                bound = client.__dict__[self.attr] = resource._bind(client)
+        return bound
 
 
-class Client:
+class BaseClient:
     base_url: str
     soap_url: str
-    session: Session
+    empresa: str
 
-    # resources
-    cuentas: ClassVar = CuentaFisica
-    ordenes: ClassVar = Orden
-    saldos: ClassVar = Saldo
+    # resources, each instance gets its own bound subclass
+    cuentas: Type['CuentaFisica']
+    ordenes: Type['Orden']
+    saldos: Type['Saldo']
 
     def __init__(
         self,
         empresa: str,
-        priv_key: str,
-        priv_key_passphrase: str,
+        priv_key: Optional[str] = None,
+        priv_key_passphrase: Optional[str] = None,
         demo: bool = False,
         base_url: str = None,
         soap_url: str = None,
         timeout: tuple = None,
+        codec: Optional[JsonCodec] = None,
+        signer: Optional[Signer] = None,
+        observers: Iterable[Observer] = (),
+        metricas: bool = False,
+        middlewares: Iterable[Middleware] = (),
     ):
         self.timeout = timeout
-        self.session = Session()
-        self.session.headers['User-Agent'] = f'stpmex-python/{client_version}'
-        if demo:
-            host_url = DEMO_HOST
-            self.session.verify = False
-        else:
-            host_url = PROD_HOST
-            self.session.verify = True
+        self.codec = codec or default_codec()
+        self.middlewares: List[Middleware] = list(middlewares)
+        self.instrumentacion = Instrumentacion(observers)
+        self.metricas: Optional[Metricas] = None
+        if metricas:
+            self.metricas = Metricas(self)
+            self.instrumentacion.agrega(self.metricas)
+        self.verify = not demo
+        host_url = DEMO_HOST if demo else PROD_HOST
         self.base_url = base_url or f'{host_url}/speiws/rest'
         self.soap_url = (
             soap_url or f'{host_url}/spei/webservices/SpeiConsultaServices'
         )
 
+        if signer is None:
+            if priv_key is None:
+                raise ValueError('Se requiere priv_key o signer')
+            signer = RsaSigner.from_pem(priv_key, priv_key_passphrase)
+        self.signer = signer
+        # solo cuando la llave está en este proceso
+        self.pkey = getattr(signer, 'pkey', None)
+        self.signature_cache = SignatureCache()
+        # firmas calculadas con sign, sign_async y bulk_signer, ver
+        # stpmex.metricas
+        self.firmas = 0
+        self._firmas_lock = threading.Lock()
+        self.empresa = empresa
+        self._recibidas_cache: Optional['RecibidasCache'] = None
+
+    @property
+    def recibidas_cache(self) -> 'RecibidasCache':
+        # solo lo usan las órdenes, que ya importan consultas
+        if self._recibidas_cache is None:
+            from .resources.consultas import RecibidasCache
+
+            with _lazy_lock:
+                if self._recibidas_cache is None:
+                    self._recibidas_cache = RecibidasCache()
+        return self._recibidas_cache
+
+    def bulk_signer(self, max_workers: Optional[int] = None) -> BulkSigner:
+        """
+        Pool de procesos para firmar lotes grandes:
+
+        with client.bulk_signer() as signer:
+            datos = signer.to_dicts(ordenes)
+        """
+        if self.pkey is None:
+            raise ValueError('bulk_signer requiere la llave en el proceso')
+        return BulkSigner(
+            self.pkey, max_workers, al_firmar=self._cuenta_firmas
+        )
+
+    def sign(self, text: str) -> str:
+        """
+        Firma con self.signer, midiendo la fase y contando la firma
+        """
+        with fase('firma'):
+            firma = self.signer.sign(text)
+        self._cuenta_firmas(1)
+        return firma
+
+    async def sign_async(self, text: str) -> str:
+        with fase('firma'):
+            firma = await self.signer.sign_async(text)
+        self._cuenta_firmas(1)
+        return firma
+
+    def _cuenta_firmas(self, cantidad: int) -> None:
+        with self._firmas_lock:
+            self.firmas += cantidad
+
+    def cached_signature(self, text: str) -> str:
+        """
+        Firma de consultas que se repiten, ver SignatureCache
+        """
+        return self.signature_cache.compute_signature(
+            self.signer, text, self.sign
+        )
+
+    async def cached_signature_async(self, text: str) -> str:
+        return await self.signature_cache.compute_signature_async(
+            self.signer, text, self.sign_async
+        )
+
+    def _peticion(
+        self, method: str, endpoint: str, data: Dict[str, Any], **kwargs: Any
+    ) -> Peticion:
+        with fase('codificacion'):
+            body = self.codec.dumps(data)
+        return Peticion(
+            method,
+            endpoint,
+            self.base_url + endpoint,
+            body,
+            JSON_HEADERS,
+            kwargs,
+        )
+
+    def _peticion_soap(self, accion: str, cuerpo: str) -> Peticion:
+        return Peticion(
+            'post', accion, self.soap_url, cuerpo.encode('utf-8'), soap=True
+        )
+
+    def _ejecuta(self, peticion: Peticion) -> Any:
+        """
+        Pasa la petición por los middlewares, en AsyncClient regresa una
+        corrutina
+        """
+        return encadena(self.middlewares, self._envia)(peticion)
+
+    def _envia(self, peticion: Peticion) -> Any:  # pragma: no cover
+        raise NotImplementedError
+
+
+class Client(BaseClient):
+    """
+    Opciones del pool de conexiones (ver requests.adapters.HTTPAdapter):
+
+    - pool_connections: número de hosts con pool de conexiones
+    - pool_maxsize: máximo de conexiones guardadas por host. Debe ser al
+    menos el número de threads que comparten el cliente
+    - pool_block: esperar a que se libere una conexión en lugar de abrir
+    una nueva cuando se llega a pool_maxsize
+    - keep_alive: reusar conexiones entre peticiones
+    - session_per_thread: cada thread usa su propia Session, todas con el
+    mismo pool de conexiones. Úsalo para compartir un cliente entre threads
+    """
+
+    cuentas = LazyResource('.resources.cuentas', 'CuentaFisica')
+    ordenes = LazyResource('.resources.ordenes', 'Orden')
+    saldos = LazyResource('.resources.saldos', 'Saldo')
+
+    def __init__(
+        self,
+        empresa: str,
+        *args: Any,
+        pool_connections: int = DEFAULT_POOLSIZE,
+        pool_maxsize: int = DEFAULT_POOLSIZE,
+        pool_block: bool = DEFAULT_POOLBLOCK,
+        keep_alive: bool = True,
+        session_per_thread: bool = False,
+        **kwargs: Any,
+    ):
+        super().__init__(empresa, *args, **kwargs)
+        self.keep_alive = keep_alive
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.session_per_thread = session_per_thread
+        self._local = threading.local()
+        self._session = self._new_session()
+
+    def _new_session(self) -> Session:
+        session = Session()
+        session.headers['User-Agent'] = USER_AGENT
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        session.verify = self.verify
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return session
+
+    @property
+    def session(self) -> Session:
         try:
-            self.pkey = serialization.load_pem_private_key(
-                priv_key.encode('utf-8'),
-                priv_key_passphrase.encode('ascii'),
-                default_backend(),
-            )
-        except (ValueError, TypeError, UnsupportedAlgorithm):
-            raise InvalidPassphrase
-        Resource.empresa = empresa
-        Resource._client = self
+            return self._local.session
+        except AttributeError:
+            if not self.session_per_thread:
+                return self._session
+        self._local.session = self._new_session()
+        return self._local.session
+
+    def usa_session_propia(self) -> None:
+        """
+        El thread actual usa su propia Session aunque no se haya pedido
+        session_per_thread, e.g. los workers de Orden.registra_lote
+        """
+        self._local.session = self._new_session()
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Peticiones enviadas y conexiones abiertas por los pools activos.
+        reused_connections son las peticiones que no abrieron una conexión
+        """
+        requests = connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:  # pragma: no cover, se descartó al iterar
+                continue
+            requests += pool.num_requests
+            connections += pool.num_connections
+        return dict(
+            requests=requests,
+            new_connections=connections,
+            reused_connections=max(requests - connections, 0),
+        )
 
     def post(
         self, endpoint: str, data: Dict[str, Any]
@@ -96,36 +330,212 @@ class Client:
     def request(
         self, method: str, endpoint: str, data: Dict[str, Any], **kwargs: Any
     ) -> Union[Dict[str, Any], List[Any]]:
+        with self.instrumentacion.operacion(endpoint):
+            peticion = self._peticion(method, endpoint, data, **kwargs)
+            resp = self._ejecuta(peticion)
+        return _unwrap_resultado(resp)
+
+    def soap(self, accion: str, cuerpo: str) -> str:
+        """
+        Envía el sobre SOAP a soap_url y regresa el texto de la respuesta
+        """
+        with self.instrumentacion.operacion(accion):
+            return self._ejecuta(self._peticion_soap(accion, cuerpo))
+
+    def _envia(self, peticion: Peticion) -> Any:
+        """
+        Último eslabón de la cadena de middlewares
+        """
+        with fase('red'):
+            response = self.session.request(
+                peticion.metodo,
+                peticion.url,
+                data=peticion.cuerpo,
+                headers=peticion.headers,
+                timeout=self.timeout,
+                **peticion.opciones,
+            )
+        _registra_respuesta(peticion, response.status_code, response.content)
+        if peticion.soap:
+            if not response.ok:
+                response.raise_for_status()
+            return response.text
+        with fase('decodificacion'):
+            return self._check_response(response)
+
+    def stream(
+        self, method: str, endpoint: str, data: Dict[str, Any], key: str
+    ) -> Iterator[Any]:
+        """
+        Regresa uno a uno los elementos del arreglo `key` de la respuesta
+        conforme se reciben, sin cargar la respuesta completa.
+        """
         url = self.base_url + endpoint
-        response = self.session.request(
+        with self.session.request(
             method,
             url,
-            json=data,
+            data=self.codec.dumps(data),
+            headers=JSON_HEADERS,
             timeout=self.timeout,
-            **kwargs,
-        )
-        self._check_response(response)
-        resultado = response.json()
-        if 'resultado' in resultado:  # Some responses are enveloped
-            resultado = resultado['resultado']
-        return resultado
-
-    @staticmethod
-    def _check_response(response: Response) -> None:
+            stream=True,
+        ) as response:
+            if not response.ok:
+                response.raise_for_status()
+            arreglo = JsonArrayStream(key)
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                yield from arreglo.feed(chunk)
+            documento = arreglo.close()
+        _check_resp(documento)
+
+    def _check_response(self, response: Response) -> Any:
+        """
+        Levanta la excepción correspondiente al error de STP o regresa la
+        respuesta decodificada
+        """
         if not response.ok:
             response.raise_for_status()
-        resp = response.json()
-        if isinstance(resp, dict):
-            try:
-                _raise_description_error_exc(resp)
-            except KeyError:
-                ...
-            try:
-                assert resp['descripcion']
-                _raise_description_exc(resp)
-            except (AssertionError, KeyError):
-                ...
-        response.raise_for_status()
+        resp = self.codec.loads(response.content)
+        _check_resp(resp)
+        return resp
+
+
+class AsyncClient(BaseClient):
+    """
+    Cliente basado en asyncio. Requiere httpx: pip install stpmex[async]
+
+    Los métodos de los recursos son awaitables:
+    `orden = await client.ordenes.registra(...)`
+    """
+
+    session: 'httpx.AsyncClient'  # noqa: F821
+
+    cuentas = LazyResource('.resources.cuentas', 'AsyncCuentaFisica')
+    ordenes = LazyResource('.resources.ordenes', 'AsyncOrden')
+    saldos = LazyResource('.resources.saldos', 'AsyncSaldo')
+
+    def __init__(self, empresa: str, *args: Any, **kwargs: Any):
+        import httpx
+
+        super().__init__(empresa, *args, **kwargs)
+        if isinstance(self.timeout, tuple):  # (connect, read) como requests
+            connect, read = self.timeout
+            timeout = httpx.Timeout(None, connect=connect, read=read)
+        else:
+            timeout = httpx.Timeout(self.timeout)
+        self.session = httpx.AsyncClient(
+            headers={'User-Agent': USER_AGENT},
+            verify=self.verify,
+            timeout=timeout,
+        )
+
+    async def __aenter__(self) -> 'AsyncClient':
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.session.aclose()
+
+    async def post(
+        self, endpoint: str, data: Dict[str, Any]
+    ) -> Union[Dict[str, Any], List[Any]]:
+        return await self.request('post', endpoint, data)
+
+    async def put(
+        self, endpoint: str, data: Dict[str, Any]
+    ) -> Union[Dict[str, Any], List[Any]]:
+        return await self.request('put', endpoint, data)
+
+    async def delete(
+        self, endpoint: str, data: Dict[str, Any]
+    ) -> Union[Dict[str, Any], List[Any]]:
+        return await self.request('delete', endpoint, data)
+
+    async def request(
+        self, method: str, endpoint: str, data: Dict[str, Any], **kwargs: Any
+    ) -> Union[Dict[str, Any], List[Any]]:
+        with self.instrumentacion.operacion(endpoint):
+            peticion = self._peticion(method, endpoint, data, **kwargs)
+            resp = await self._ejecuta(peticion)
+        return _unwrap_resultado(resp)
+
+    async def soap(self, accion: str, cuerpo: str) -> str:
+        with self.instrumentacion.operacion(accion):
+            return await self._ejecuta(self._peticion_soap(accion, cuerpo))
+
+    async def _envia(self, peticion: Peticion) -> Any:
+        with fase('red'):
+            response = await self.session.request(
+                peticion.metodo,
+                peticion.url,
+                content=peticion.cuerpo,
+                headers=peticion.headers,
+                **peticion.opciones,
+            )
+        _registra_respuesta(peticion, response.status_code, response.content)
+        if peticion.soap:
+            if response.is_error:
+                response.raise_for_status()
+            return response.text
+        with fase('decodificacion'):
+            return self._check_response(response)
+
+    async def stream(
+        self, method: str, endpoint: str, data: Dict[str, Any], key: str
+    ) -> AsyncIterator[Any]:
+        url = self.base_url + endpoint
+        async with self.session.stream(
+            method,
+            url,
+            content=self.codec.dumps(data),
+            headers=JSON_HEADERS,
+        ) as response:
+            if response.is_error:
+                response.raise_for_status()
+            arreglo = JsonArrayStream(key)
+            async for chunk in response.aiter_bytes():
+                for elemento in arreglo.feed(chunk):
+                    yield elemento
+            documento = arreglo.close()
+        _check_resp(documento)
+
+    def _check_response(self, response: 'httpx.Response') -> Any:  # noqa: F821
+        if response.is_error:
+            response.raise_for_status()
+        resp = self.codec.loads(response.content)
+        _check_resp(resp)
+        return resp
+
+
+def _registra_respuesta(
+    peticion: Peticion, status: int, contenido: bytes
+) -> None:
+    medicion = actual()
+    if medicion is not None:
+        medicion.metodo = peticion.metodo.upper()
+        medicion.endpoint = peticion.endpoint
+        medicion.status = status
+        medicion.tamano_respuesta = len(contenido)
+
+
+def _unwrap_resultado(resultado: Any) -> Union[Dict[str, Any], List[Any]]:
+    if 'resultado' in resultado:  # Some responses are enveloped
+        resultado = resultado['resultado']
+    return resultado
+
+
+def _check_resp(resp: Any) -> None:
+    if isinstance(resp, dict):
+        try:
+            _raise_description_error_exc(resp)
+        except KeyError:
+            ...
+        try:
+            assert resp['descripcion']
+            _raise_description_exc(resp)
+        except (AssertionError, KeyError):
+            ...
 
 
 def _raise_description_error_exc(resp: Dict) -> NoReturn:
@@ -0,0 +1,38 @@
+import json
+from typing import Any, Union
+
+
+class JsonCodec:
+    """
+    Codifica las peticiones y decodifica las respuestas de STP. Se puede
+    pasar otro codec al cliente: Client(..., codec=MiCodec())
+    """
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._orjson.dumps(obj)
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)
+
+
+def default_codec() -> JsonCodec:
+    """
+    orjson si está instalado (pip install stpmex[orjson]), si no json
+    """
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JsonCodec()
@@ -1,4 +1,8 @@
-from pydantic import PydanticValueError
+from .lazy import lazy_imports
+
+# es un error de validación de pydantic, vive junto a los tipos para no
+# importar pydantic con las excepciones
+lazy_imports(globals(), {'BlockedInstitutionError': '.types'})
 
 
 class StpmexException(Exception):
@@ -91,8 +95,12 @@ class InvalidAmount(StpmexException):
     """El monto es inválido para una de las instituciones"""
 
 
-class BlockedInstitutionError(PydanticValueError):
-    """Institución bloqueada"""
+class SignerError(StpmexException):
+    """Error del servidor de firmas"""
+
 
-    code = 'clabe.bank_code'
-    msg_template = '{bank_name} has been blocked by STP.'
+class TrustedDataMismatch(StpmexException):
+    """
+    from_trusted produjo un recurso distinto al de la validación completa.
+    diferencias: {campo: (valor sin validar, valor validado)}
+    """
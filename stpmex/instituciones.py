@@ -0,0 +1,65 @@
+"""
+Catálogo de instituciones con índices para búsquedas O(1) en los
+validadores. Se arma de las tablas de `clabe` y de BLOCKED_INSTITUTIONS, y
+se puede recargar en caliente:
+
+clabe.add_bank('90717', 'Nuevo Banco')
+instituciones.recarga(bloqueadas={'90659', '90642', '90717'})
+
+Cada recarga crea un Catalogo nuevo y lo reemplaza de forma atómica, así
+que quien ya tiene una referencia sigue viendo un catálogo consistente.
+"""
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional
+
+import clabe
+
+# STP does not allow to make tranfers to this banks codes.
+# Inmutable: para cambiarlas usa recarga(bloqueadas=...)
+BLOCKED_INSTITUTIONS = frozenset({'90659', '90642'})
+
+
+class Catalogo:
+    """
+    - nombres: código Banxico -> nombre
+    - por_prefijo: prefijo de 3 dígitos de la CLABE -> código Banxico
+    - codigos: códigos Banxico válidos
+    - bloqueadas: códigos Banxico a los que STP no permite enviar
+    """
+
+    def __init__(
+        self,
+        por_prefijo: Mapping[str, str],
+        nombres: Mapping[str, str],
+        bloqueadas: Iterable[str],
+    ):
+        self.por_prefijo: Dict[str, str] = dict(por_prefijo)
+        self.nombres: Dict[str, str] = dict(nombres)
+        self.codigos: FrozenSet[str] = frozenset(self.por_prefijo.values())
+        self.bloqueadas: FrozenSet[str] = frozenset(bloqueadas)
+
+
+def _de_clabe(bloqueadas: Optional[Iterable[str]] = None) -> Catalogo:
+    if bloqueadas is None:
+        bloqueadas = BLOCKED_INSTITUTIONS
+    return Catalogo(clabe.BANKS, clabe.BANK_NAMES, bloqueadas)
+
+
+_catalogo = _de_clabe()
+
+
+def catalogo() -> Catalogo:
+    return _catalogo
+
+
+def recarga(
+    bloqueadas: Optional[Iterable[str]] = None,
+    catalogo_nuevo: Optional[Catalogo] = None,
+) -> Catalogo:
+    """
+    Vuelve a leer las tablas de `clabe` (e.g. después de clabe.add_bank o
+    clabe.remove_bank) o usa catalogo_nuevo. Sin bloqueadas se usa
+    BLOCKED_INSTITUTIONS.
+    """
+    global _catalogo
+    _catalogo = catalogo_nuevo or _de_clabe(bloqueadas)
+    return _catalogo
@@ -0,0 +1,258 @@
+"""
+Tiempos por fase de cada llamada a STP. Los observers reciben una Medicion
+al terminar cada operación:
+
+class Imprime(Observer):
+    def al_terminar(self, medicion):
+        print(medicion.operacion, medicion.status, medicion.fases)
+
+client = Client(..., observers=[Imprime()])
+
+Fases: validacion, cadena, firma, serializacion, codificacion, red,
+decodificacion y conversion. Sin observers solo cuesta revisar una lista
+vacía por llamada.
+"""
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # pragma: no cover, python 3.6
+    import threading
+
+    class ContextVar:  # type: ignore
+        def __init__(self, name: str, default: Any = None):
+            self._local = threading.local()
+            self._default = default
+
+        def get(self) -> Any:
+            return getattr(self._local, 'valor', self._default)
+
+        def set(self, valor: Any) -> Any:
+            anterior = self.get()
+            self._local.valor = valor
+            return anterior
+
+        def reset(self, anterior: Any) -> None:
+            self._local.valor = anterior
+
+
+# medición de la operación en curso en este thread o tarea de asyncio
+_actual: 'ContextVar[Optional[Medicion]]' = ContextVar(
+    'stpmex_medicion', default=None
+)
+
+
+class Medicion:
+    """
+    - operacion: e.g. 'ordenes.registra' o el endpoint
+    - metodo, endpoint, status, tamano_respuesta: de la petición HTTP
+    - excepcion: la que levantó la operación, ya mapeada a StpmexException
+    - intervalos: (fase, segundos desde el inicio, duración)
+    """
+
+    __slots__ = (
+        'operacion',
+        'metodo',
+        'endpoint',
+        'status',
+        'tamano_respuesta',
+        'excepcion',
+        'intervalos',
+        'inicio',
+        'duracion',
+        '_perf_inicio',
+    )
+
+    def __init__(self, operacion: str):
+        self.operacion = operacion
+        self.metodo: Optional[str] = None
+        self.endpoint: Optional[str] = None
+        self.status: Optional[int] = None
+        self.tamano_respuesta: Optional[int] = None
+        self.excepcion: Optional[BaseException] = None
+        self.intervalos: List[Tuple[str, float, float]] = []
+        self.inicio = time.time()
+        self.duracion = 0.0
+        self._perf_inicio = time.perf_counter()
+
+    @property
+    def fases(self) -> Dict[str, float]:
+        fases: Dict[str, float] = {}
+        for fase, _, duracion in self.intervalos:
+            fases[fase] = fases.get(fase, 0.0) + duracion
+        return fases
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            operacion=self.operacion,
+            metodo=self.metodo,
+            endpoint=self.endpoint,
+            status=self.status,
+            tamano_respuesta=self.tamano_respuesta,
+            excepcion=type(self.excepcion).__name__
+            if self.excepcion
+            else None,
+            inicio=self.inicio,
+            duracion=self.duracion,
+            fases=self.fases,
+        )
+
+
+class Observer:
+    """
+    Recibe las mediciones. Se llama en el thread (o tarea) de la
+    operación, así que debe ser rápido y no levantar excepciones.
+    """
+
+    def al_iniciar(self, medicion: Medicion) -> None:
+        ...
+
+    def al_terminar(self, medicion: Medicion) -> None:
+        ...
+
+
+class _Nula:
+    """
+    Contexto que no hace nada, para cuando no hay observers
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info: Any) -> None:
+        ...
+
+
+_NULA = _Nula()
+
+
+class _Fase:
+    __slots__ = ('medicion', 'nombre', 'inicio')
+
+    def __init__(self, medicion: Medicion, nombre: str):
+        self.medicion = medicion
+        self.nombre = nombre
+
+    def __enter__(self) -> None:
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        fin = time.perf_counter()
+        medicion = self.medicion
+        medicion.intervalos.append(
+            (
+                self.nombre,
+                self.inicio - medicion._perf_inicio,
+                fin - self.inicio,
+            )
+        )
+
+
+def fase(nombre: str) -> Any:
+    """
+    with fase('firma'): ... mide el bloque si hay una operación en curso
+    """
+    medicion = _actual.get()
+    if medicion is None:
+        return _NULA
+    return _Fase(medicion, nombre)
+
+
+def actual() -> Optional[Medicion]:
+    return _actual.get()
+
+
+class _Operacion:
+    __slots__ = ('observers', 'medicion', 'token')
+
+    def __init__(self, observers: List[Observer], nombre: str):
+        self.observers = observers
+        self.medicion = Medicion(nombre)
+
+    def __enter__(self) -> Medicion:
+        self.token = _actual.set(self.medicion)
+        for observer in self.observers:
+            observer.al_iniciar(self.medicion)
+        return self.medicion
+
+    def __exit__(self, tipo: Any, exc: Optional[BaseException], tb: Any):
+        _actual.reset(self.token)
+        medicion = self.medicion
+        medicion.duracion = time.perf_counter() - medicion._perf_inicio
+        medicion.excepcion = exc
+        for observer in self.observers:
+            observer.al_terminar(medicion)
+
+
+class Instrumentacion:
+    """
+    Observers de un cliente. operacion() abre una Medicion, salvo que ya
+    haya una en curso (e.g. la petición dentro de ordenes.registra)
+    """
+
+    def __init__(self, observers: Iterable[Observer] = ()):
+        self.observers: List[Observer] = list(observers)
+
+    def agrega(self, observer: Observer) -> None:
+        self.observers.append(observer)
+
+    def quita(self, observer: Observer) -> None:
+        self.observers.remove(observer)
+
+    def operacion(self, nombre: str) -> Any:
+        if not self.observers or _actual.get() is not None:
+            return _NULA
+        return _Operacion(self.observers, nombre)
+
+
+class OpenTelemetryObserver(Observer):
+    """
+    Un span por operación con los atributos de la petición, la duración de
+    cada fase (stpmex.fase.<fase>) y un evento al inicio de cada fase:
+
+    from opentelemetry import trace
+    client.instrumentacion.agrega(
+        OpenTelemetryObserver(trace.get_tracer('stpmex'))
+    )
+
+    No importa opentelemetry, solo usa la API del tracer y del span.
+    """
+
+    def __init__(self, tracer: Any, prefijo: str = 'stpmex'):
+        self.tracer = tracer
+        self.prefijo = prefijo
+
+    def al_terminar(self, medicion: Medicion) -> None:
+        inicio_ns = int(medicion.inicio * 1e9)
+        atributos: Dict[str, Any] = {
+            f'{self.prefijo}.operacion': medicion.operacion
+        }
+        for atributo, valor in [
+            ('http.method', medicion.metodo),
+            (f'{self.prefijo}.endpoint', medicion.endpoint),
+            ('http.status_code', medicion.status),
+            ('http.response_content_length', medicion.tamano_respuesta),
+        ]:
+            if valor is not None:
+                atributos[atributo] = valor
+        for nombre, duracion in medicion.fases.items():
+            atributos[f'{self.prefijo}.fase.{nombre}'] = duracion
+        if medicion.excepcion is not None:
+            atributos['error.type'] = type(medicion.excepcion).__name__
+        span = self.tracer.start_span(
+            f'{self.prefijo}.{medicion.operacion}',
+            start_time=inicio_ns,
+            attributes=atributos,
+        )
+        for nombre, desde, duracion in medicion.intervalos:
+            span.add_event(
+                nombre,
+                attributes={'duracion': duracion},
+                timestamp=inicio_ns + int(desde * 1e9),
+            )
+        if medicion.excepcion is not None:
+            span.record_exception(medicion.excepcion)
+        span.end(end_time=inicio_ns + int(medicion.duracion * 1e9))
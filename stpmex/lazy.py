@@ -0,0 +1,40 @@
+"""
+Importaciones diferidas (PEP 562). Los módulos pesados (requests,
+cryptography, pydantic, clabe, los catálogos) se importan hasta que se usa
+el atributo que los necesita:
+
+lazy_imports(globals(), {'Client': '.client'})
+"""
+import sys
+from importlib import import_module
+from typing import Any, Dict, List
+
+
+def lazy_imports(namespace: Dict[str, Any], atributos: Dict[str, str]) -> None:
+    """
+    atributos: nombre -> módulo (relativo al paquete del namespace). En
+    python 3.6 no hay __getattr__ de módulo y se importan de una vez
+    """
+    modulo = namespace['__name__']
+    paquete = namespace['__package__']
+
+    def __getattr__(name: str) -> Any:
+        try:
+            origen = atributos[name]
+        except KeyError:
+            raise AttributeError(
+                f'module {modulo!r} has no attribute {name!r}'
+            ) from None
+        valor = getattr(import_module(origen, paquete), name)
+        namespace[name] = valor  # las siguientes veces no pasa por aquí
+        return valor
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(atributos))
+
+    if sys.version_info < (3, 7):  # pragma: no cover
+        for name in atributos:
+            __getattr__(name)
+        return
+    namespace['__getattr__'] = __getattr__
+    namespace['__dir__'] = __dir__
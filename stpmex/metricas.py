@@ -0,0 +1,324 @@
+"""
+Contadores e histogramas del cliente, exportables en el formato de texto
+de Prometheus o como dict:
+
+client = Client(..., metricas=True)
+...
+client.metricas.prometheus()  # e.g. en el endpoint /metrics del servicio
+
+Se alimentan de las mediciones de stpmex.instrumentacion, así que cuestan
+lo mismo que un observer. Los hits de los caches y el reuso de conexiones
+se leen del cliente al exportar.
+"""
+import threading
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from .instrumentacion import Medicion, Observer
+
+if TYPE_CHECKING:
+    from .client import BaseClient
+
+# segundos, como los default de los clientes de Prometheus
+LATENCIA_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Etiquetas = Tuple[str, ...]
+
+# contadores que se leen del cliente: nombre, ayuda y etiquetas
+FIRMAS = ('stpmex_firmas_total', 'Firmas calculadas', ())
+CACHE_HITS = ('stpmex_cache_hits_total', 'Aciertos de los caches', ('cache',))
+CACHE_MISSES = (
+    'stpmex_cache_misses_total',
+    'Fallos de los caches',
+    ('cache',),
+)
+CONEXIONES = ('stpmex_conexiones_total', 'Conexiones HTTP por tipo', ('tipo',))
+
+
+class Contador:
+    """
+    Valor por combinación de etiquetas. No tiene lock propio, lo usa
+    Metricas al actualizar
+    """
+
+    tipo = 'counter'
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str]):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.valores: Dict[Etiquetas, float] = {}
+
+    def incrementa(self, etiquetas: Etiquetas, cantidad: float = 1) -> None:
+        self.valores[etiquetas] = self.valores.get(etiquetas, 0) + cantidad
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [
+            dict(etiquetas=dict(zip(self.etiquetas, valores)), valor=valor)
+            for valores, valor in self.valores.items()
+        ]
+
+    def lineas(self) -> List[str]:
+        return [
+            f'{self.nombre}{_etiquetas(self.etiquetas, valores)} '
+            f'{_numero(valor)}'
+            for valores, valor in self.valores.items()
+        ]
+
+
+class Histograma:
+    """
+    Conteos por bucket (no acumulados), suma y total por etiquetas
+    """
+
+    tipo = 'histogram'
+
+    def __init__(
+        self,
+        nombre: str,
+        ayuda: str,
+        etiquetas: Sequence[str],
+        buckets: Sequence[float] = LATENCIA_BUCKETS,
+    ):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Etiquetas, Tuple[List[int], List[float]]] = {}
+
+    def observa(self, etiquetas: Etiquetas, valor: float) -> None:
+        try:
+            conteos, suma = self.series[etiquetas]
+        except KeyError:
+            conteos, suma = [0] * (len(self.buckets) + 1), [0.0]
+            self.series[etiquetas] = (conteos, suma)
+        # le es inclusivo, el último es +Inf
+        conteos[bisect_left(self.buckets, valor)] += 1
+        suma[0] += valor
+
+    def _acumulados(self, conteos: List[int]) -> List[Tuple[str, int]]:
+        acumulados = []
+        total = 0
+        for limite, conteo in zip(self.buckets + (float('inf'),), conteos):
+            total += conteo
+            acumulados.append((_numero(limite), total))
+        return acumulados
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        series = []
+        for valores, (conteos, suma) in self.series.items():
+            acumulados = self._acumulados(conteos)
+            series.append(
+                dict(
+                    etiquetas=dict(zip(self.etiquetas, valores)),
+                    buckets=dict(acumulados),
+                    suma=suma[0],
+                    total=acumulados[-1][1],
+                )
+            )
+        return series
+
+    def lineas(self) -> List[str]:
+        lineas = []
+        for valores, (conteos, suma) in self.series.items():
+            acumulados = self._acumulados(conteos)
+            for limite, total in acumulados:
+                etiquetas = _etiquetas(
+                    self.etiquetas + ('le',), valores + (limite,)
+                )
+                lineas.append(f'{self.nombre}_bucket{etiquetas} {total}')
+            etiquetas = _etiquetas(self.etiquetas, valores)
+            lineas.append(f'{self.nombre}_sum{etiquetas} {_numero(suma[0])}')
+            lineas.append(
+                f'{self.nombre}_count{etiquetas} {acumulados[-1][1]}'
+            )
+        return lineas
+
+
+class Metricas(Observer):
+    """
+    - stpmex_peticiones_total: por endpoint, método y status HTTP
+    - stpmex_latencia_segundos: histograma por operación
+    - stpmex_errores_total: por operación y clase de excepción
+    - stpmex_fase_segundos_total: tiempo acumulado por operación y fase
+    - stpmex_firmas_total: firmas calculadas por el cliente, también las
+    de lotes, to_dict y client.bulk_signer (las del cache no cuentan)
+    - stpmex_cache_hits_total / stpmex_cache_misses_total: por cache
+    - stpmex_conexiones_total: nuevas y reusadas, solo con Client
+    """
+
+    def __init__(
+        self,
+        client: Optional['BaseClient'] = None,
+        buckets: Sequence[float] = LATENCIA_BUCKETS,
+    ):
+        self.client = client
+        self.peticiones = Contador(
+            'stpmex_peticiones_total',
+            'Peticiones a STP',
+            ('endpoint', 'metodo', 'status'),
+        )
+        self.latencia = Histograma(
+            'stpmex_latencia_segundos',
+            'Duración de las operaciones',
+            ('operacion',),
+            buckets,
+        )
+        self.errores = Contador(
+            'stpmex_errores_total',
+            'Operaciones que levantaron una excepción',
+            ('operacion', 'excepcion'),
+        )
+        self.fases = Contador(
+            'stpmex_fase_segundos_total',
+            'Tiempo acumulado por fase',
+            ('operacion', 'fase'),
+        )
+        # valores de los contadores del cliente en el último reinicia
+        self._iniciales: Dict[Tuple[str, Etiquetas], float] = {}
+        self._lock = threading.Lock()
+
+    def al_terminar(self, medicion: Medicion) -> None:
+        operacion = (medicion.operacion,)
+        with self._lock:
+            self.latencia.observa(operacion, medicion.duracion)
+            if medicion.endpoint is not None:
+                self.peticiones.incrementa(
+                    (
+                        medicion.endpoint,
+                        medicion.metodo or '',
+                        str(medicion.status),
+                    )
+                )
+            if medicion.excepcion is not None:
+                self.errores.incrementa(
+                    operacion + (type(medicion.excepcion).__name__,)
+                )
+            for fase, _, duracion in medicion.intervalos:
+                self.fases.incrementa(operacion + (fase,), duracion)
+
+    def _del_cliente(self) -> List[Contador]:
+        """
+        Contadores que lleva el cliente por su cuenta, desde el último
+        reinicia
+        """
+        contadores = []
+        for (nombre, ayuda, etiquetas), valores in self._lee_cliente():
+            contador = Contador(nombre, ayuda, etiquetas)
+            for llave, valor in valores.items():
+                inicial = self._iniciales.get((nombre, llave), 0)
+                contador.incrementa(llave, valor - inicial)
+            contadores.append(contador)
+        return contadores
+
+    def _lee_cliente(
+        self,
+    ) -> List[Tuple[Tuple[str, str, Etiquetas], Dict[Etiquetas, float]]]:
+        """
+        Valores actuales de los contadores del cliente
+        """
+        client = self.client
+        if client is None:
+            return []
+        hits: Dict[Etiquetas, float] = {}
+        misses: Dict[Etiquetas, float] = {}
+        caches = [('firmas', client.signature_cache.stats())]
+        if client._recibidas_cache is not None:
+            caches.append(('recibidas', client._recibidas_cache.stats()))
+        for cache, stats in caches:
+            hits[(cache,)] = stats['hits']
+            misses[(cache,)] = stats['misses']
+        lecturas = [
+            (FIRMAS, {(): client.firmas}),
+            (CACHE_HITS, hits),
+            (CACHE_MISSES, misses),
+        ]
+        connection_stats = getattr(client, 'connection_stats', None)
+        if connection_stats is not None:
+            stats = connection_stats()
+            lecturas.append(
+                (
+                    CONEXIONES,
+                    {
+                        ('nuevas',): stats['new_connections'],
+                        ('reusadas',): stats['reused_connections'],
+                    },
+                )
+            )
+        return lecturas
+
+    def _metricas(self) -> List[Any]:
+        return [
+            self.peticiones,
+            self.latencia,
+            self.errores,
+            self.fases,
+        ] + self._del_cliente()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                metrica.nombre: metrica.to_dict()
+                for metrica in self._metricas()
+            }
+
+    def prometheus(self) -> str:
+        """
+        Formato de texto de Prometheus (text/plain; version=0.0.4)
+        """
+        lineas = []
+        with self._lock:
+            for metrica in self._metricas():
+                lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+                lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+                lineas.extend(metrica.lineas())
+        return '\n'.join(lineas) + '\n'
+
+    def reinicia(self) -> None:
+        """
+        Empieza un periodo nuevo. Los contadores del cliente no se tocan,
+        se guardan sus valores actuales para restarlos
+        """
+        with self._lock:
+            for metrica in (self.peticiones, self.errores, self.fases):
+                metrica.valores.clear()
+            self.latencia.series.clear()
+            self._iniciales = {
+                (nombre, llave): valor
+                for (nombre, _, _), valores in self._lee_cliente()
+                for llave, valor in valores.items()
+            }
+
+
+def _numero(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _etiquetas(nombres: Etiquetas, valores: Etiquetas) -> str:
+    if not nombres:
+        return ''
+    pares = ','.join(
+        f'{nombre}="{_escapa(valor)}"'
+        for nombre, valor in zip(nombres, valores)
+    )
+    return '{' + pares + '}'
+
+
+def _escapa(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
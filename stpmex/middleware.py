@@ -0,0 +1,93 @@
+"""
+Middlewares alrededor de las peticiones del cliente, REST y SOAP. Cada
+middleware recibe la Peticion y `siguiente`, que hace el resto de la cadena
+y regresa la respuesta ya decodificada (la de SOAP como texto). Puede
+cambiar la petición, reintentar, regresar una respuesta sin llamar a
+siguiente (cache) o registrar lo que pasó:
+
+def bitacora(peticion, siguiente):
+    respuesta = siguiente(peticion)
+    log.info('%s %s', peticion.metodo, peticion.endpoint)
+    return respuesta
+
+client = Client(..., middlewares=[bitacora])
+
+El primero de la lista es el más externo. En AsyncClient los middlewares
+son corrutinas y hacen `return await siguiente(peticion)`.
+
+Los errores de STP ya llegan mapeados a StpmexException. Client.stream no
+pasa por la cadena.
+"""
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+
+class Peticion:
+    """
+    - metodo: en minúsculas, como lo recibe Client.request
+    - endpoint: e.g. '/ordenPago/registra' o la acción SOAP
+    - url: a la que se envía
+    - cuerpo: ya codificado
+    - headers y opciones: se pasan a la sesión HTTP
+    - soap: si es una consulta SOAP (la respuesta es texto)
+    """
+
+    __slots__ = (
+        'metodo',
+        'endpoint',
+        'url',
+        'cuerpo',
+        'headers',
+        'opciones',
+        'soap',
+    )
+
+    def __init__(
+        self,
+        metodo: str,
+        endpoint: str,
+        url: str,
+        cuerpo: bytes,
+        headers: Optional[Dict[str, str]] = None,
+        opciones: Optional[Dict[str, Any]] = None,
+        soap: bool = False,
+    ):
+        self.metodo = metodo
+        self.endpoint = endpoint
+        self.url = url
+        self.cuerpo = cuerpo
+        self.headers = dict(headers or {})
+        self.opciones = dict(opciones or {})
+        self.soap = soap
+
+    @property
+    def llave(self) -> Tuple[str, str, bytes]:
+        """
+        Identifica peticiones iguales, e.g. para cache o para juntar
+        peticiones concurrentes
+        """
+        return self.metodo, self.url, self.cuerpo
+
+    def __repr__(self) -> str:
+        return f'Peticion({self.metodo.upper()} {self.endpoint})'
+
+
+Siguiente = Callable[[Peticion], Any]
+Middleware = Callable[[Peticion, Siguiente], Any]
+
+
+def encadena(middlewares: Sequence[Middleware], envia: Siguiente) -> Siguiente:
+    """
+    Función que pasa la petición por los middlewares y al final la envía.
+    Sirve igual para funciones que para corrutinas.
+    """
+    siguiente = envia
+    for middleware in reversed(middlewares):
+        siguiente = _eslabon(middleware, siguiente)
+    return siguiente
+
+
+def _eslabon(middleware: Middleware, siguiente: Siguiente) -> Siguiente:
+    def llama(peticion: Peticion) -> Any:
+        return middleware(peticion, siguiente)
+
+    return llama
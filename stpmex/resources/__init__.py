@@ -1,6 +1,26 @@
-__all__ = ['CuentaFisica', 'Orden', 'Resource', 'Saldo']
+__all__ = [
+    'AsyncCuentaFisica',
+    'AsyncOrden',
+    'AsyncSaldo',
+    'CuentaFisica',
+    'Orden',
+    'OrdenConsultada',
+    'Resource',
+    'Saldo',
+]
 
-from .base import Resource
-from .cuentas import CuentaFisica
-from .ordenes import Orden
-from .saldos import Saldo
+from ..lazy import lazy_imports
+
+lazy_imports(
+    globals(),
+    {
+        'AsyncCuentaFisica': '.cuentas',
+        'AsyncOrden': '.ordenes',
+        'AsyncSaldo': '.saldos',
+        'CuentaFisica': '.cuentas',
+        'Orden': '.ordenes',
+        'OrdenConsultada': '.consultas',
+        'Resource': '.base',
+        'Saldo': '.saldos',
+    },
+)
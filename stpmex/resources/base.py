@@ -1,16 +1,135 @@
+import copy
 import datetime as dt
-from dataclasses import asdict
-from typing import Any, ClassVar, Dict, List
+from dataclasses import MISSING, Field, fields
+from operator import attrgetter
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Tuple,
+    Type,
+)
 
-from ..auth import compute_signature, join_fields
+from ..auth import cadena_consulta, compile_join
+from ..exc import TrustedDataMismatch
+from ..instrumentacion import fase
 from ..utils import strftime
 
 
 class Resource:
-    _client: ClassVar['stpmex.Client']  # noqa: F821
+    """
+    Los recursos se usan a través de un cliente, e.g. `client.ordenes`.
+    Cada cliente tiene su propia subclase de cada recurso con su llave,
+    empresa y sesión, así que varios clientes pueden usarse a la vez.
+    """
+
+    _client: ClassVar['stpmex.client.BaseClient']  # noqa: F821
     _endpoint: ClassVar[str]
     _firma_fieldnames: ClassVar[List[str]]
     empresa: ClassVar[str]
+    # from_trusted compara cada recurso contra la validación completa
+    verifica_trusted: ClassVar[bool] = False
+
+    @classmethod
+    def _bind(
+        cls, client: 'stpmex.client.BaseClient'  # noqa: F821
+    ) -> Type['Resource']:
+        return type(
+            cls.__name__,
+            (cls,),
+            dict(
+                _client=client,
+                empresa=client.empresa,
+                __module__=cls.__module__,
+            ),
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        """
+        La subclase de _bind no se puede serializar, así que se usa la clase
+        original con los mismos valores, e.g. para enviar órdenes a otro
+        proceso. Al cargarla hay que ligarla de nuevo a un cliente, e.g.
+        client.ordenes.from_trusted(**dataclasses.asdict(orden))
+        """
+        cls = type(self)
+        if '_client' in cls.__dict__:
+            cls = cls.__bases__[0]
+        return _reconstruye, (cls, dict(self.__dict__))
+
+    def __copy__(self) -> 'Resource':
+        # las copias siguen ligadas al cliente
+        return _reconstruye(type(self), dict(self.__dict__))
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'Resource':
+        return _reconstruye(type(self), copy.deepcopy(self.__dict__, memo))
+
+    @classmethod
+    def from_trusted(
+        cls, verificar: Optional[bool] = None, **kwargs: Any
+    ) -> 'Resource':
+        """
+        Crea el recurso sin la validación de pydantic, para datos que ya
+        se validaron antes, e.g. órdenes de un sistema propio. Los valores
+        deben ser los que dejaría la validación: textos truncados y sin
+        acentos, cuentas y claves correctas, etc.
+
+        Con verificar=True (o cls.verifica_trusted) también se crea el
+        recurso validado y se levanta TrustedDataMismatch si la cadena
+        original o el payload no son iguales.
+        """
+        campos = cls._campos()
+        extras = kwargs.keys() - campos.keys()
+        if extras:
+            raise TypeError(f'Campos desconocidos: {sorted(extras)}')
+        defaults = cls._defaults_validados()
+        resource = cls.__new__(cls)
+        valores = {}
+        for name, campo in campos.items():
+            if name in kwargs:
+                valores[name] = kwargs[name]
+            elif name in defaults:
+                valores[name] = defaults[name]
+            elif campo.default_factory is not MISSING:  # type: ignore
+                valores[name] = campo.default_factory()  # type: ignore
+            else:
+                raise TypeError(f'Falta el campo {name}')
+        resource.__dict__.update(valores)
+        post_init = getattr(cls, '__post_init_original__', None)
+        if post_init is not None:
+            post_init(resource)
+        object.__setattr__(resource, '__initialised__', True)
+        if verificar or (verificar is None and cls.verifica_trusted):
+            resource._verifica_trusted(kwargs)
+        return resource
+
+    def _verifica_trusted(self, kwargs: Dict[str, Any]) -> None:
+        generados = {
+            name: value
+            for name, value in self.__dict__.items()
+            if name in self._campos() and name not in kwargs
+        }
+        validado = type(self)(**kwargs, **generados)
+        diferencias = {}
+        datos = self.to_dict(firma='-')
+        datos_validados = validado.to_dict(firma='-')
+        for name in datos.keys() | datos_validados.keys():
+            valor = datos.get(name)
+            valor_validado = datos_validados.get(name)
+            if valor != valor_validado:
+                diferencias[name] = (valor, valor_validado)
+        if not diferencias and (
+            self._cadena_original() != validado._cadena_original()
+        ):
+            diferencias['cadena_original'] = (
+                self._cadena_original(),
+                validado._cadena_original(),
+            )
+        if diferencias:
+            raise TrustedDataMismatch(diferencias=diferencias)
 
     @property
     def firma(self):
@@ -18,26 +137,158 @@ class Resource:
         Based on:
         https://stpmex.zendesk.com/hc/es/articles/360002796012-Firmas-Electr%C3%B3nicas-
         """
-        joined_fields = join_fields(self, self._firma_fieldnames)
-        return compute_signature(self._client.pkey, joined_fields)
+        return self._client.sign(self._cadena_original())
+
+    async def firma_async(self) -> str:
+        return await self._client.sign_async(self._cadena_original())
+
+    def _cadena_original(self) -> str:
+        return self._join()(self)
+
+    @classmethod
+    def _join(cls) -> Callable[['Resource'], str]:
+        """
+        Función compilada que arma la cadena original. Se calcula una vez
+        por clase porque los campos que faltan dependen de cada subclase
+        """
+        try:
+            return cls.__dict__['_join_compilado']
+        except KeyError:
+            pass
+        fieldnames = tuple(cls._firma_fieldnames)
+        ausentes = frozenset(
+            field for field in fieldnames if not _tiene_campo(cls, field)
+        )
+        join = compile_join(fieldnames, ausentes)
+        cls._join_compilado = join
+        return join
+
+    def _datos_firmados(self) -> Dict[str, Any]:
+        """
+        to_dict con la firma, midiendo cada fase
+        """
+        with fase('cadena'):
+            cadena = self._cadena_original()
+        firma = self._client.sign(cadena)
+        with fase('serializacion'):
+            return self.to_dict(firma)
+
+    async def _datos_firmados_async(self) -> Dict[str, Any]:
+        with fase('cadena'):
+            cadena = self._cadena_original()
+        firma = await self._client.sign_async(cadena)
+        with fase('serializacion'):
+            return self.to_dict(firma)
 
     @classmethod
     def _firma_consulta(cls, consulta: Dict[str, Any]):
-        joined = (
-            f"|||"
-            f"{cls.empresa}|"
-            f"{consulta.get('fechaOperacion', '')}||"
-            f"{consulta.get('claveRastreo', '')}|"
-            f"{consulta.get('institucionOperante', '')}"
-            f"||||||||||||||||||||||||||||||"
+        joined = cadena_consulta(cls.empresa, consulta)
+        return cls._client.cached_signature(joined)
+
+    @classmethod
+    async def _firma_consulta_async(cls, consulta: Dict[str, Any]) -> str:
+        joined = cadena_consulta(cls.empresa, consulta)
+        return await cls._client.cached_signature_async(joined)
+
+    def to_dict(
+        self,
+        firma: Optional[str] = None,
+        cadena_original: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        firma se puede calcular antes, e.g. con Signer.to_dicts o
+        firma_async. Si solo se tiene la cadena original (e.g. ya se
+        registró en la bitácora) se firma esa en lugar de volver a armarla.
+        """
+        fieldnames, fechas, getter = self._serializador()
+        base = {}
+        for field, value in zip(fieldnames, getter(self)):
+            if value is None:
+                continue
+            if field in fechas:
+                value = strftime(value)
+            base[field] = value
+        if not firma:
+            if cadena_original is None:
+                cadena_original = self._cadena_original()
+            firma = self._client.sign(cadena_original)
+        base['firma'] = firma
+        base['empresa'] = self.empresa
+        return base
+
+    @classmethod
+    def _campos(cls) -> Dict[str, Field]:
+        """
+        Campos del dataclass por nombre, sin los ClassVar. Se calcula una
+        vez por clase porque los campos se conocen hasta que se aplica
+        @dataclass.
+        """
+        try:
+            return cls.__dict__['_campos_dataclass']
+        except KeyError:
+            pass
+        campos = {campo.name: campo for campo in fields(cls)}
+        cls._campos_dataclass = campos
+        return campos
+
+    @classmethod
+    def _defaults_validados(cls) -> Dict[str, Any]:
+        """
+        Valores default ya validados, e.g. institucionOperante es el int
+        90646 en la clase pero la validación lo convierte en '90646'
+        """
+        try:
+            return cls.__dict__['_defaults']
+        except KeyError:
+            pass
+        model_fields = cls.__pydantic_model__.__fields__
+        defaults = {}
+        for name, campo in cls._campos().items():
+            if campo.default is MISSING:
+                continue
+            value, error = model_fields[name].validate(
+                campo.default, {}, loc=name
+            )
+            defaults[name] = campo.default if error else value
+        cls._defaults = defaults
+        return defaults
+
+    @classmethod
+    def _serializador(cls) -> Tuple[Tuple[str, ...], FrozenSet[str], Any]:
+        """
+        Nombres de los campos, los que son fechas y un attrgetter que lee
+        todos, en lugar de dataclasses.asdict
+        """
+        try:
+            return cls.__dict__['_serializador_campos']
+        except KeyError:
+            pass
+        campos = cls._campos().values()
+        fieldnames = tuple(campo.name for campo in campos)
+        fechas = frozenset(campo.name for campo in campos if _es_fecha(campo))
+        serializador = (
+            fieldnames,
+            fechas,
+            attrgetter(*fieldnames, '__class__'),
         )
-        return compute_signature(cls._client.pkey, joined)
-
-    def to_dict(self) -> Dict[str, Any]:
-        base = dict()
-        for k, v in asdict(self).items():
-            if isinstance(v, dt.date):
-                base[k] = strftime(v)
-            elif v is not None:
-                base[k] = v
-        return {**base, **dict(firma=self.firma, empresa=self.empresa)}
+        cls._serializador_campos = serializador
+        return serializador
+
+
+def _reconstruye(cls: Type[Resource], valores: Dict[str, Any]) -> Resource:
+    resource = cls.__new__(cls)
+    resource.__dict__.update(valores)
+    return resource
+
+
+def _tiene_campo(cls: type, field: str) -> bool:
+    return hasattr(cls, field) or any(
+        field in getattr(klass, '__annotations__', {}) for klass in cls.__mro__
+    )
+
+
+def _es_fecha(campo: Field) -> bool:
+    tipos = getattr(campo.type, '__args__', None) or (campo.type,)
+    return any(
+        isinstance(tipo, type) and issubclass(tipo, dt.date) for tipo in tipos
+    )
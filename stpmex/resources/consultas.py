@@ -0,0 +1,354 @@
+import asyncio
+import datetime as dt
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from ..types import Estado
+from ..utils import strptime
+
+# Campos que regresa STP en consOrdenesFech y consOrdEnvRastreo
+ORDEN_CONSULTADA_FIELDNAMES = tuple(
+    """
+    causaDevolucion
+    clavePago
+    claveRastreo
+    claveRastreoDevolucion
+    conceptoPago
+    conceptoPago2
+    cuentaBeneficiario
+    cuentaBeneficiario2
+    cuentaOrdenante
+    empresa
+    estado
+    fechaOperacion
+    folioOrigen
+    idCliente
+    idEF
+    institucionContraparte
+    institucionOperante
+    medioEntrega
+    monto
+    nombreBeneficiario
+    nombreBeneficiario2
+    nombreOrdenante
+    prioridad
+    referenciaCobranza
+    referenciaNumerica
+    rfcCurpBeneficiario
+    rfcCurpBeneficiario2
+    rfcCurpOrdenante
+    tipoCuentaBeneficiario
+    tipoCuentaOrdenante
+    tipoPago
+    topologia
+    tsAcuseBanxico
+    tsCaptura
+    tsDevolucion
+    tsDevolucionRecibida
+    tsEntrega
+    tsLiquidacion
+    usuario
+    """.split()
+)
+_SLOTS = frozenset(ORDEN_CONSULTADA_FIELDNAMES)
+
+
+def _timestamp(v: Any) -> Any:
+    v /= 10 ** 3  # convertir de milisegundos a segundos
+    if v > 10 ** 9:
+        v = dt.datetime.fromtimestamp(v)
+    return v
+
+
+def _rstrip(v: Any) -> Any:
+    if isinstance(v, str):
+        v = v.rstrip()
+    return v
+
+
+def _convertidor(campo: str) -> Callable[[Any], Any]:
+    if campo.startswith('ts'):
+        convertidor = _timestamp
+    elif campo == 'fechaOperacion':
+        convertidor = strptime
+    elif campo == 'estado':
+        convertidor = Estado
+    else:
+        convertidor = _rstrip
+    return convertidor
+
+
+# campo -> función que convierte el valor de STP. Los campos desconocidos
+# se agregan la primera vez que aparecen.
+CONVERTIDORES: Dict[str, Callable[[Any], Any]] = {
+    campo: _convertidor(campo) for campo in ORDEN_CONSULTADA_FIELDNAMES
+}
+
+
+class OrdenConsultada:
+    """
+    Orden regresada por las consultas de órdenes. Solo tiene los campos que
+    regresó STP. Los campos que no están en ORDEN_CONSULTADA_FIELDNAMES se
+    guardan en _extra y se leen igual que el resto.
+    """
+
+    __slots__ = ORDEN_CONSULTADA_FIELDNAMES + ('_extra',)
+
+    _extra: Optional[Dict[str, Any]]
+
+    def __init__(self, **campos: Any):
+        self._extra = None
+        for campo, valor in campos.items():
+            self._set(campo, valor)
+
+    def _set(self, campo: str, valor: Any) -> None:
+        if campo in _SLOTS:
+            object.__setattr__(self, campo, valor)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[campo] = valor
+
+    @classmethod
+    def from_stp(cls, orden: Dict[str, Any]) -> 'OrdenConsultada':
+        consultada = cls.__new__(cls)
+        consultada._extra = None
+        for campo, valor in orden.items():
+            try:
+                convertidor = CONVERTIDORES[campo]
+            except KeyError:
+                convertidor = CONVERTIDORES.setdefault(
+                    campo, _convertidor(campo)
+                )
+            consultada._set(campo, convertidor(valor))
+        return consultada
+
+    def __getattr__(self, campo: str) -> Any:
+        # solo se llama si el campo no es un slot con valor. _extra puede no
+        # tener valor en instancias creadas con __new__, e.g. por copy
+        if campo != '_extra':
+            try:
+                extra = object.__getattribute__(self, '_extra')
+            except AttributeError:
+                extra = None
+            if extra is not None and campo in extra:
+                return extra[campo]
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{campo}'"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        campos = {}
+        for campo in ORDEN_CONSULTADA_FIELDNAMES:
+            try:
+                campos[campo] = object.__getattribute__(self, campo)
+            except AttributeError:
+                continue
+        if self._extra:
+            campos.update(self._extra)
+        return campos
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self.to_dict()
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._extra = None
+        for campo, valor in state.items():
+            self._set(campo, valor)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, OrdenConsultada):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        campos = ', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())
+        return f'{type(self).__name__}({campos})'
+
+
+Index = Dict[Tuple[str, int], OrdenConsultada]
+Llave = Tuple[str, int]
+Fecha = Optional[dt.date]
+
+
+class RecibidasCache:
+    """
+    Órdenes recibidas por fecha de operación, indexadas por
+    (claveRastreo, institución) para consulta_clave_rastreo.
+
+    - Las fechas anteriores a ayer no cambian, se descargan una sola vez.
+    - El día actual (fecha None, hoy o ayer por diferencias de zona horaria)
+    se vuelve a descargar cuando tiene más de `ttl` segundos.
+    - Se guardan a lo más `max_fechas` fechas.
+    - Si una orden no está en el día actual se vuelve a descargar, a lo más
+    una vez cada `min_refresco` segundos, para no ocultar las órdenes que
+    llegaron después de la última descarga.
+    - Solo se descarga una vez cada fecha a la vez, los demás threads
+    esperan esa descarga (ver busca).
+    """
+
+    def __init__(
+        self,
+        ttl: float = 5.0,
+        max_fechas: int = 31,
+        min_refresco: float = 1.0,
+    ):
+        self.ttl = ttl
+        self.max_fechas = max_fechas
+        self.min_refresco = min_refresco
+        self.hits = 0
+        self.misses = 0
+        self._fechas: 'OrderedDict[Fecha, Tuple[float, Index]]'
+        self._fechas = OrderedDict()
+        self._descargas: Dict[Fecha, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def index(self, fecha: Fecha) -> Optional[Index]:
+        """
+        None si hay que descargar las recibidas de la fecha
+        """
+        fecha = _fecha(fecha)
+        with self._lock:
+            try:
+                actualizada, index = self._fechas[fecha]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._fechas.move_to_end(fecha)
+            if not self._inmutable(fecha) and (
+                time.monotonic() - actualizada > self.ttl
+            ):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return index
+
+    def busca(
+        self,
+        fecha: Fecha,
+        llave: Llave,
+        descarga: Callable[[Fecha], Iterable[OrdenConsultada]],
+    ) -> Optional[OrdenConsultada]:
+        """
+        Orden recibida por llave, None si no existe. descarga(fecha) regresa
+        las recibidas de la fecha, e.g. Orden.consulta_recibidas. Si otro
+        thread ya está descargando la fecha se espera a que termine. Si esa
+        descarga falla, se vuelve a intentar.
+        """
+        fecha = _fecha(fecha)
+        while True:
+            index, descargando = self._turno(fecha, llave)
+            if index is not None:
+                return index.get(llave)
+            if descargando is None:
+                break
+            descargando.wait()
+        try:
+            index = self.update(fecha, descarga(fecha))
+        finally:
+            self._termina(fecha)
+        return index.get(llave)
+
+    async def busca_async(
+        self,
+        fecha: Fecha,
+        llave: Llave,
+        descarga: Callable[[Fecha], Awaitable[Iterable[OrdenConsultada]]],
+    ) -> Optional[OrdenConsultada]:
+        """
+        Igual que busca pero con una corrutina. La espera no bloquea el
+        event loop
+        """
+        fecha = _fecha(fecha)
+        loop = asyncio.get_event_loop()
+        while True:
+            index, descargando = self._turno(fecha, llave)
+            if index is not None:
+                return index.get(llave)
+            if descargando is None:
+                break
+            await loop.run_in_executor(None, descargando.wait)
+        try:
+            index = self.update(fecha, await descarga(fecha))
+        finally:
+            self._termina(fecha)
+        return index.get(llave)
+
+    def _turno(
+        self, fecha: Fecha, llave: Llave
+    ) -> Tuple[Optional[Index], Optional[threading.Event]]:
+        """
+        - (index, None): buscar en index
+        - (None, evento): otro thread descarga la fecha, esperar el evento
+        - (None, None): descargar y llamar _termina
+        """
+        index = self.index(fecha)
+        with self._lock:
+            descargando = self._descargas.get(fecha)
+            if descargando is not None:
+                return None, descargando
+            if index is not None and (
+                llave in index or not self._refrescable(fecha)
+            ):
+                return index, None
+            self._descargas[fecha] = threading.Event()
+        return None, None
+
+    def _refrescable(self, fecha: Fecha) -> bool:
+        # con self._lock
+        if self._inmutable(fecha):
+            return False
+        # la fecha pudo salir del cache después de leer el index
+        actualizada, _ = self._fechas.get(fecha, (float('-inf'), {}))
+        return time.monotonic() - actualizada >= self.min_refresco
+
+    def _termina(self, fecha: Fecha) -> None:
+        with self._lock:
+            descargando = self._descargas.pop(fecha)
+        descargando.set()
+
+    def update(
+        self, fecha: Fecha, recibidas: Iterable[OrdenConsultada]
+    ) -> Index:
+        fecha = _fecha(fecha)
+        index: Index = {}
+        for orden in recibidas:
+            for institucion in (
+                getattr(orden, 'institucionOperante', None),
+                getattr(orden, 'institucionContraparte', None),
+            ):
+                index.setdefault((orden.claveRastreo, institucion), orden)
+        with self._lock:
+            self._fechas[fecha] = (time.monotonic(), index)
+            self._fechas.move_to_end(fecha)
+            while len(self._fechas) > self.max_fechas:
+                self._fechas.popitem(last=False)
+        return index
+
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            size=len(self._fechas),
+            maxsize=self.max_fechas,
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._fechas.clear()
+            self.hits = self.misses = 0
+
+    @staticmethod
+    def _inmutable(fecha: Fecha) -> bool:
+        return fecha is not None and fecha < dt.date.today() - dt.timedelta(
+            days=1
+        )
+
+
+def _fecha(fecha: Fecha) -> Fecha:
+    # la llave es la fecha, aunque se pase un datetime
+    if isinstance(fecha, dt.datetime):
+        fecha = fecha.date()
+    return fecha
@@ -1,3 +1,4 @@
+import asyncio
 import datetime as dt
 from typing import Any, ClassVar, Dict, List, Optional, Union
 
@@ -7,15 +8,9 @@ from pydantic import conint, constr
 from pydantic.dataclasses import dataclass
 
 from ..auth import CUENTA_FIELDNAMES
-from ..types import (
-    Curp,
-    EntidadFederativa,
-    Genero,
-    MxPhoneNumber,
-    Pais,
-    Rfc,
-    truncated_stp_str,
-)
+from ..instrumentacion import fase
+from ..paises import EntidadFederativa, Pais
+from ..types import Curp, Genero, MxPhoneNumber, Rfc, truncated_stp_str
 from .base import Resource
 
 MAX_LOTE = 100
@@ -32,12 +27,14 @@ class Cuenta(Resource):
 
     @classmethod
     def alta(cls, **kwargs) -> 'Cuenta':
-        cuenta = cls(**kwargs)
-        cuenta._alta()
+        with cls._client.instrumentacion.operacion('cuentas.alta'):
+            with fase('validacion'):
+                cuenta = cls(**kwargs)
+            cuenta._alta()
         return cuenta
 
     def _alta(self) -> None:
-        self._client.put(self._endpoint, self.to_dict())
+        self._client.put(self._endpoint, self._datos_firmados())
 
     @classmethod
     def alta_lote(cls, lote: List['Cuenta']) -> Dict[str, Dict[str, Any]]:
@@ -56,13 +53,15 @@ class Cuenta(Resource):
 
     def baja(self, endpoint: Optional[str] = None) -> Dict[str, Any]:
         endpoint = endpoint or self._endpoint
-        data = dict(
+        return self._client.delete(endpoint, self._baja_data(self.firma))
+
+    def _baja_data(self, firma: str) -> Dict[str, Any]:
+        return dict(
             cuenta=self.cuenta,
             empresa=self.empresa,
             rfcCurp=self.rfcCurp,
-            firma=self.firma,
+            firma=firma,
         )
-        return self._client.delete(endpoint, data)
 
 
 @dataclass
@@ -94,3 +93,55 @@ class CuentaFisica(Cuenta):
     email: Optional[constr(max_length=150)] = None
     idIdentificacion: Optional[digits(max_length=20)] = None
     telefono: Optional[MxPhoneNumber] = None
+
+
+class AsyncCuentaFisica(CuentaFisica):
+    """
+    Versión de CuentaFisica para stpmex.AsyncClient. Los lotes mayores a
+    MAX_LOTE se envían de forma concurrente.
+    """
+
+    @classmethod
+    async def alta(cls, **kwargs) -> 'Cuenta':
+        with cls._client.instrumentacion.operacion('cuentas.alta'):
+            with fase('validacion'):
+                cuenta = cls(**kwargs)
+            await cuenta._alta()
+        return cuenta
+
+    async def _alta(self) -> None:
+        datos = await self._datos_firmados_async()
+        await self._client.put(self._endpoint, datos)
+
+    @classmethod
+    async def alta_lote(
+        cls, lote: List['Cuenta']
+    ) -> Dict[str, Dict[str, Any]]:
+        lotes = []
+        for inicio in range(0, len(lote), MAX_LOTE):
+            fin = inicio + MAX_LOTE
+            lotes.append(lote[inicio:fin])
+        firmas = await asyncio.gather(
+            *[cuenta.firma_async() for cuenta in lote]
+        )
+        datos = iter(
+            cuenta.to_dict(firma) for cuenta, firma in zip(lote, firmas)
+        )
+        resps = await asyncio.gather(
+            *[
+                cls._client.put(
+                    cls._lote_endpoint,
+                    dict(cuentasFisicas=[next(datos) for _ in lt]),
+                )
+                for lt in lotes
+            ]
+        )
+        resultado = {}
+        for lt, resp in zip(lotes, resps):
+            resultado.update(zip([cuenta.cuenta for cuenta in lt], resp))
+        return resultado
+
+    async def baja(self, endpoint: Optional[str] = None) -> Dict[str, Any]:
+        endpoint = endpoint or self._endpoint
+        firma = await self.firma_async()
+        return await self._client.delete(endpoint, self._baja_data(firma))
@@ -1,10 +1,27 @@
+import asyncio
 import datetime as dt
 import random
-import time
-from dataclasses import field, make_dataclass
-from typing import Any, ClassVar, Dict, List, Optional, Union
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import field
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-import clabe
 from clabe.types import Clabe
 from cuenca_validations.types import (
     PaymentCardNumber,
@@ -16,19 +33,27 @@ from pydantic.dataclasses import dataclass
 
 from ..auth import ORDEN_FIELDNAMES
 from ..exc import NoOrdenesEncontradas
+from ..instituciones import catalogo
+from ..instrumentacion import fase
 from ..types import (
     BeneficiarioClabe,
-    Estado,
     MxPhoneNumber,
     Prioridad,
     TipoCuenta,
     TipoOperacion,
     truncated_str,
 )
-from ..utils import strftime, strptime
+from ..utils import ClaveRastreoGenerator, strftime
 from .base import Resource
+from .consultas import OrdenConsultada
 
 STP_BANK_CODE = 90646
+TIPO_CUENTA_POR_LONGITUD = {
+    18: TipoCuenta.clabe,
+    15: TipoCuenta.card,
+    16: TipoCuenta.card,
+    10: TipoCuenta.phone_number,
+}
 
 
 @dataclass
@@ -40,6 +65,10 @@ class Orden(Resource):
 
     _endpoint: ClassVar[str] = '/ordenPago'
     _firma_fieldnames: ClassVar[List[str]] = ORDEN_FIELDNAMES
+    # Se puede reemplazar por cliente: client.ordenes.generador_clave_rastreo
+    generador_clave_rastreo: ClassVar[
+        Callable[[], str]
+    ] = ClaveRastreoGenerator()
 
     monto: StrictPositiveFloat
     conceptoPago: truncated_str(39)
@@ -57,9 +86,8 @@ class Orden(Resource):
     tipoCuentaBeneficiario: Optional[TipoCuenta] = None
     tipoCuentaOrdenante: TipoCuenta = TipoCuenta.clabe.value
 
-    claveRastreo: truncated_str(29) = field(
-        default_factory=lambda: f'CR{int(time.time())}'
-    )
+    # Si no se especifica se usa generador_clave_rastreo
+    claveRastreo: Optional[truncated_str(29)] = None
     referenciaNumerica: conint(gt=0, lt=10 ** 7) = field(
         default_factory=lambda: random.randint(10 ** 6, 10 ** 7)
     )
@@ -75,40 +103,91 @@ class Orden(Resource):
     id: Optional[int] = None
 
     def __post_init__(self):
+        if not self.claveRastreo:
+            self.claveRastreo = type(self).generador_clave_rastreo()
         cb = self.cuentaBeneficiario
         self.tipoCuentaBeneficiario = self.get_tipo_cuenta(cb)
 
     @classmethod
     def registra(cls, **kwargs) -> 'Orden':
-        orden = cls(**kwargs)
-        endpoint = orden._endpoint + '/registra'
-        resp = orden._client.put(endpoint, orden.to_dict())
-        orden.id = resp['id']
+        with cls._client.instrumentacion.operacion('ordenes.registra'):
+            with fase('validacion'):
+                orden = cls(**kwargs)
+            orden._registra()
+        return orden
+
+    def _registra(self) -> None:
+        endpoint = self._endpoint + '/registra'
+        resp = self._client.put(endpoint, self._datos_firmados())
+        self.id = resp['id']
+
+    @classmethod
+    def registra_lote(
+        cls,
+        ordenes: Iterable[Union['Orden', Dict[str, Any]]],
+        concurrency: int = 10,
+        trusted: bool = False,
+    ) -> Iterator[Tuple[int, Union['Orden', Exception]]]:
+        """
+        Registra las órdenes con hasta `concurrency` peticiones en curso.
+        Regresa (posición en `ordenes`, resultado) conforme terminan, donde
+        resultado es la Orden registrada (con id) o la excepción que se
+        levantó al validarla o registrarla. Una orden con error no detiene
+        el resto del lote.
+
+        El pool del cliente debe tener al menos `concurrency` conexiones
+        (pool_maxsize) para reusarlas. Cada thread usa su propia Session,
+        aunque el cliente no tenga session_per_thread. Con trusted=True las
+        órdenes que son dict se crean con Orden.from_trusted.
+        """
+        with ThreadPoolExecutor(
+            concurrency, initializer=cls._client.usa_session_propia
+        ) as executor:
+            pendientes: Dict[Future, int] = {}
+            for i, orden in enumerate(ordenes):
+                if len(pendientes) >= concurrency:
+                    yield from _terminadas(pendientes)
+                future = executor.submit(
+                    cls._registra_lote_orden, orden, trusted
+                )
+                pendientes[future] = i
+            while pendientes:
+                yield from _terminadas(pendientes)
+
+    @classmethod
+    def _registra_lote_orden(
+        cls, orden: Union['Orden', Dict[str, Any]], trusted: bool = False
+    ) -> Union['Orden', Exception]:
+        try:
+            with cls._client.instrumentacion.operacion('ordenes.registra'):
+                if isinstance(orden, dict):
+                    with fase('validacion'):
+                        orden = cls._crea(orden, trusted)
+                orden._registra()
+        except Exception as exc:
+            return exc
         return orden
 
+    @classmethod
+    def _crea(cls, datos: Dict[str, Any], trusted: bool) -> 'Orden':
+        if trusted:
+            return cls.from_trusted(**datos)
+        return cls(**datos)
+
     @staticmethod
     def get_tipo_cuenta(cuenta: str) -> Optional[TipoCuenta]:
-        cuenta_len = len(cuenta)
-        if cuenta_len == 18:
-            tipo = TipoCuenta.clabe
-        elif cuenta_len in {15, 16}:
-            tipo = TipoCuenta.card
-        elif cuenta_len == 10:
-            tipo = TipoCuenta.phone_number
-        else:
-            tipo = None
-        return tipo
+        return TIPO_CUENTA_POR_LONGITUD.get(len(cuenta))
 
     @validator('institucionContraparte')
     def _validate_institucion(cls, v: str) -> str:
-        if v not in clabe.BANKS.values():
+        if v not in catalogo().codigos:
             raise ValueError(f'{v} no se corresponde a un banco')
         return v
 
     @classmethod
     def consulta_recibidas(
         cls, fecha_operacion: Optional[dt.date] = None
-    ) -> List['OrdenConsultada']:  # noqa: F821
+    ) -> List[OrdenConsultada]:
         """
         Consultar
         """
@@ -117,16 +196,32 @@ class Orden(Resource):
     @classmethod
     def consulta_enviadas(
         cls, fecha_operacion: Optional[dt.date] = None
-    ) -> List['OrdenConsultada']:  # noqa: F821
+    ) -> List[OrdenConsultada]:
         return cls._consulta_fecha(TipoOperacion.enviada, fecha_operacion)
 
+    @classmethod
+    def iter_recibidas(
+        cls, fecha_operacion: Optional[dt.date] = None
+    ) -> Iterator[OrdenConsultada]:
+        """
+        Igual que consulta_recibidas pero regresa las órdenes una a una
+        conforme se reciben, sin cargar la respuesta completa en memoria
+        """
+        return cls._iter_fecha(TipoOperacion.recibida, fecha_operacion)
+
+    @classmethod
+    def iter_enviadas(
+        cls, fecha_operacion: Optional[dt.date] = None
+    ) -> Iterator[OrdenConsultada]:
+        return cls._iter_fecha(TipoOperacion.enviada, fecha_operacion)
+
     @classmethod
     def consulta_clave_rastreo(
         cls,
         claveRastreo: str,
         institucionOperante: Union[int, str],
         fechaOperacion: Optional[dt.date] = None,
-    ) -> 'OrdenConsultada':  # noqa: F821
+    ) -> OrdenConsultada:
         """
         Consultar ordenes por clave rastreo. Exclude the fechaOperacion if
         looking up transactions from the same day or when the fechaOperacion is
@@ -149,26 +244,52 @@ class Orden(Resource):
     @classmethod
     def _consulta_fecha(
         cls, tipo: TipoOperacion, fechaOperacion: Optional[dt.date] = None
-    ) -> List['OrdenConsultada']:  # noqa: F821
+    ) -> List[OrdenConsultada]:
         """
         Exclude the fechaOperacion if looking up transactions from the same
         day or when the fechaOperacion is in the future, in the event of this
         function being called during non-banking hours (9am – 6pm) / days.
         """
         endpoint = cls._endpoint + '/consOrdenesFech'
+        with cls._client.instrumentacion.operacion('ordenes.consulta_fecha'):
+            consulta = cls._consulta_fecha_data(tipo, fechaOperacion)
+            try:
+                resp = cls._client.post(endpoint, consulta)
+            except NoOrdenesEncontradas:
+                return []
+            with fase('conversion'):
+                return cls._sanitize_lst(resp)
+
+    @classmethod
+    def _iter_fecha(
+        cls, tipo: TipoOperacion, fechaOperacion: Optional[dt.date] = None
+    ) -> Iterator[OrdenConsultada]:
+        endpoint = cls._endpoint + '/consOrdenesFech'
+        consulta = cls._consulta_fecha_data(tipo, fechaOperacion)
+        ordenes = cls._client.stream('post', endpoint, consulta, 'lst')
+        try:
+            for orden in ordenes:
+                if orden:
+                    yield cls._sanitize_consulta(orden)
+        except NoOrdenesEncontradas:
+            return
+
+    @classmethod
+    def _consulta_fecha_data(
+        cls, tipo: TipoOperacion, fechaOperacion: Optional[dt.date] = None
+    ) -> Dict[str, Any]:
+        consulta = cls._consulta_fecha_campos(tipo, fechaOperacion)
+        consulta['firma'] = cls._firma_consulta(consulta)
+        return consulta
+
+    @classmethod
+    def _consulta_fecha_campos(
+        cls, tipo: TipoOperacion, fechaOperacion: Optional[dt.date] = None
+    ) -> Dict[str, Any]:
         consulta = dict(empresa=cls.empresa, estado=tipo)
         if fechaOperacion:
             consulta['fechaOperacion'] = strftime(fechaOperacion)
-        consulta['firma'] = cls._firma_consulta(consulta)
-        try:
-            resp = cls._client.post(endpoint, consulta)
-        except NoOrdenesEncontradas:
-            ordenes = []
-        else:
-            ordenes = [
-                cls._sanitize_consulta(orden) for orden in resp['lst'] if orden
-            ]
-        return ordenes
+        return consulta
 
     @classmethod
     def _consulta_clave_rastreo_enviada(
@@ -176,8 +297,34 @@ class Orden(Resource):
         claveRastreo: str,
         institucionOperante: int,
         fechaOperacion: Optional[dt.date] = None,
-    ) -> 'OrdenConsultada':  # noqa: F821
+    ) -> OrdenConsultada:
         endpoint = cls._endpoint + '/consOrdEnvRastreo'
+        consulta = cls._consulta_clave_rastreo_data(
+            claveRastreo, institucionOperante, fechaOperacion
+        )
+        resp = cls._client.post(endpoint, consulta)['ordenPago']
+        return cls._sanitize_consulta(resp)
+
+    @classmethod
+    def _consulta_clave_rastreo_data(
+        cls,
+        claveRastreo: str,
+        institucionOperante: int,
+        fechaOperacion: Optional[dt.date] = None,
+    ) -> Dict[str, Any]:
+        consulta = cls._consulta_clave_rastreo_campos(
+            claveRastreo, institucionOperante, fechaOperacion
+        )
+        consulta['firma'] = cls._firma_consulta(consulta)
+        return consulta
+
+    @classmethod
+    def _consulta_clave_rastreo_campos(
+        cls,
+        claveRastreo: str,
+        institucionOperante: int,
+        fechaOperacion: Optional[dt.date] = None,
+    ) -> Dict[str, Any]:
         consulta = dict(
             empresa=cls.empresa,
             claveRastreo=claveRastreo,
@@ -185,9 +332,7 @@ class Orden(Resource):
         )
         if fechaOperacion:
             consulta['fechaOperacion'] = strftime(fechaOperacion)
-        consulta['firma'] = cls._firma_consulta(consulta)
-        resp = cls._client.post(endpoint, consulta)['ordenPago']
-        return cls._sanitize_consulta(resp)
+        return consulta
 
     @classmethod
     def _consulta_clave_rastreo_recibida(
@@ -195,35 +340,205 @@ class Orden(Resource):
         claveRastreo: str,
         institucionOperante: int,
         fechaOperacion: Optional[dt.date] = None,
-    ) -> 'OrdenConsultada':  # noqa: F821
-        recibidas = cls.consulta_recibidas(fechaOperacion)
-        orden = None
-        for o in recibidas:
-            if o.claveRastreo == claveRastreo and institucionOperante in (
-                o.institucionOperante,
-                o.institucionContraparte,
-            ):
-                orden = o
-                break
-        if not orden:
+    ) -> OrdenConsultada:
+        orden = cls._client.recibidas_cache.busca(
+            fechaOperacion,
+            (claveRastreo, institucionOperante),
+            cls.consulta_recibidas,
+        )
+        if orden is None:
             raise NoOrdenesEncontradas
         return orden
 
+    @classmethod
+    def _sanitize_lst(cls, resp: Dict[str, Any]) -> List[OrdenConsultada]:
+        return [
+            cls._sanitize_consulta(orden) for orden in resp['lst'] if orden
+        ]
+
     @staticmethod
-    def _sanitize_consulta(
-        orden: Dict[str, Any]
-    ) -> 'OrdenConsultada':  # noqa: F821
-        sanitized = {}
-        for k, v in orden.items():
-            if k.startswith('ts'):
-                v /= 10 ** 3  # convertir de milisegundos a segundos
-                if v > 10 ** 9:
-                    v = dt.datetime.fromtimestamp(v)
-            elif k == 'fechaOperacion':
-                v = strptime(v)
-            elif k == 'estado':
-                v = Estado(v)
-            elif isinstance(v, str):
-                v = v.rstrip()
-            sanitized[k] = v
-        return make_dataclass('OrdenConsultada', sanitized.keys())(**sanitized)
+    def _sanitize_consulta(orden: Dict[str, Any]) -> OrdenConsultada:
+        return OrdenConsultada.from_stp(orden)
+
+
+class AsyncOrden(Orden):
+    """
+    Versión de Orden para stpmex.AsyncClient. Los métodos que hacen
+    peticiones a STP son corrutinas.
+    """
+
+    @classmethod
+    async def registra(cls, **kwargs) -> 'Orden':
+        with cls._client.instrumentacion.operacion('ordenes.registra'):
+            with fase('validacion'):
+                orden = cls(**kwargs)
+            await orden._registra()
+        return orden
+
+    async def _registra(self) -> None:
+        endpoint = self._endpoint + '/registra'
+        datos = await self._datos_firmados_async()
+        resp = await self._client.put(endpoint, datos)
+        self.id = resp['id']
+
+    @classmethod
+    async def registra_lote(
+        cls,
+        ordenes: Iterable[Union['Orden', Dict[str, Any]]],
+        concurrency: int = 10,
+        trusted: bool = False,
+    ) -> AsyncIterator[Tuple[int, Union['Orden', Exception]]]:
+        """
+        Igual que Orden.registra_lote pero como generador asíncrono:
+        `async for i, resultado in client.ordenes.registra_lote(...)`
+        """
+        pendientes: Dict[asyncio.Future, int] = {}
+        for i, orden in enumerate(ordenes):
+            if len(pendientes) >= concurrency:
+                for terminada in await _async_terminadas(pendientes):
+                    yield terminada
+            future = asyncio.ensure_future(
+                cls._registra_lote_orden(orden, trusted)
+            )
+            pendientes[future] = i
+        while pendientes:
+            for terminada in await _async_terminadas(pendientes):
+                yield terminada
+
+    @classmethod
+    async def _registra_lote_orden(
+        cls, orden: Union['Orden', Dict[str, Any]], trusted: bool = False
+    ) -> Union['Orden', Exception]:
+        try:
+            with cls._client.instrumentacion.operacion('ordenes.registra'):
+                if isinstance(orden, dict):
+                    with fase('validacion'):
+                        orden = cls._crea(orden, trusted)
+                await orden._registra()
+        except Exception as exc:
+            return exc
+        return orden
+
+    @classmethod
+    async def consulta_recibidas(
+        cls, fecha_operacion: Optional[dt.date] = None
+    ) -> List[OrdenConsultada]:
+        return await cls._consulta_fecha(
+            TipoOperacion.recibida, fecha_operacion
+        )
+
+    @classmethod
+    async def consulta_enviadas(
+        cls, fecha_operacion: Optional[dt.date] = None
+    ) -> List[OrdenConsultada]:
+        return await cls._consulta_fecha(
+            TipoOperacion.enviada, fecha_operacion
+        )
+
+    @classmethod
+    def iter_recibidas(
+        cls, fecha_operacion: Optional[dt.date] = None
+    ) -> AsyncIterator[OrdenConsultada]:
+        return cls._iter_fecha(TipoOperacion.recibida, fecha_operacion)
+
+    @classmethod
+    def iter_enviadas(
+        cls, fecha_operacion: Optional[dt.date] = None
+    ) -> AsyncIterator[OrdenConsultada]:
+        return cls._iter_fecha(TipoOperacion.enviada, fecha_operacion)
+
+    @classmethod
+    async def _iter_fecha(
+        cls, tipo: TipoOperacion, fechaOperacion: Optional[dt.date] = None
+    ) -> AsyncIterator[OrdenConsultada]:
+        endpoint = cls._endpoint + '/consOrdenesFech'
+        consulta = await cls._consulta_fecha_data(tipo, fechaOperacion)
+        ordenes = cls._client.stream('post', endpoint, consulta, 'lst')
+        try:
+            async for orden in ordenes:
+                if orden:
+                    yield cls._sanitize_consulta(orden)
+        except NoOrdenesEncontradas:
+            return
+
+    @classmethod
+    async def _consulta_fecha(
+        cls, tipo: TipoOperacion, fechaOperacion: Optional[dt.date] = None
+    ) -> List[OrdenConsultada]:
+        endpoint = cls._endpoint + '/consOrdenesFech'
+        with cls._client.instrumentacion.operacion('ordenes.consulta_fecha'):
+            consulta = await cls._consulta_fecha_data(tipo, fechaOperacion)
+            try:
+                resp = await cls._client.post(endpoint, consulta)
+            except NoOrdenesEncontradas:
+                return []
+            with fase('conversion'):
+                return cls._sanitize_lst(resp)
+
+    @classmethod
+    async def _consulta_fecha_data(
+        cls, tipo: TipoOperacion, fechaOperacion: Optional[dt.date] = None
+    ) -> Dict[str, Any]:
+        consulta = cls._consulta_fecha_campos(tipo, fechaOperacion)
+        consulta['firma'] = await cls._firma_consulta_async(consulta)
+        return consulta
+
+    @classmethod
+    async def _consulta_clave_rastreo_data(
+        cls,
+        claveRastreo: str,
+        institucionOperante: int,
+        fechaOperacion: Optional[dt.date] = None,
+    ) -> Dict[str, Any]:
+        consulta = cls._consulta_clave_rastreo_campos(
+            claveRastreo, institucionOperante, fechaOperacion
+        )
+        consulta['firma'] = await cls._firma_consulta_async(consulta)
+        return consulta
+
+    @classmethod
+    async def _consulta_clave_rastreo_enviada(
+        cls,
+        claveRastreo: str,
+        institucionOperante: int,
+        fechaOperacion: Optional[dt.date] = None,
+    ) -> OrdenConsultada:
+        endpoint = cls._endpoint + '/consOrdEnvRastreo'
+        consulta = await cls._consulta_clave_rastreo_data(
+            claveRastreo, institucionOperante, fechaOperacion
+        )
+        resp = await cls._client.post(endpoint, consulta)
+        return cls._sanitize_consulta(resp['ordenPago'])
+
+    @classmethod
+    async def _consulta_clave_rastreo_recibida(
+        cls,
+        claveRastreo: str,
+        institucionOperante: int,
+        fechaOperacion: Optional[dt.date] = None,
+    ) -> OrdenConsultada:
+        orden = await cls._client.recibidas_cache.busca_async(
+            fechaOperacion,
+            (claveRastreo, institucionOperante),
+            cls.consulta_recibidas,
+        )
+        if orden is None:
+            raise NoOrdenesEncontradas
+        return orden
+
+
+def _terminadas(
+    pendientes: Dict[Future, int]
+) -> Iterator[Tuple[int, Union[Orden, Exception]]]:
+    terminadas, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+    for future in terminadas:
+        yield pendientes.pop(future), future.result()
+
+
+async def _async_terminadas(
+    pendientes: Dict[asyncio.Future, int]
+) -> List[Tuple[int, Union[Orden, Exception]]]:
+    terminadas, _ = await asyncio.wait(
+        pendientes, return_when=asyncio.FIRST_COMPLETED
+    )
+    return [(pendientes.pop(future), future.result()) for future in terminadas]
@@ -1,13 +1,15 @@
-from typing import ClassVar, List
+from typing import Any, ClassVar, Dict, List
 from xml.etree import ElementTree
 
 from pydantic import PositiveFloat, PositiveInt
 from pydantic.dataclasses import dataclass
 
-from ..auth import compute_signature
+from ..instrumentacion import fase
 from ..types import TipoOperacion
 from .base import Resource
 
+SOAP_CONSULTA_SALDO = 'consultaSaldoCuenta'
+
 
 @dataclass
 class Saldo(Resource):
@@ -21,6 +23,10 @@ class Saldo(Resource):
     def consulta_saldo_env_rec(cls) -> List['Saldo']:
         data = dict(empresa=cls.empresa, firma=cls._firma_consulta({}))
         resp = cls._client.post(cls._endpoint, data)
+        return cls._parse_saldos(resp)
+
+    @classmethod
+    def _parse_saldos(cls, resp: Dict[str, Any]) -> List['Saldo']:
         saldos = []
         for saldo in resp['saldos']:
             del saldo['empresa']
@@ -36,8 +42,20 @@ class Saldo(Resource):
         https://stpmex.zendesk.com/hc/es/articles/360002812571-consultaSaldoCuenta
         """
         client = cls._client
-        firma = compute_signature(client.pkey, cuenta)
-        data = f'''
+        with client.instrumentacion.operacion('saldos.consulta'):
+            sobre = cls._soap_consulta(cuenta)
+            resp = client.soap(SOAP_CONSULTA_SALDO, sobre)
+            with fase('conversion'):
+                return cls._parse_saldo(resp)
+
+    @classmethod
+    def _soap_consulta(cls, cuenta: str) -> str:
+        firma = cls._client.cached_signature(cuenta)
+        return cls._sobre(cuenta, firma)
+
+    @staticmethod
+    def _sobre(cuenta: str, firma: str) -> str:
+        return f'''
 <soapenv:Envelope
         xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
         xmlns:h2h="http://h2h.integration.spei.enlacefi.lgec.com/">
@@ -49,9 +67,33 @@ class Saldo(Resource):
     </soapenv:Body>
 </soapenv:Envelope>
 '''
-        resp = client.session.post(client.soap_url, data)
-        if not resp.ok:
-            resp.raise_for_status()
-        root = ElementTree.fromstring(resp.text)
+
+    @staticmethod
+    def _parse_saldo(text: str) -> float:
+        root = ElementTree.fromstring(text)
         saldo = root.findtext('.//saldo')
         return float(saldo)
+
+
+class AsyncSaldo(Saldo):
+    """
+    Versión de Saldo para stpmex.AsyncClient
+    """
+
+    @classmethod
+    async def consulta_saldo_env_rec(cls) -> List['Saldo']:
+        firma = await cls._firma_consulta_async({})
+        data = dict(empresa=cls.empresa, firma=firma)
+        resp = await cls._client.post(cls._endpoint, data)
+        return cls._parse_saldos(resp)
+
+    @classmethod
+    async def consulta(cls, cuenta: str) -> float:
+        client = cls._client
+        with client.instrumentacion.operacion('saldos.consulta'):
+            firma = await client.cached_signature_async(cuenta)
+            resp = await client.soap(
+                SOAP_CONSULTA_SALDO, cls._sobre(cuenta, firma)
+            )
+            with fase('conversion'):
+                return cls._parse_saldo(resp)
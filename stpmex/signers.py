@@ -0,0 +1,413 @@
+"""
+Firmas de las peticiones a STP. El cliente delega en un Signer:
+
+- RsaSigner: firma en el proceso con la llave privada (default)
+- BulkSigner: firma en un pool de procesos, para lotes grandes
+- BatchSigner: agrupa las firmas que se piden al mismo tiempo para
+mandarlas juntas a otro Signer, e.g. BulkSigner o SocketSigner
+- SocketSigner: pide las firmas a un SignerServer local, para que varios
+procesos compartan la llave sin descifrarla cada uno
+"""
+import asyncio
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+
+from .auth import compute_signature, key_fingerprint
+from .exc import InvalidPassphrase, SignerError
+
+
+class Signer:
+    fingerprint: str  # identifica la llave, e.g. para SignatureCache
+
+    def sign(self, text: str) -> str:
+        raise NotImplementedError  # pragma: no cover
+
+    def sign_many(self, texts: Iterable[str]) -> List[str]:
+        return [self.sign(text) for text in texts]
+
+    async def sign_async(self, text: str) -> str:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.sign, text)
+
+    def sign_resources(
+        self, resources: Iterable['Resource']  # noqa: F821
+    ) -> List[str]:
+        return self.sign_many(
+            resource._cadena_original() for resource in resources
+        )
+
+    def to_dicts(
+        self, resources: Iterable['Resource']  # noqa: F821
+    ) -> List[Dict[str, Any]]:
+        """
+        resource.to_dict() de cada recurso con firmas de sign_many
+        """
+        resources = list(resources)
+        return [
+            resource.to_dict(firma=firma)
+            for resource, firma in zip(
+                resources, self.sign_resources(resources)
+            )
+        ]
+
+    def close(self) -> None:
+        ...
+
+    def __enter__(self) -> 'Signer':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class RsaSigner(Signer):
+    def __init__(self, pkey: RSAPrivateKey):
+        self.pkey = pkey
+        self.fingerprint = key_fingerprint(pkey)
+
+    @classmethod
+    def from_pem(
+        cls, priv_key: str, priv_key_passphrase: Optional[str] = None
+    ) -> 'RsaSigner':
+        """
+        Sin passphrase la llave debe estar sin cifrar
+        """
+        password = None
+        if priv_key_passphrase is not None:
+            password = priv_key_passphrase.encode('ascii')
+        try:
+            pkey = serialization.load_pem_private_key(
+                priv_key.encode('utf-8'), password, default_backend()
+            )
+        except (ValueError, TypeError, UnsupportedAlgorithm):
+            raise InvalidPassphrase
+        return cls(pkey)
+
+    def sign(self, text: str) -> str:
+        return compute_signature(self.pkey, text)
+
+
+_worker_pkey: Optional[RSAPrivateKey] = None
+
+
+def _init_worker(der: bytes) -> None:
+    global _worker_pkey
+    _worker_pkey = serialization.load_der_private_key(
+        der, None, default_backend()
+    )
+
+
+def _sign_worker(text: str) -> str:
+    return compute_signature(_worker_pkey, text)
+
+
+class BulkSigner(Signer):
+    """
+    Firma en paralelo con un pool de procesos. Cada proceso carga la llave
+    una sola vez y sign_many regresa las firmas en el mismo orden que las
+    cadenas.
+
+    La llave se pasa a los procesos sin cifrar (DER) a través del pipe de
+    multiprocessing.
+    """
+
+    def __init__(
+        self,
+        pkey: RSAPrivateKey,
+        max_workers: Optional[int] = None,
+        chunksize: int = 256,
+        al_firmar: Optional[Callable[[int], None]] = None,
+    ):
+        der = pkey.private_bytes(
+            serialization.Encoding.DER,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        self.fingerprint = key_fingerprint(pkey)
+        self.chunksize = chunksize
+        # recibe el número de firmas, e.g. Client.bulk_signer cuenta las
+        # firmas del cliente
+        self.al_firmar = al_firmar
+        self._executor = ProcessPoolExecutor(
+            max_workers, initializer=_init_worker, initargs=(der,)
+        )
+
+    def sign(self, text: str) -> str:
+        firma = self._executor.submit(_sign_worker, text).result()
+        self._firmadas(1)
+        return firma
+
+    def sign_many(self, texts: Iterable[str]) -> List[str]:
+        firmas = list(
+            self._executor.map(_sign_worker, texts, chunksize=self.chunksize)
+        )
+        self._firmadas(len(firmas))
+        return firmas
+
+    async def sign_async(self, text: str) -> str:
+        firma = await asyncio.wrap_future(
+            self._executor.submit(_sign_worker, text)
+        )
+        self._firmadas(1)
+        return firma
+
+    def _firmadas(self, cantidad: int) -> None:
+        if self.al_firmar is not None:
+            self.al_firmar(cantidad)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+
+class BatchSigner(Signer):
+    """
+    Junta las firmas que se piden desde varios threads o tareas en lotes de
+    hasta `max_batch` cadenas, esperando a lo más `max_delay` segundos, y
+    las firma con signer.sign_many
+    """
+
+    def __init__(
+        self, signer: Signer, max_batch: int = 64, max_delay: float = 0.002
+    ):
+        self.signer = signer
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pendientes: 'queue.Queue[Optional[Tuple[str, Future]]]'
+        self._pendientes = queue.Queue()
+        self._cerrado = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def fingerprint(self) -> str:
+        return self.signer.fingerprint
+
+    def sign(self, text: str) -> str:
+        return self._submit(text).result()
+
+    def sign_many(self, texts: Iterable[str]) -> List[str]:
+        return self.signer.sign_many(texts)
+
+    async def sign_async(self, text: str) -> str:
+        return await asyncio.wrap_future(self._submit(text))
+
+    def _submit(self, text: str) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._cerrado:
+                raise SignerError(error='BatchSigner cerrado')
+            self._pendientes.put((text, future))
+        return future
+
+    def _run(self) -> None:
+        try:
+            self._firma_pendientes()
+        finally:
+            # nadie más va a firmar lo que quede en la cola
+            with self._lock:
+                self._cerrado = True
+            self._falla_pendientes()
+
+    def _falla_pendientes(self) -> None:
+        while True:
+            try:
+                pendiente = self._pendientes.get_nowait()
+            except queue.Empty:
+                return
+            if pendiente is not None:
+                pendiente[1].set_exception(
+                    SignerError(error='BatchSigner cerrado')
+                )
+
+    def _firma_pendientes(self) -> None:
+        terminado = False
+        while not terminado:
+            pendiente = self._pendientes.get()
+            if pendiente is None:
+                break
+            lote = [pendiente]
+            limite = time.monotonic() + self.max_delay
+            while len(lote) < self.max_batch:
+                espera = limite - time.monotonic()
+                try:
+                    pendiente = self._pendientes.get(timeout=max(espera, 0))
+                except queue.Empty:
+                    break
+                if pendiente is None:
+                    terminado = True
+                    break
+                lote.append(pendiente)
+            self._sign_lote(lote)
+
+    def _sign_lote(self, lote: List[Tuple[str, Future]]) -> None:
+        try:
+            firmas = self.signer.sign_many(text for text, _ in lote)
+        except BaseException as exc:
+            for _, future in lote:
+                future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise  # e.g. SystemExit termina el thread
+        else:
+            for (_, future), firma in zip(lote, firmas):
+                future.set_result(firma)
+
+    def close(self) -> None:
+        """
+        Firma lo que ya se pidió. Después sign y sign_async levantan
+        SignerError
+        """
+        with self._lock:
+            if not self._cerrado:
+                self._cerrado = True
+                self._pendientes.put(None)
+        self._thread.join()
+        self.signer.close()
+
+
+class SocketSigner(Signer):
+    """
+    Pide las firmas a un SignerServer por un socket unix. Usa una conexión
+    por SocketSigner y se reconecta si el servidor se reinicia.
+
+    Protocolo: una línea json por petición y respuesta
+    {"op": "sign", "texts": [...]} -> {"firmas": [...]}
+    {"op": "fingerprint"} -> {"fingerprint": "..."}
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = 10.0):
+        self.path = path
+        self.timeout = timeout
+        self._fingerprint: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._file: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            self._fingerprint = self._call(dict(op='fingerprint'))[
+                'fingerprint'
+            ]
+        return self._fingerprint
+
+    def sign(self, text: str) -> str:
+        return self.sign_many([text])[0]
+
+    def sign_many(self, texts: Iterable[str]) -> List[str]:
+        return self._call(dict(op='sign', texts=list(texts)))['firmas']
+
+    def _call(self, peticion: Dict[str, Any]) -> Dict[str, Any]:
+        linea = json.dumps(peticion).encode('utf-8') + b'\n'
+        with self._lock:
+            for intento in range(2):
+                try:
+                    if self._file is None:
+                        self._connect()
+                    self._file.write(linea)
+                    self._file.flush()
+                    respuesta = self._file.readline()
+                    if not respuesta:
+                        raise ConnectionError('SignerServer cerró el socket')
+                    break
+                except OSError:
+                    self.close()
+                    if intento:
+                        raise
+        resp = json.loads(respuesta)
+        if 'error' in resp:
+            raise SignerError(**resp)
+        return resp
+
+    def _connect(self) -> None:
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(self.timeout)
+        self._sock.connect(self.path)
+        self._file = self._sock.makefile('rwb')
+
+    def close(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass  # datos sin enviar de una conexión rota
+            self._sock.close()
+        self._file = self._sock = None
+
+
+class _SignerHandler(socketserver.StreamRequestHandler):
+    server: 'SignerServer'
+
+    def handle(self) -> None:
+        for linea in self.rfile:
+            try:
+                resp = self._responde(json.loads(linea))
+            except Exception as exc:
+                resp = dict(error=repr(exc))
+            self.wfile.write(json.dumps(resp).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+    def _responde(self, peticion: Dict[str, Any]) -> Dict[str, Any]:
+        signer = self.server.signer
+        if peticion['op'] == 'fingerprint':
+            return dict(fingerprint=signer.fingerprint)
+        return dict(firmas=signer.sign_many(peticion['texts']))
+
+
+class SignerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Daemon que tiene la llave cargada y firma para los SocketSigner:
+
+    signer = RsaSigner.from_pem(priv_key, passphrase)
+    SignerServer(signer, '/run/stpmex/signer.sock').serve_forever()
+
+    El socket tiene permisos 0600. Si ya hay un servidor en path se
+    levanta SignerError; un socket que quedó de un proceso que terminó se
+    reemplaza.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, signer: Signer, path: str):
+        self.signer = signer
+        if os.path.exists(path):
+            if _escuchando(path):
+                raise SignerError(error='SignerServer activo', path=path)
+            os.unlink(path)
+        super().__init__(path, _SignerHandler, bind_and_activate=False)
+        try:
+            self.server_bind()
+            # antes de listen, nadie se puede conectar con otros permisos
+            os.chmod(path, 0o600)
+            self.server_activate()
+        except BaseException:
+            self.server_close()
+            raise
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def _escuchando(path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
@@ -0,0 +1,427 @@
+"""
+Simulador local de STP para pruebas de carga y latencia sin salir a la red.
+Atiende los endpoints REST de órdenes, saldos y cuentas y el servicio SOAP
+consultaSaldoCuenta:
+
+simulador = Simulador(llave_publica, saldos={'646180110400000007': 1e6})
+servidor = SimuladorServer(simulador)
+threading.Thread(target=servidor.serve_forever, daemon=True).start()
+client = Client(
+    'TAMIZI', priv_key, passphrase,
+    base_url=servidor.base_url, soap_url=servidor.soap_url,
+)
+
+o desde la terminal:
+
+python -m stpmex.simulador --llave-publica llave.pub --latencia 0.05
+
+Con llave_publica verifica las firmas. Las claves de rastreo registradas no
+se pueden repetir. latencia, variacion, tasa_errores y max_por_segundo
+inyectan retrasos, errores de STP y respuestas 429.
+"""
+import argparse
+import datetime as dt
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+
+from .auth import (
+    CUENTA_FIELDNAMES,
+    ORDEN_FIELDNAMES,
+    cadena_consulta,
+    compile_join,
+    verify_signature,
+)
+
+REST_PATH = '/speiws/rest'
+SOAP_PATH = '/spei/webservices/SpeiConsultaServices'
+JSON_CONTENT_TYPE = 'application/json'
+XML_CONTENT_TYPE = 'text/xml; charset=utf-8'
+CUENTA_EN_REVISION = dict(descripcion='Cuenta en revisión.', id=0)
+SOAP_ENVELOPE = (
+    "<?xml version='1.0' encoding='UTF-8'?>"
+    '<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/">'
+    '<S:Body>{}</S:Body></S:Envelope>'
+)
+
+# (status, content type, cuerpo)
+Respuesta = Tuple[int, str, bytes]
+
+_join_orden = compile_join(tuple(ORDEN_FIELDNAMES))
+_join_cuenta = compile_join(tuple(CUENTA_FIELDNAMES))
+
+
+def _json(cuerpo: Any, status: int = 200) -> Respuesta:
+    return status, JSON_CONTENT_TYPE, json.dumps(cuerpo).encode('utf-8')
+
+
+def _error(descripcion: str, id: int) -> Respuesta:
+    return _json(dict(resultado=dict(descripcionError=descripcion, id=id)))
+
+
+def _soap(cuerpo: str, status: int = 200) -> Respuesta:
+    xml = SOAP_ENVELOPE.format(cuerpo).encode('utf-8')
+    return status, XML_CONTENT_TYPE, xml
+
+
+def _soap_fault(mensaje: str) -> Respuesta:
+    fault = (
+        '<ns0:Fault xmlns:ns0="http://schemas.xmlsoap.org/soap/envelope/">'
+        f'<faultcode>ns0:Server</faultcode><faultstring>{mensaje}'
+        '</faultstring></ns0:Fault>'
+    )
+    return _soap(fault, 500)
+
+
+def _hoy() -> int:
+    return int(dt.date.today().strftime('%Y%m%d'))
+
+
+class Simulador:
+    """
+    Estado del simulador, independiente del servidor HTTP:
+
+    - llave_publica: verifica las firmas. Sin ella se aceptan todas
+    - saldos: CLABE -> saldo para consultaSaldoCuenta. Las órdenes
+    registradas se descuentan de la cuenta ordenante
+    - recibidas: órdenes (como las regresa STP) para las consultas de
+    recibidas
+    - latencia + uniform(0, variacion): segundos que tarda cada respuesta
+    - tasa_errores: fracción de peticiones que responden "No se recibió
+    respuesta del servicio", o codigo_error si se da
+    - max_por_segundo: arriba de esta tasa se responde 429
+    """
+
+    def __init__(
+        self,
+        llave_publica: Optional[RSAPublicKey] = None,
+        saldos: Optional[Dict[str, float]] = None,
+        recibidas: Optional[List[Dict[str, Any]]] = None,
+        latencia: float = 0.0,
+        variacion: float = 0.0,
+        tasa_errores: float = 0.0,
+        codigo_error: Optional[int] = None,
+        max_por_segundo: Optional[float] = None,
+        semilla: Optional[int] = None,
+    ):
+        self.llave_publica = llave_publica
+        self.saldos = dict(saldos or {})
+        self.recibidas = list(recibidas or [])
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_errores = tasa_errores
+        self.codigo_error = codigo_error
+        self.max_por_segundo = max_por_segundo
+        self.ordenes: Dict[str, Dict[str, Any]] = {}  # por claveRastreo
+        self.cuentas: Dict[str, Dict[str, Any]] = {}
+        self.contadores: Dict[str, int] = dict(
+            peticiones=0, errores_inyectados=0, limitadas=0, firmas_invalidas=0
+        )
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._tokens = max_por_segundo or 0.0
+        self._ultimo = time.monotonic()
+        self._rutas = {
+            (metodo, REST_PATH + endpoint): handler
+            for metodo, endpoint, handler in [
+                ('PUT', '/ordenPago/registra', self._registra_orden),
+                ('POST', '/ordenPago/consOrdenesFech', self._consulta_fecha),
+                (
+                    'POST',
+                    '/ordenPago/consOrdEnvRastreo',
+                    self._consulta_rastreo,
+                ),
+                ('POST', '/ordenPago/consSaldoEnvRec', self._saldo_env_rec),
+                ('PUT', '/cuentaModule/fisica', self._alta_cuenta),
+                ('PUT', '/cuentaModule/fisicas', self._alta_cuentas),
+                ('DELETE', '/cuentaModule/fisica', self._baja_cuenta),
+            ]
+        }
+
+    def demora(self) -> float:
+        return self.latencia + self._random.uniform(0, self.variacion)
+
+    def responde(self, metodo: str, ruta: str, cuerpo: bytes) -> Respuesta:
+        with self._lock:
+            self.contadores['peticiones'] += 1
+            if self._limitada():
+                self.contadores['limitadas'] += 1
+                return _json(dict(error='Too Many Requests'), 429)
+            if self._random.random() < self.tasa_errores:
+                self.contadores['errores_inyectados'] += 1
+                return self._error_inyectado(ruta)
+            if ruta == SOAP_PATH:
+                return self._consulta_saldo(cuerpo.decode('utf-8'))
+            try:
+                handler = self._rutas[(metodo, ruta)]
+            except KeyError:
+                return _json(dict(error='Not Found'), 404)
+            try:
+                datos = json.loads(cuerpo)
+            except ValueError:
+                return _json(dict(error='Bad Request'), 400)
+            return handler(datos)
+
+    def _limitada(self) -> bool:
+        """
+        Token bucket de max_por_segundo tokens por segundo
+        """
+        if not self.max_por_segundo:
+            return False
+        ahora = time.monotonic()
+        self._tokens = min(
+            self.max_por_segundo,
+            self._tokens + (ahora - self._ultimo) * self.max_por_segundo,
+        )
+        self._ultimo = ahora
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def _error_inyectado(self, ruta: str) -> Respuesta:
+        if self.codigo_error:
+            return _json(dict(error='Error inyectado'), self.codigo_error)
+        if ruta == SOAP_PATH:
+            return _soap_fault('No se recibió respuesta del servicio')
+        return _error('No se recibió respuesta del servicio', 0)
+
+    def _firma_valida(self, cadena: str, firma: Optional[str]) -> bool:
+        if self.llave_publica is None:
+            return True
+        if firma and verify_signature(self.llave_publica, cadena, firma):
+            return True
+        self.contadores['firmas_invalidas'] += 1
+        return False
+
+    def _registra_orden(self, orden: Dict[str, Any]) -> Respuesta:
+        cadena = _join_orden(SimpleNamespace(**orden))
+        if not self._firma_valida(cadena, orden.get('firma')):
+            return _error('Error validando la firma', 0)
+        clave = orden.get('claveRastreo')
+        if not clave:
+            return _error('El campo Clave de rastreo es obligatorio', 0)
+        if clave in self.ordenes:
+            return _error(f'La clave de rastreo {clave} ya fue utilizada', -1)
+        id = len(self.ordenes) + 1
+        ts = int(time.time() * 1000)
+        self.ordenes[clave] = dict(
+            {k: v for k, v in orden.items() if k != 'firma'},
+            estado='LQ',
+            fechaOperacion=_hoy(),
+            idEF=id,
+            tsCaptura=ts,
+            tsLiquidacion=ts,
+        )
+        cuenta = orden.get('cuentaOrdenante')
+        if cuenta in self.saldos:
+            self.saldos[cuenta] -= orden['monto']
+        return _json(dict(resultado=dict(id=id)))
+
+    def _consulta_valida(self, consulta: Dict[str, Any]) -> bool:
+        cadena = cadena_consulta(consulta.get('empresa', ''), consulta)
+        return self._firma_valida(cadena, consulta.get('firma'))
+
+    def _consulta_fecha(self, consulta: Dict[str, Any]) -> Respuesta:
+        if not self._consulta_valida(consulta):
+            return _error('Error validando la firma', 0)
+        fecha = int(consulta.get('fechaOperacion') or _hoy())
+        if consulta.get('estado') == 'R':
+            ordenes = self.recibidas
+        else:
+            ordenes = list(self.ordenes.values())
+        lst = [o for o in ordenes if o.get('fechaOperacion') == fecha]
+        if not lst:
+            return _error('No se encontraron ordenes', -100)
+        return _json(dict(resultado=dict(id=1, lst=lst)))
+
+    def _consulta_rastreo(self, consulta: Dict[str, Any]) -> Respuesta:
+        if not self._consulta_valida(consulta):
+            return _error('Error validando la firma', 0)
+        clave = consulta.get('claveRastreo')
+        orden = self.ordenes.get(clave)
+        fecha = consulta.get('fechaOperacion')
+        if orden is None or (fecha and int(fecha) != orden['fechaOperacion']):
+            return _error(f'No se encontró la orden con rastreo {clave}', -100)
+        return _json(dict(resultado=dict(id=1, ordenPago=orden)))
+
+    def _saldo_env_rec(self, consulta: Dict[str, Any]) -> Respuesta:
+        if not self._consulta_valida(consulta):
+            return _error('Error validando la firma', 0)
+        saldos = []
+        for tipo, ordenes in [
+            ('E', list(self.ordenes.values())),
+            ('R', self.recibidas),
+        ]:
+            if ordenes:  # STP no regresa totales en cero
+                saldos.append(
+                    dict(
+                        empresa=consulta.get('empresa'),
+                        montoTotal=f'{sum(o["monto"] for o in ordenes):.2f}',
+                        tipoOperacion=tipo,
+                        totalOperaciones=len(ordenes),
+                    )
+                )
+        return _json(dict(resultado=dict(id=1, saldos=saldos)))
+
+    def _cuenta(self, cuenta: Dict[str, Any]) -> Dict[str, Any]:
+        cadena = _join_cuenta(SimpleNamespace(**cuenta))
+        if not self._firma_valida(cadena, cuenta.get('firma')):
+            return dict(descripcion='Error validando la firma', id=1)
+        if cuenta['cuenta'] in self.cuentas:
+            return dict(descripcion='Cuenta Duplicada', id=3)
+        self.cuentas[cuenta['cuenta']] = cuenta
+        return CUENTA_EN_REVISION
+
+    def _alta_cuenta(self, cuenta: Dict[str, Any]) -> Respuesta:
+        return _json(self._cuenta(cuenta))
+
+    def _alta_cuentas(self, lote: Dict[str, Any]) -> Respuesta:
+        return _json([self._cuenta(c) for c in lote['cuentasFisicas']])
+
+    def _baja_cuenta(self, cuenta: Dict[str, Any]) -> Respuesta:
+        cadena = _join_cuenta(SimpleNamespace(**cuenta))
+        if not self._firma_valida(cadena, cuenta.get('firma')):
+            return _json(dict(descripcion='Error validando la firma', id=1))
+        if self.cuentas.pop(cuenta['cuenta'], None) is None:
+            return _json(dict(descripcion='La cuenta no existe', id=2))
+        return _json(CUENTA_EN_REVISION)
+
+    def _consulta_saldo(self, xml: str) -> Respuesta:
+        root = ElementTree.fromstring(xml)
+        cuenta = root.findtext('.//cuenta')
+        if not self._firma_valida(cuenta, root.findtext('.//firma')):
+            return _soap_fault('Error validando la firma')
+        try:
+            saldo = self.saldos[cuenta]
+        except KeyError:
+            return _soap_fault(f'Cuenta {{{cuenta}}} - {{No encontrada}}')
+        return _soap(
+            '<ns0:consultaSaldoCuentaResponse '
+            'xmlns:ns0="http://h2h.integration.spei.enlacefi.lgec.com/">'
+            '<return><cargosPendientes>0.00</cargosPendientes>'
+            f'<saldo>{saldo:.2f}</saldo></return>'
+            '</ns0:consultaSaldoCuentaResponse>'
+        )
+
+
+class _SimuladorHandler(BaseHTTPRequestHandler):
+    server: 'SimuladorServer'
+    protocol_version = 'HTTP/1.1'  # keep-alive, como STP
+    # headers y cuerpo van en dos writes, con Nagle el segundo espera el
+    # ACK retrasado del cliente (~40 ms)
+    disable_nagle_algorithm = True
+
+    def _responde(self) -> None:
+        largo = int(self.headers.get('Content-Length') or 0)
+        cuerpo = self.rfile.read(largo)
+        simulador = self.server.simulador
+        status, content_type, respuesta = simulador.responde(
+            self.command, self.path, cuerpo
+        )
+        time.sleep(simulador.demora())
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(respuesta)))
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(respuesta)
+
+    do_POST = do_PUT = do_DELETE = _responde
+
+    def log_message(self, format: str, *args: Any) -> None:
+        ...
+
+
+class SimuladorServer(ThreadingMixIn, HTTPServer):
+    """
+    Servidor HTTP del simulador. Con el puerto 0 se usa uno libre, ver url
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self, simulador: Simulador, host: str = '127.0.0.1', port: int = 0
+    ):
+        self.simulador = simulador
+        super().__init__((host, port), _SimuladorHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def base_url(self) -> str:
+        return self.url + REST_PATH
+
+    @property
+    def soap_url(self) -> str:
+        return self.url + SOAP_PATH
+
+
+def _saldo(valor: str) -> Tuple[str, float]:
+    cuenta, saldo = valor.split('=')
+    return cuenta, float(saldo)
+
+
+def crea_servidor(argv: Optional[Sequence[str]] = None) -> SimuladorServer:
+    parser = argparse.ArgumentParser(description='Simulador local de STP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--llave-publica', help='PEM para verificar firmas')
+    parser.add_argument(
+        '--saldo',
+        type=_saldo,
+        action='append',
+        default=[],
+        metavar='CLABE=SALDO',
+    )
+    parser.add_argument('--latencia', type=float, default=0.0)
+    parser.add_argument('--variacion', type=float, default=0.0)
+    parser.add_argument('--tasa-errores', type=float, default=0.0)
+    parser.add_argument('--codigo-error', type=int)
+    parser.add_argument('--max-por-segundo', type=float)
+    parser.add_argument('--semilla', type=int)
+    args = parser.parse_args(argv)
+    llave_publica = None
+    if args.llave_publica:
+        with open(args.llave_publica, 'rb') as f:
+            llave_publica = serialization.load_pem_public_key(
+                f.read(), default_backend()
+            )
+    simulador = Simulador(
+        llave_publica,
+        saldos=dict(args.saldo),
+        latencia=args.latencia,
+        variacion=args.variacion,
+        tasa_errores=args.tasa_errores,
+        codigo_error=args.codigo_error,
+        max_por_segundo=args.max_por_segundo,
+        semilla=args.semilla,
+    )
+    return SimuladorServer(simulador, args.host, args.port)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:  # pragma: no cover
+    servidor = crea_servidor(argv)
+    print(f'base_url={servidor.base_url} soap_url={servidor.soap_url}')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
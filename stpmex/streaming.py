@@ -0,0 +1,71 @@
+import codecs
+import json
+import re
+from typing import Any, List, Optional
+
+_SEPARADORES = re.compile(r'[\s,]*')
+
+
+class JsonArrayStream:
+    """
+    Parsea de forma incremental los elementos del arreglo `key` de un
+    documento json, e.g. `lst` en `{"resultado": {"id": 1, "lst": [...]}}`,
+    para no tener la respuesta completa en memoria.
+
+    feed() regresa los elementos completos en cada pedazo de la respuesta.
+    close() regresa el documento completo si no tenía el arreglo, por
+    ejemplo cuando STP regresa un error.
+    """
+
+    def __init__(self, key: str):
+        self._inicio = re.compile(rf'"{re.escape(key)}"\s*:\s*\[')
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._en_arreglo = False
+        self._terminado = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        if self._terminado:
+            return []
+        self._buffer += self._decoder.decode(chunk)
+        if not self._en_arreglo:
+            match = self._inicio.search(self._buffer)
+            if not match:
+                return []
+            self._en_arreglo = True
+            inicio = match.end()
+            self._buffer = self._buffer[inicio:]
+        return self._elementos()
+
+    def _elementos(self) -> List[Any]:
+        elementos = []
+        buffer = self._buffer
+        pos = 0
+        while True:
+            pos = _SEPARADORES.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if buffer[pos] == ']':
+                self._terminado = True
+                break
+            try:
+                elemento, fin = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # falta recibir el resto del elemento
+            if fin == len(buffer):
+                break  # un número podría continuar en el siguiente pedazo
+            elementos.append(elemento)
+            pos = fin
+        self._buffer = buffer[pos:]
+        return elementos
+
+    def close(self) -> Optional[Any]:
+        self._buffer += self._decoder.decode(b'', final=True)
+        if not self._en_arreglo:
+            return json.loads(self._buffer)
+        if not self._terminado:
+            raise json.JSONDecodeError(
+                'Arreglo incompleto', self._buffer, len(self._buffer)
+            )
+        return None
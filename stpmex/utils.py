@@ -1,4 +1,9 @@
 import datetime as dt
+import itertools
+import os
+import socket
+import time
+import zlib
 from typing import Union
 
 DATE_FORMAT = '%Y%m%d'
@@ -10,3 +15,37 @@ def strftime(date: dt.date):
 
 def strptime(date: Union[int, str]):
     return dt.datetime.strptime(str(date), DATE_FORMAT).date()
+
+
+BASE36 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+MAX_CLAVE_RASTREO = 29
+
+
+def base36(number: int, width: int) -> str:
+    digits = []
+    for _ in range(width):
+        number, digit = divmod(number, 36)
+        digits.append(BASE36[digit])
+    return ''.join(reversed(digits))
+
+
+class ClaveRastreoGenerator:
+    """
+    Genera claves de rastreo únicas entre threads y procesos del mismo host:
+    prefijo + milisegundos (9) + host (2) + pid (5) + secuencia (4), en
+    base 36. Cada proceso puede generar 36 ** 4 claves por milisegundo.
+    """
+
+    def __init__(self, prefijo: str = 'CR'):
+        if len(prefijo) > MAX_CLAVE_RASTREO - 20:
+            raise ValueError(f'El prefijo {prefijo} es muy largo')
+        self.prefijo = prefijo
+        self.host = base36(zlib.crc32(socket.gethostname().encode()), 2)
+        self._secuencia = itertools.count()
+
+    def __call__(self) -> str:
+        # next() sobre itertools.count es atómico con el GIL
+        secuencia = base36(next(self._secuencia), 4)
+        ms = base36(int(time.time() * 1000), 9)
+        pid = base36(os.getpid(), 5)  # en cada llamada por si hubo fork
+        return f'{self.prefijo}{ms}{self.host}{pid}{secuencia}'
@@ -1,11 +1,11 @@
 import datetime as dt
 
+import httpx
 import pytest
 import requests_mock
 from clabe import generate_new_clabes
 
-from stpmex import Client
-from stpmex.resources import CuentaFisica, Orden
+from stpmex import AsyncClient, Client
 from stpmex.types import Pais
 
 PKEY = """Bag Attributes
@@ -48,6 +48,33 @@ def client_mock(request):
         yield Client(empresa, PKEY, pkey_passphrase, demo=True)
 
 
+@pytest.fixture
+def async_client_mock(request):
+    """
+    AsyncClient cuyas peticiones responden con request.param, un dict de
+    `path: respuesta`. Las respuestas str se envían como texto (SOAP),
+    los dict y list como json y las funciones se llaman con el request.
+    """
+    empresa = 'TAMIZI'
+    pkey_passphrase = '12345678'
+    responses = request.param
+
+    def handler(req: httpx.Request) -> httpx.Response:
+        path = req.url.path.replace('/speiws/rest', '')
+        resp = responses[path]
+        if callable(resp):
+            resp = resp(req)
+        if isinstance(resp, httpx.Response):
+            return resp
+        elif isinstance(resp, str):
+            return httpx.Response(200, text=resp)
+        return httpx.Response(200, json=resp)
+
+    client = AsyncClient(empresa, PKEY, pkey_passphrase, demo=True)
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    yield client
+
+
 @pytest.fixture
 def orden_dict():
     yield dict(
@@ -71,7 +98,7 @@ def orden_dict():
 
 @pytest.fixture
 def orden(client, orden_dict):
-    yield Orden(**orden_dict)
+    yield client.ordenes(**orden_dict)
 
 
 @pytest.fixture
@@ -100,4 +127,4 @@ def cuenta_dict():
 
 @pytest.fixture
 def cuenta(client, cuenta_dict):
-    yield CuentaFisica(**cuenta_dict)
+    yield client.cuentas(**cuenta_dict)
@@ -0,0 +1,249 @@
+import asyncio
+import copy
+import datetime as dt
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests_mock
+from requests import HTTPError
+
+from stpmex import Client
+from stpmex.exc import NoOrdenesEncontradas
+from stpmex.resources import OrdenConsultada
+from stpmex.resources.consultas import CONVERTIDORES, RecibidasCache
+from stpmex.types import Estado
+
+ORDEN_STP = dict(
+    claveRastreo='CR1564969083',
+    conceptoPago='Prueba   ',
+    estado='LQ',
+    fechaOperacion=20200420,
+    institucionContraparte=40072,
+    monto=1.2,
+    tsCaptura=1587401577000,
+    tsDevolucion=0,
+)
+RECIBIDA = OrdenConsultada(
+    claveRastreo='CR1', institucionContraparte=40072, institucionOperante=90646
+)
+
+
+def test_from_stp():
+    orden = OrdenConsultada.from_stp(ORDEN_STP)
+    assert orden.claveRastreo == 'CR1564969083'
+    assert orden.conceptoPago == 'Prueba'
+    assert orden.estado is Estado.liquidada
+    assert orden.fechaOperacion == dt.date(2020, 4, 20)
+    assert orden.tsCaptura == dt.datetime.fromtimestamp(1587401577)
+    assert orden.tsDevolucion == 0
+    assert orden.monto == 1.2
+    assert not hasattr(orden, '__dict__')
+    with pytest.raises(AttributeError):
+        orden.nombreBeneficiario  # no lo regresó STP
+
+
+def test_campos_desconocidos():
+    orden = OrdenConsultada.from_stp(
+        {**ORDEN_STP, 'campoNuevo': 'valor  ', 'tsNuevo': 1587401577000}
+    )
+    assert orden.campoNuevo == 'valor'
+    assert orden.tsNuevo == dt.datetime.fromtimestamp(1587401577)
+    assert 'campoNuevo' in CONVERTIDORES
+    with pytest.raises(AttributeError):
+        orden.noExiste
+
+
+def test_to_dict_eq_repr():
+    orden = OrdenConsultada.from_stp({**ORDEN_STP, 'campoNuevo': 'valor'})
+    campos = orden.to_dict()
+    assert campos['campoNuevo'] == 'valor'
+    assert set(campos) == set(ORDEN_STP) | {'campoNuevo'}
+    assert OrdenConsultada(**campos) == orden
+    assert orden != OrdenConsultada(**{**campos, 'monto': 2.0})
+    assert orden != campos
+    assert repr(orden).startswith(
+        "OrdenConsultada(claveRastreo='CR1564969083'"
+    )
+
+
+def test_orden_consultada_copy_pickle():
+    orden = OrdenConsultada.from_stp({**ORDEN_STP, 'campoNuevo': 'valor'})
+    for copia in (
+        copy.copy(orden),
+        copy.deepcopy(orden),
+        pickle.loads(pickle.dumps(orden)),
+    ):
+        assert copia == orden
+        assert copia.campoNuevo == 'valor'
+        assert copia.fechaOperacion == orden.fechaOperacion
+    vacia = OrdenConsultada.__new__(OrdenConsultada)
+    with pytest.raises(AttributeError):
+        vacia.claveRastreo
+
+
+def test_recibidas_cache_fechas_pasadas():
+    cache = RecibidasCache(ttl=0)
+    fecha = dt.date(2020, 4, 20)
+    assert cache.index(fecha) is None
+    index = cache.update(fecha, [RECIBIDA])
+    assert index[('CR1', 40072)] is RECIBIDA
+    assert index[('CR1', 90646)] is RECIBIDA
+    assert cache.index(fecha) is index  # no expira
+    cache.clear()
+    assert cache.index(fecha) is None
+
+
+def test_recibidas_cache_dia_actual():
+    cache = RecibidasCache(ttl=60)
+    hoy = dt.date.today()
+    for fecha in (None, hoy, hoy - dt.timedelta(days=1)):
+        index = cache.update(fecha, [RECIBIDA])
+        assert cache.index(fecha) is index
+    cache.ttl = 0
+    for fecha in (None, hoy, hoy - dt.timedelta(days=1)):
+        assert cache.index(fecha) is None
+    assert cache.stats() == dict(hits=3, misses=3, size=3, maxsize=31)
+
+
+def test_recibidas_cache_busca():
+    cache = RecibidasCache(min_refresco=60)
+    hoy = dt.date.today()
+    descargas = []
+
+    def descarga(fecha):
+        descargas.append(fecha)
+        return [RECIBIDA]
+
+    assert cache.busca(hoy, ('CR1', 40072), descarga) is RECIBIDA
+    # se acaba de descargar
+    assert cache.busca(hoy, ('CR0', 40072), descarga) is None
+    # un datetime usa la misma fecha
+    ahora = dt.datetime.now()
+    assert cache.busca(ahora, ('CR1', 40072), descarga) is RECIBIDA
+    pasada = dt.datetime(2020, 4, 20, 12)
+    assert cache.busca(pasada, ('CR0', 40072), descarga) is None
+    assert cache.busca(pasada, ('CR0', 40072), descarga) is None  # no cambia
+    assert descargas == [hoy, dt.date(2020, 4, 20)]
+    cache.min_refresco = 0
+    assert cache.busca(hoy, ('CR0', 40072), descarga) is None
+    assert len(descargas) == 3
+
+
+def test_recibidas_cache_descarga_fallida():
+    cache = RecibidasCache(min_refresco=60)
+    hoy = dt.date.today()
+    cache.update(hoy, [])
+    cache._fechas[hoy] = (time.monotonic() - 120, {})
+
+    def falla(fecha):
+        raise HTTPError
+
+    with pytest.raises(HTTPError):
+        cache.busca(hoy, ('CR1', 40072), falla)
+    # la fecha no queda como recién descargada
+    assert cache.busca(hoy, ('CR1', 40072), lambda f: [RECIBIDA]) is RECIBIDA
+
+
+def test_recibidas_cache_descargas_concurrentes():
+    cache = RecibidasCache()
+    hoy = dt.date.today()
+    iniciada = threading.Event()
+    continua = threading.Event()
+    descargas = []
+
+    def descarga(fecha):
+        descargas.append(fecha)
+        iniciada.set()
+        continua.wait(5)
+        return [RECIBIDA]
+
+    with ThreadPoolExecutor(2) as pool:
+        primera = pool.submit(cache.busca, hoy, ('CR1', 40072), descarga)
+        iniciada.wait(5)
+        # espera la descarga en curso en lugar de no encontrar la orden
+        segunda = pool.submit(cache.busca, hoy, ('CR1', 40072), descarga)
+        time.sleep(0.05)
+        assert not segunda.done()
+        continua.set()
+        assert primera.result() is segunda.result() is RECIBIDA
+    assert descargas == [hoy]
+
+
+@pytest.mark.asyncio
+async def test_recibidas_cache_busca_async():
+    cache = RecibidasCache()
+    hoy = dt.date.today()
+    descargas = []
+
+    async def descarga(fecha):
+        descargas.append(fecha)
+        await asyncio.sleep(0.01)
+        return [RECIBIDA]
+
+    resultados = await asyncio.gather(
+        *[cache.busca_async(hoy, ('CR1', 40072), descarga) for _ in range(3)]
+    )
+    assert resultados == [RECIBIDA] * 3
+    assert descargas == [hoy]
+
+    async def falla(fecha):
+        raise HTTPError
+
+    fecha = dt.date(2020, 4, 20)
+    with pytest.raises(HTTPError):
+        await cache.busca_async(fecha, ('CR1', 40072), falla)
+    assert await cache.busca_async(fecha, ('CR1', 40072), descarga)
+
+
+def test_recibidas_cache_max_fechas():
+    cache = RecibidasCache(max_fechas=2)
+    fechas = [dt.date(2020, 4, dia) for dia in (20, 21, 22)]
+    cache.update(fechas[0], [])
+    cache.update(fechas[1], [])
+    assert cache.index(fechas[0]) is not None  # ahora es la más reciente
+    cache.update(fechas[2], [])
+    assert cache.index(fechas[1]) is None
+    assert cache.index(fechas[0]) is not None
+
+
+def test_consulta_clave_rastreo_recibida_usa_cache(client: Client):
+    lst = [dict(ORDEN_STP, institucionOperante=90646)]
+    fecha = dt.date(2020, 4, 20)
+    with requests_mock.mock() as m:
+        m.post(requests_mock.ANY, json=dict(resultado=dict(id=1, lst=lst)))
+        for _ in range(3):
+            orden = client.ordenes.consulta_clave_rastreo(
+                'CR1564969083', 40072, fecha
+            )
+            assert orden.claveRastreo == 'CR1564969083'
+        with pytest.raises(NoOrdenesEncontradas):
+            client.ordenes.consulta_clave_rastreo('CR0', 40072, fecha)
+        assert m.call_count == 1
+
+
+def test_consulta_clave_rastreo_recibida_nueva(client: Client):
+    """
+    Una orden que llegó después de la última descarga del día actual se
+    encuentra volviendo a descargar, a lo más una vez cada min_refresco
+    """
+    nueva = dict(ORDEN_STP, claveRastreo='CR_NUEVA')
+    with requests_mock.mock() as m:
+        m.post(
+            requests_mock.ANY,
+            [
+                dict(json=dict(resultado=dict(id=1, lst=[ORDEN_STP]))),
+                dict(json=dict(resultado=dict(id=1, lst=[ORDEN_STP, nueva]))),
+            ],
+        )
+        client.ordenes.consulta_clave_rastreo('CR1564969083', 40072)
+        client.recibidas_cache.min_refresco = 0
+        orden = client.ordenes.consulta_clave_rastreo('CR_NUEVA', 40072)
+        assert orden.claveRastreo == 'CR_NUEVA'
+        assert m.call_count == 2
+        client.recibidas_cache.min_refresco = 60
+        with pytest.raises(NoOrdenesEncontradas):
+            client.ordenes.consulta_clave_rastreo('CR0', 40072)
+        assert m.call_count == 2
@@ -1,3 +1,6 @@
+import dataclasses
+import pickle
+
 import pytest
 from clabe import generate_new_clabes
 
@@ -23,7 +26,7 @@ def test_alta_lote(client, cuenta_dict, num_cuentas):
 
     lote = []
     for clabe in clabes:
-        cuenta = CuentaFisica(**cuenta_dict, cuenta=clabe)
+        cuenta = client.cuentas(**cuenta_dict, cuenta=clabe)
         lote.append(cuenta)
     resp = client.cuentas.alta_lote(lote)
     assert list(resp.keys()) == clabes
@@ -39,3 +42,23 @@ def test_cuenta_nombre_apellidos_correctos(cuenta):
     assert cuenta.nombre == 'EDUARDO MARCO'
     assert cuenta.apellidoMaterno == 'HERNANDEZ MUNOZ'
     assert cuenta.apellidoPaterno == 'SALVADOR'
+
+
+def test_to_dict(cuenta):
+    cuenta.genero = None
+    datos = cuenta.to_dict()
+    assert datos['fechaNacimiento'] == '19800414'
+    assert 'genero' not in datos
+    assert list(datos)[-2:] == ['firma', 'empresa']
+    assert datos['firma'] == cuenta.firma
+    cadena = cuenta._cadena_original()
+    assert cuenta.to_dict(cadena_original=cadena) == datos
+    assert cuenta.to_dict('firma')['firma'] == 'firma'
+
+
+def test_pickle(client, cuenta):
+    cargada = pickle.loads(pickle.dumps(cuenta))
+    assert type(cargada) is CuentaFisica
+    assert cargada.__dict__ == cuenta.__dict__
+    ligada = client.cuentas.from_trusted(**dataclasses.asdict(cargada))
+    assert ligada.to_dict() == cuenta.to_dict()
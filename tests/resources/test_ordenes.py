@@ -1,13 +1,22 @@
+import copy
+import dataclasses
 import datetime as dt
+import pickle
 import time
 from typing import Any, Dict
 
 import pytest
+import requests_mock
 from cuenca_validations.typing import DictStrAny
 from pydantic import ValidationError
+from requests import HTTPError
 
 from stpmex import Client
-from stpmex.exc import NoOrdenesEncontradas
+from stpmex.exc import (
+    ClaveRastreoAlreadyInUse,
+    NoOrdenesEncontradas,
+    TrustedDataMismatch,
+)
 from stpmex.resources import Orden
 from stpmex.types import TipoCuenta
 
@@ -118,3 +127,147 @@ def test_institucion_bloqueada_no_permite_registrar_orden(
         client.ordenes.registra(**orden_dict)
 
     assert any(error == expected_error_dict for error in exc.value.errors())
+
+
+def _registra_response(request, context):
+    clave_rastreo = request.json()['claveRastreo']
+    if clave_rastreo == 'CR_REPETIDA':
+        return dict(
+            resultado=dict(
+                descripcionError=f'La clave de rastreo {{{clave_rastreo}}} '
+                'para la fecha {20200420} de la institucion {90646} ya '
+                'fue utilizada',
+                id=-1,
+            )
+        )
+    return dict(resultado=dict(id=int(clave_rastreo[2:])))
+
+
+def test_registra_lote(client: Client, orden_dict: Dict[str, Any]):
+    lote = [{**orden_dict, 'claveRastreo': f'CR{i}'} for i in range(20)]
+    lote[3]['claveRastreo'] = 'CR_REPETIDA'
+    lote[7]['monto'] = -1.0
+    lote[11] = client.ordenes(**lote[11])
+    sesiones = []
+
+    def registra_sesion(peticion, siguiente):
+        sesiones.append(client.session)
+        return siguiente(peticion)
+
+    client.middlewares.append(registra_sesion)
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=_registra_response)
+        resultados = dict(client.ordenes.registra_lote(lote, concurrency=4))
+    # la Session del cliente no se comparte entre los threads
+    assert client.session not in sesiones
+    assert len({id(sesion) for sesion in sesiones}) <= 4
+
+    assert sorted(resultados.keys()) == list(range(20))
+    assert isinstance(resultados.pop(3), ClaveRastreoAlreadyInUse)
+    assert isinstance(resultados.pop(7), ValidationError)
+    assert resultados[11] is lote[11]
+    for i, orden in resultados.items():
+        assert isinstance(orden, Orden)
+        assert orden.id == i
+
+
+def test_registra_lote_trusted(client: Client, orden_dict: Dict[str, Any]):
+    lote = [{**orden_dict, 'claveRastreo': f'CR{i}'} for i in range(5)]
+    lote[2]['monto'] = -1.0  # no se valida
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=_registra_response)
+        resultados = dict(client.ordenes.registra_lote(lote, trusted=True))
+    assert all(isinstance(orden, Orden) for orden in resultados.values())
+    assert resultados[2].monto == -1.0
+
+
+def test_from_trusted(client: Client, orden_dict: Dict[str, Any]):
+    orden_dict['claveRastreo'] = 'CR1234'
+    orden_dict['referenciaNumerica'] = 1234567
+    orden = client.ordenes(**orden_dict)
+    trusted = client.ordenes.from_trusted(verificar=True, **orden_dict)
+    assert isinstance(trusted, client.ordenes)
+    assert trusted == orden
+    assert trusted._cadena_original() == orden._cadena_original()
+    assert trusted.to_dict() == orden.to_dict()
+    # el default se guarda validado
+    assert trusted.institucionOperante == '90646'
+    # campos generados en __post_init__ y default_factory
+    del orden_dict['claveRastreo']
+    del orden_dict['referenciaNumerica']
+    trusted = client.ordenes.from_trusted(verificar=True, **orden_dict)
+    assert trusted.claveRastreo and trusted.referenciaNumerica
+
+
+def test_pickle(client: Client, orden: Orden):
+    cargada = pickle.loads(pickle.dumps(orden))
+    assert type(cargada) is Orden
+    assert cargada.__dict__ == orden.__dict__
+    ligada = client.ordenes.from_trusted(**dataclasses.asdict(cargada))
+    assert ligada.to_dict() == orden.to_dict()
+    # las copias siguen ligadas al cliente
+    for copia in (copy.copy(orden), copy.deepcopy(orden)):
+        assert type(copia) is client.ordenes
+        assert copia.to_dict() == orden.to_dict()
+
+
+def test_from_trusted_mismatch(client: Client, orden_dict: Dict[str, Any]):
+    orden_dict['nombreBeneficiario'] = 'Ricardo Sánchez'
+    orden = client.ordenes.from_trusted(**orden_dict)
+    assert orden.nombreBeneficiario == 'Ricardo Sánchez'
+    client.ordenes.verifica_trusted = True
+    with pytest.raises(TrustedDataMismatch) as exc_info:
+        client.ordenes.from_trusted(**orden_dict)
+    assert exc_info.value.diferencias == dict(
+        nombreBeneficiario=('Ricardo Sánchez', 'Ricardo Sanchez')
+    )
+    client.ordenes.from_trusted(verificar=False, **orden_dict)
+
+
+def test_from_trusted_cadena_mismatch(client: Client, orden_dict):
+    # mismo payload, distinta cadena original
+    orden_dict['iva'] = 1
+    with pytest.raises(TrustedDataMismatch) as exc_info:
+        client.ordenes.from_trusted(verificar=True, **orden_dict)
+    assert 'cadena_original' in exc_info.value.diferencias
+
+
+def test_from_trusted_campos(client: Client, orden_dict: Dict[str, Any]):
+    with pytest.raises(TypeError):
+        client.ordenes.from_trusted(otro=1, **orden_dict)
+    del orden_dict['monto']
+    with pytest.raises(TypeError):
+        client.ordenes.from_trusted(**orden_dict)
+
+
+def test_iter_recibidas(client: Client):
+    lst = [
+        dict(claveRastreo=f'CR{i}', estado='LQ', fechaOperacion=20200420)
+        for i in range(100)
+    ]
+    with requests_mock.mock() as m:
+        m.post(requests_mock.ANY, json=dict(resultado=dict(id=1, lst=lst)))
+        recibidas = client.ordenes.consulta_recibidas()
+        ordenes = client.ordenes.iter_recibidas(dt.date(2020, 4, 20))
+        assert next(ordenes) == recibidas[0]
+        assert list(ordenes) == recibidas[1:]
+        assert m.last_request.json()['estado'] == 'R'
+
+
+def test_iter_enviadas_sin_resultados(client: Client):
+    resp = dict(
+        resultado=dict(
+            id=-100, descripcionError='No se encontraron datos relacionados'
+        )
+    )
+    with requests_mock.mock() as m:
+        m.post(requests_mock.ANY, json=resp)
+        assert list(client.ordenes.iter_enviadas()) == []
+        assert m.last_request.json()['estado'] == 'E'
+
+
+def test_iter_recibidas_http_error(client: Client):
+    with requests_mock.mock() as m:
+        m.post(requests_mock.ANY, status_code=500)
+        with pytest.raises(HTTPError):
+            list(client.ordenes.iter_recibidas())
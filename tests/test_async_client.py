@@ -0,0 +1,315 @@
+import datetime as dt
+import json
+
+import httpx
+import pytest
+from pydantic import ValidationError
+
+from stpmex import AsyncClient
+from stpmex.exc import (
+    ClaveRastreoAlreadyInUse,
+    DuplicatedAccount,
+    NoOrdenesEncontradas,
+)
+from stpmex.resources import AsyncSaldo, Orden
+from stpmex.signers import Signer
+
+from .conftest import PKEY
+
+ORDEN_CONSULTADA = dict(
+    claveRastreo='CR1564969083',
+    conceptoPago='Prueba   ',
+    cuentaBeneficiario='072691004495711499',
+    empresa='TAMIZI',
+    estado='LQ',
+    fechaOperacion=20200420,
+    institucionContraparte=40072,
+    institucionOperante=90646,
+    monto=1.2,
+    tsCaptura=1587401577000,
+    tsLiquidacion=1587401580000,
+)
+SALDO_SOAP = (
+    '<?xml version=\'1.0\' encoding=\'UTF-8\'?>'
+    '<S:Envelope xmlns:S="http://schemas.xmlsoap.org/soap/envelope/">'
+    '<S:Body><ns0:consultaSaldoCuentaResponse '
+    'xmlns:ns0="http://h2h.integration.spei.enlacefi.lgec.com/"><return>'
+    '<cargosPendientes>0.00</cargosPendientes><saldo>10000.00</saldo>'
+    '</return></ns0:consultaSaldoCuentaResponse></S:Body></S:Envelope>'
+)
+SOAP_PATH = '/spei/webservices/SpeiConsultaServices'
+CUENTA_REVISION = dict(id=0, descripcion='Cuenta en revisión.')
+
+
+class SoloAsync(Signer):
+    """
+    Falla si se firma sin sign_async, i.e. bloqueando el event loop
+    """
+
+    def __init__(self, signer: Signer):
+        self.signer = signer
+        self.fingerprint = signer.fingerprint
+
+    def sign(self, text: str) -> str:
+        raise AssertionError('firma síncrona en el event loop')
+
+    async def sign_async(self, text: str) -> str:
+        return self.signer.sign(text)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [{'/ordenPago/registra': dict(resultado=dict(id=9349827))}],
+    indirect=True,
+)
+async def test_registra_orden(async_client_mock: AsyncClient, orden_dict):
+    orden = await async_client_mock.ordenes.registra(**orden_dict)
+    assert orden.id == 9349827
+    assert orden.firma
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/ordenPago/registra': dict(
+                resultado=dict(
+                    descripcionError='La clave de rastreo {CR1564969083} '
+                    'para la fecha {20200420} de la institucion {90646} '
+                    'ya fue utilizada',
+                    id=-1,
+                )
+            ),
+            '/cuentaModule/fisica': dict(descripcion='Cuenta Duplicada', id=3),
+        }
+    ],
+    indirect=True,
+)
+async def test_errors(async_client_mock: AsyncClient, orden_dict, cuenta_dict):
+    with pytest.raises(ClaveRastreoAlreadyInUse):
+        await async_client_mock.ordenes.registra(**orden_dict)
+    with pytest.raises(DuplicatedAccount):
+        await async_client_mock.cuentas.alta(**cuenta_dict)
+
+
+def _registra_response(request: httpx.Request) -> httpx.Response:
+    clave_rastreo = json.loads(request.content)['claveRastreo']
+    if clave_rastreo == 'CR_ERROR':
+        return httpx.Response(500)
+    return httpx.Response(
+        200, json=dict(resultado=dict(id=int(clave_rastreo[2:])))
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [{'/ordenPago/registra': _registra_response}],
+    indirect=True,
+)
+@pytest.mark.parametrize('trusted', [False, True])
+async def test_registra_lote(
+    async_client_mock: AsyncClient, orden_dict, trusted
+):
+    lote = [{**orden_dict, 'claveRastreo': f'CR{i}'} for i in range(20)]
+    lote[5]['claveRastreo'] = 'CR_ERROR'
+    lote[9]['monto'] = 1
+    # con trusted, la verificación sigue detectando el monto inválido
+    async_client_mock.ordenes.verifica_trusted = trusted
+
+    resultados = {}
+    async for i, resultado in async_client_mock.ordenes.registra_lote(
+        lote, concurrency=3, trusted=trusted
+    ):
+        resultados[i] = resultado
+
+    assert sorted(resultados.keys()) == list(range(20))
+    assert isinstance(resultados.pop(5), httpx.HTTPStatusError)
+    assert isinstance(resultados.pop(9), ValidationError)
+    for i, orden in resultados.items():
+        assert isinstance(orden, Orden)
+        assert orden.id == i
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [{'/ordenPago/registra': httpx.Response(500)}],
+    indirect=True,
+)
+async def test_http_error(async_client_mock: AsyncClient, orden_dict):
+    with pytest.raises(httpx.HTTPStatusError) as exc_info:
+        await async_client_mock.ordenes.registra(**orden_dict)
+    assert exc_info.value.response.status_code == 500
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/ordenPago/consOrdenesFech': dict(
+                resultado=dict(id=1, lst=[ORDEN_CONSULTADA])
+            ),
+            '/ordenPago/consOrdEnvRastreo': dict(
+                resultado=dict(id=1, ordenPago=ORDEN_CONSULTADA)
+            ),
+        }
+    ],
+    indirect=True,
+)
+async def test_consultas_ordenes(async_client_mock: AsyncClient):
+    async_client_mock.signer = SoloAsync(async_client_mock.signer)
+    ordenes = async_client_mock.ordenes
+    enviadas = await ordenes.consulta_enviadas(dt.date(2020, 4, 20))
+    recibidas = await ordenes.consulta_recibidas()
+    assert len(enviadas) == len(recibidas) == 1
+    assert enviadas[0].conceptoPago == 'Prueba'
+    assert enviadas[0].fechaOperacion == dt.date(2020, 4, 20)
+
+    enviada = await ordenes.consulta_clave_rastreo(
+        'CR1564969083', 90646, dt.date(2020, 4, 20)
+    )
+    assert enviada.claveRastreo == 'CR1564969083'
+    recibida = await ordenes.consulta_clave_rastreo('CR1564969083', 40072)
+    assert recibida.claveRastreo == 'CR1564969083'
+    # una orden que falta en el día actual se vuelve a descargar
+    async_client_mock.recibidas_cache.min_refresco = 0
+    with pytest.raises(NoOrdenesEncontradas):
+        await ordenes.consulta_clave_rastreo('does not exist', 40072)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/ordenPago/consOrdenesFech': dict(
+                resultado=dict(id=1, lst=[ORDEN_CONSULTADA] * 3)
+            ),
+        }
+    ],
+    indirect=True,
+)
+async def test_iter_ordenes(async_client_mock: AsyncClient):
+    async_client_mock.signer = SoloAsync(async_client_mock.signer)
+    ordenes = async_client_mock.ordenes
+    recibidas = [orden async for orden in ordenes.iter_recibidas()]
+    enviadas = [orden async for orden in ordenes.iter_enviadas()]
+    assert recibidas == enviadas == await ordenes.consulta_recibidas()
+    assert len(recibidas) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/ordenPago/consOrdenesFech': dict(
+                resultado=dict(
+                    descripcionError='No se encontraron datos relacionados',
+                    id=-100,
+                )
+            )
+        }
+    ],
+    indirect=True,
+)
+async def test_consulta_ordenes_sin_resultados(
+    async_client_mock: AsyncClient,
+):
+    assert await async_client_mock.ordenes.consulta_enviadas() == []
+    assert [o async for o in async_client_mock.ordenes.iter_enviadas()] == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [{'/ordenPago/consOrdenesFech': httpx.Response(500)}],
+    indirect=True,
+)
+async def test_iter_ordenes_http_error(async_client_mock: AsyncClient):
+    with pytest.raises(httpx.HTTPStatusError):
+        [o async for o in async_client_mock.ordenes.iter_recibidas()]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/ordenPago/consSaldoEnvRec': dict(
+                resultado=dict(
+                    id=1,
+                    saldos=[
+                        dict(
+                            empresa='TAMIZI',
+                            montoTotal='2.40',
+                            tipoOperacion='E',
+                            totalOperaciones=2,
+                        ),
+                    ],
+                )
+            ),
+            SOAP_PATH: SALDO_SOAP,
+        }
+    ],
+    indirect=True,
+)
+async def test_consultas_saldo(async_client_mock: AsyncClient):
+    async_client_mock.signer = SoloAsync(async_client_mock.signer)
+    saldos = await async_client_mock.saldos.consulta_saldo_env_rec()
+    assert len(saldos) == 1
+    assert isinstance(saldos[0], AsyncSaldo)
+    saldo = await async_client_mock.saldos.consulta('646180157000000004')
+    assert saldo == 10000.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/cuentaModule/fisica': CUENTA_REVISION,
+            '/cuentaModule/fisicas': [CUENTA_REVISION] * 100,
+        }
+    ],
+    indirect=True,
+)
+async def test_cuentas(async_client_mock: AsyncClient, cuenta_dict):
+    cuentas = async_client_mock.cuentas
+    cuenta = await cuentas.alta(**cuenta_dict)
+    assert await cuenta.baja() == CUENTA_REVISION
+
+    lote = [cuentas(**cuenta_dict) for _ in range(150)]
+    for i, cuenta in enumerate(lote):
+        cuenta.cuenta = f'64618015700000{i:04}'
+    resp = await cuentas.alta_lote(lote)
+    assert list(resp.keys()) == [cuenta.cuenta for cuenta in lote]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('async_client_mock', [{}], indirect=True)
+async def test_close(async_client_mock: AsyncClient):
+    async with async_client_mock as client:
+        assert not client.session.is_closed
+    assert client.session.is_closed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock', [{SOAP_PATH: httpx.Response(500)}], indirect=True
+)
+async def test_consulta_saldo_http_error(async_client_mock: AsyncClient):
+    with pytest.raises(httpx.HTTPStatusError):
+        await async_client_mock.saldos.consulta('123456789012345678')
+
+
+def test_timeout():
+    client = AsyncClient('TAMIZI', PKEY, '12345678', timeout=(1, 5))
+    assert client.session.timeout.connect == 1
+    assert client.session.timeout.read == 5
+    client = AsyncClient('TAMIZI', PKEY, '12345678', timeout=3)
+    assert client.session.timeout.pool == 3
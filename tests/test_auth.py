@@ -1,9 +1,23 @@
+import datetime as dt
+import enum
+from types import SimpleNamespace
+from typing import Optional
+
+import requests_mock
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+from pydantic.dataclasses import dataclass
+
 from stpmex.auth import (
     CUENTA_FIELDNAMES,
     ORDEN_FIELDNAMES,
+    SignatureCache,
+    compile_join,
     compute_signature,
     join_fields,
 )
+from stpmex.resources.ordenes import Orden
+from stpmex.signers import RsaSigner
 
 
 def test_join_fields_for_orden(orden):
@@ -21,6 +35,45 @@ def test_join_fields_for_cuenta(cuenta):
     assert join_fields(cuenta, CUENTA_FIELDNAMES) == joined
 
 
+class Monto(float):
+    ...
+
+
+class Cero(enum.IntEnum):
+    cero = 0
+
+
+def test_compile_join():
+    obj = SimpleNamespace(
+        a=Monto(1), b=Cero.cero, c=True, d=dt.date(2020, 1, 2), e=None
+    )
+    join = compile_join(('a', 'b', 'c', 'd', 'e'))
+    assert join(obj) == f'||1.00|{Cero.cero}|True|2020-01-02|||'
+    assert compile_join(('a', 'b', 'c', 'd', 'e')) is join
+    # los campos que no existen quedan vacíos
+    assert compile_join(('a', 'z'))(obj) == '||1.00|||'
+
+
+def test_resource_cadena_original(client, orden):
+    assert orden._cadena_original() == join_fields(orden, ORDEN_FIELDNAMES)
+
+
+def test_cadena_original_subclase_con_campo_firmado(client, orden_dict):
+    @dataclass
+    class OrdenCobranza(Orden):
+        referenciaCobranza: Optional[str] = None
+
+    ordenes = OrdenCobranza._bind(client)
+    orden = ordenes(**orden_dict, referenciaCobranza='REF123')
+    cadena = orden._cadena_original()
+    assert '|REF123|' in cadena
+    assert cadena == join_fields(orden, ORDEN_FIELDNAMES)
+    assert orden.to_dict()['referenciaCobranza'] == 'REF123'
+    # la clase base no tiene el campo, sigue vacío
+    base = client.ordenes(**orden_dict)
+    assert base._cadena_original() == join_fields(base, ORDEN_FIELDNAMES)
+
+
 def test_compute_signature(client, orden):
     firma = (
         'KDNKDVVuyNt9oTXPAlofGXGH5L5IH9PAzOsx0JZFtmGlU+10QRf2RHSg0OVCnYYpu5sC3'
@@ -29,3 +82,30 @@ def test_compute_signature(client, orden):
     )
     sig = compute_signature(client.pkey, join_fields(orden, ORDEN_FIELDNAMES))
     assert sig == firma
+
+
+def test_signature_cache(client):
+    otro = RsaSigner(rsa.generate_private_key(65537, 1024, default_backend()))
+    assert otro.fingerprint != client.signer.fingerprint
+
+    cache = SignatureCache(maxsize=2)
+    firma = cache.compute_signature(client.signer, 'a')
+    assert firma == compute_signature(client.pkey, 'a')
+    assert cache.compute_signature(client.signer, 'a') == firma
+    otra_firma = cache.compute_signature(otro, 'a')
+    assert otra_firma != firma
+    assert cache.compute_signature(client.signer, 'b')
+    assert cache.stats() == dict(hits=1, misses=3, size=2, maxsize=2)
+
+    cache.clear()
+    assert cache.stats() == dict(hits=0, misses=0, size=0, maxsize=2)
+
+
+def test_consultas_use_signature_cache(client):
+    with requests_mock.mock() as m:
+        m.post(requests_mock.ANY, json=dict(resultado=dict(id=1, lst=[])))
+        for _ in range(3):
+            client.ordenes.consulta_recibidas()
+    firmas = {r.json()['firma'] for r in m.request_history}
+    assert len(firmas) == 1
+    assert client.signature_cache.stats()['hits'] == 2
@@ -0,0 +1,154 @@
+import datetime as dt
+from typing import Any, Dict, Iterator, List, Mapping
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from stpmex.bulk import valida_cuentas, valida_ordenes
+from stpmex.types import Pais
+
+ORDENES = [
+    {},
+    dict(cuentaBeneficiario='123'),
+    dict(cuentaBeneficiario='4000000000000001'),
+    dict(cuentaBeneficiario='4000000000000002'),
+    dict(cuentaBeneficiario='3400000000000000'),
+    dict(cuentaBeneficiario='072691004495711498'),
+    dict(cuentaBeneficiario='659180110400000007'),
+    dict(cuentaBeneficiario='999180110400000007'),
+    dict(cuentaBeneficiario='55123a5678'),
+    dict(cuentaBeneficiario='5512345678'),
+    dict(cuentaBeneficiario=' 072691004495711499 '),
+    dict(monto=0.0),
+    dict(monto=1),
+    dict(monto=float('nan')),
+    dict(conceptoPago='  '),
+    dict(nombreOrdenante=''),
+    dict(institucionContraparte='99999'),
+    dict(institucionContraparte='9'),
+    dict(institucionContraparte='9a999'),
+    dict(institucionOperante='906466'),
+    dict(rfcCurpBeneficiario='X' * 19),
+    dict(referenciaNumerica=0),
+    dict(referenciaNumerica=10 ** 7),
+    dict(cuentaOrdenante=None),
+    dict(cuentaOrdenante='6461801104000000071'),
+    dict(monto=-1.0, cuentaOrdenante='646180110400000008'),
+    dict(referenciaNumerica='abc'),
+    dict(referenciaNumerica='12'),
+    dict(referenciaNumerica=10 ** 30),
+]
+
+CUENTAS = [
+    {},
+    dict(cuenta='646180157000000005'),
+    dict(rfcCurp='SAHE800416'),
+    dict(rfcCurp='SAHE8004161'),
+    dict(rfcCurp='SAHE800416HDF'),
+    dict(rfcCurp='SAHE800416HDFABC0A'),
+    dict(rfcCurp='SAHE800416HDFAB|01'),
+    dict(nombre=' '),
+    dict(apellidoMaterno=''),
+    dict(fechaNacimiento=None),
+    dict(paisNacimiento=999),
+    dict(paisNacimiento=None),
+    dict(cp='1234'),
+    dict(email='a' * 151),
+]
+
+
+def _columnas(filas: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    campos = set().union(*filas)
+    return {campo: [fila.get(campo) for fila in filas] for campo in campos}
+
+
+def _errores(resource, fila: Dict[str, Any]) -> List[str]:
+    try:
+        resource(**{k: v for k, v in fila.items() if v is not None})
+    except ValidationError as exc:
+        return [f'{error["loc"][0]}: {error["msg"]}' for error in exc.errors()]
+    except TypeError:  # falta un campo requerido
+        return ['required']
+    return []
+
+
+def _compara(resource, filas, resultado) -> None:
+    mensajes = resultado.mensajes()
+    for i, fila in enumerate(filas):
+        errores = _errores(resource, fila)
+        assert resultado.mask[i] == bool(errores), fila
+        for mensaje in mensajes.get(i, []):
+            assert mensaje in errores or mensaje.endswith('field required')
+
+
+def test_valida_ordenes(client, orden_dict):
+    filas = [{**orden_dict, **cambios} for cambios in ORDENES]
+    resultado = valida_ordenes(_columnas(filas))
+    _compara(client.ordenes, filas, resultado)
+    assert resultado.validas[0]
+    assert resultado.validas[4]
+    assert resultado.errores(6) == [
+        ('cuentaBeneficiario', 'Asp Integra Opc has been blocked by STP.')
+    ]
+    assert resultado.errores(16) == [
+        ('institucionContraparte', '99999 no se corresponde a un banco')
+    ]
+    assert len(resultado.errores(25)) == 2
+
+
+def test_valida_cuentas(client, cuenta_dict):
+    cuenta_dict['fechaNacimiento'] = dt.date(1980, 4, 14)
+    filas = [{**cuenta_dict, **cambios} for cambios in CUENTAS]
+    filas[0]['paisNacimiento'] = Pais.MX.value
+    resultado = valida_cuentas(_columnas(filas))
+    _compara(client.cuentas, filas, resultado)
+
+
+def test_valida_columnas_numpy(orden_dict):
+    columnas = {
+        campo: np.array([valor] * 3) for campo, valor in orden_dict.items()
+    }
+    columnas['monto'] = np.array([1.0, 0.0, np.nan])
+    resultado = valida_ordenes(columnas)
+    assert resultado.mask.tolist() == [False, True, True]
+    assert resultado.mensajes() == {
+        1: ['monto: ensure this value is greater than 0'],
+        2: ['monto: field required'],
+    }
+
+
+class Tabla(Mapping):
+    """
+    Como pandas.DataFrame: values es un atributo, no un método
+    """
+
+    def __init__(self, columnas: Dict[str, List[Any]]):
+        self.columnas = columnas
+        self.values = np.array(list(columnas.values()), dtype=object).T
+
+    def __getitem__(self, campo: str) -> List[Any]:
+        return self.columnas[campo]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.columnas)
+
+    def __len__(self) -> int:
+        return len(self.columnas)
+
+
+def test_valida_tabla(orden_dict):
+    filas = [orden_dict, dict(orden_dict, referenciaNumerica='abc')]
+    resultado = valida_ordenes(Tabla(_columnas(filas)))
+    assert resultado.mensajes() == {
+        1: ['referenciaNumerica: value is not a valid integer']
+    }
+
+
+def test_valida_vacio():
+    assert valida_ordenes({}).mask.size == 0
+
+
+def test_columnas_distinto_tamano():
+    with pytest.raises(ValueError):
+        valida_ordenes(dict(monto=[1.0], conceptoPago=[]))
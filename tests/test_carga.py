@@ -0,0 +1,123 @@
+import json
+import threading
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+
+from stpmex import Client
+from stpmex.carga import CUENTA_ORDENANTE, Carga, Resultado, main, percentil
+from stpmex.simulador import Simulador, SimuladorServer
+
+from .conftest import PKEY
+
+
+@pytest.fixture
+def simulador(client):
+    yield Simulador(
+        client.pkey.public_key(), saldos={CUENTA_ORDENANTE: 1e6}, semilla=0
+    )
+
+
+@pytest.fixture
+def carga(simulador):
+    servidor = SimuladorServer(simulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    client = Client(
+        'TAMIZI',
+        PKEY,
+        '12345678',
+        base_url=servidor.base_url,
+        soap_url=servidor.soap_url,
+    )
+    yield Carga(client, semilla=0)
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_percentil():
+    valores = list(range(1, 101))
+    assert percentil(valores, 50) == 50
+    assert percentil(valores, 99) == 99
+    assert percentil(valores, 100) == 100
+    assert percentil([3.0], 95) == 3.0
+    assert percentil([], 50) == 0.0
+
+
+def test_lazo_cerrado(carga, simulador):
+    simulador.tasa_errores = 0.2
+    mezcla = dict(orden=4, cuenta=1, consulta=1, saldo=1)
+    resultado = carga.ejecuta(mezcla, concurrencia=4, total=40)
+    reporte = resultado.reporte()
+    assert reporte['total'] == 40
+    assert set(reporte['operaciones']) == set(mezcla)
+    assert reporte['errores']['NoServiceResponse'] > 0
+    assert reporte['exitosas'] == sum(
+        len(latencias) for latencias in resultado.latencias.values()
+    )
+    assert reporte['p50_ms'] <= reporte['p95_ms'] <= reporte['p99_ms']
+    assert 'NoServiceResponse' in str(resultado)
+
+
+def test_lazo_abierto(carga, simulador):
+    resultado = carga.ejecuta(concurrencia=2, tasa=200, total=10)
+    reporte = resultado.reporte()
+    assert reporte['exitosas'] == 10
+    assert reporte['duracion'] >= 9 / 200
+    assert len(simulador.ordenes) == 10
+
+
+def test_duracion(carga):
+    assert (
+        carga.ejecuta(concurrencia=1, tasa=10, duracion=0.15).reporte()[
+            'total'
+        ]
+        == 2
+    )
+    assert carga.ejecuta(concurrencia=2, duracion=0.05).reporte()['total']
+
+
+def test_parametros_invalidos(carga):
+    with pytest.raises(ValueError):
+        carga.ejecuta()
+    with pytest.raises(ValueError):
+        carga.ejecuta(dict(transferencia=1), total=1)
+
+
+def test_main(tmp_path, capsys):
+    llave = tmp_path / 'llave.pem'
+    llave.write_text(PKEY)
+    argv = ['--llave', str(llave), '--passphrase', '12345678', '--simulador']
+    resultado = main(argv + ['--total', '5', '--mezcla', 'orden=2,saldo'])
+    assert resultado.reporte()['exitosas'] == 5
+    assert 'llamadas en' in capsys.readouterr().out
+    main(argv + ['--total', '1', '--json'])
+    assert json.loads(capsys.readouterr().out)['total'] == 1
+    with pytest.raises(SystemExit):
+        main(argv)
+    # sin --base-url ni --simulador no se usa producción
+    with pytest.raises(SystemExit):
+        main(['--llave', str(llave), '--total', '1'])
+    assert '--base-url o --simulador' in capsys.readouterr().err
+
+
+def test_main_sin_passphrase(client, tmp_path, monkeypatch):
+    llave = tmp_path / 'llave.pem'
+    llave.write_bytes(
+        client.pkey.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    clientes = []
+
+    def ejecuta(self, *args):
+        clientes.append(self.client)
+        return Resultado()
+
+    monkeypatch.setattr(Carga, 'ejecuta', ejecuta)
+    main(['--llave', str(llave), '--base-url', 'http://x', '--total', '1'])
+    (cliente,) = clientes
+    assert cliente.base_url == 'http://x'
+    # los threads de la carga no comparten la Session
+    assert cliente.session_per_thread
@@ -1,4 +1,7 @@
+import threading
+
 import pytest
+from cryptography.hazmat.primitives import serialization
 from requests import HTTPError
 
 from stpmex.client import Client
@@ -21,6 +24,7 @@ from stpmex.exc import (
     SignatureValidationError,
     StpmexException,
 )
+from stpmex.resources import Orden
 
 PKEY = """Bag Attributes
     friendlyName: prueba
@@ -65,6 +69,18 @@ def test_incorrect_passphrase():
         Client('TAMIZI', PKEY, 'incorrect')
 
 
+def test_sin_passphrase():
+    with pytest.raises(InvalidPassphrase):
+        Client('TAMIZI', PKEY)
+    llave = Client('TAMIZI', PKEY, '12345678').pkey.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    client = Client('TAMIZI', llave.decode('utf-8'))
+    assert client.signer.sign('texto')
+
+
 @pytest.mark.parametrize(
     'client_mock,endpoint,expected_exc',
     [
@@ -191,3 +207,66 @@ def test_account_registration(client) -> None:
     response = client.put(CUENTA_ENDPOINT, dict(firma='{hola}'))
     assert response['id'] == 0
     assert response['descripcion'] == 'Cuenta en revisión.'
+
+
+def test_clients_do_not_share_resources(orden_dict):
+    client_a = Client('EMPRESA_A', PKEY, '12345678')
+    client_b = Client('EMPRESA_B', PKEY, '12345678', demo=True)
+    assert client_a.ordenes is not client_b.ordenes
+    assert issubclass(client_a.ordenes, Orden)
+
+    orden_a = client_a.ordenes(**orden_dict)
+    orden_b = client_b.ordenes(**orden_dict)
+    assert orden_a._client is client_a
+    assert orden_b._client is client_b
+    assert orden_a.to_dict()['empresa'] == 'EMPRESA_A'
+    assert orden_b.to_dict()['empresa'] == 'EMPRESA_B'
+    assert client_a.saldos.empresa == 'EMPRESA_A'
+    assert client_b.cuentas.empresa == 'EMPRESA_B'
+
+
+def test_connection_pool_options():
+    client = Client(
+        'TAMIZI',
+        PKEY,
+        '12345678',
+        pool_connections=2,
+        pool_maxsize=50,
+        pool_block=True,
+        keep_alive=False,
+    )
+    assert client.adapter._pool_connections == 2
+    assert client.adapter._pool_maxsize == 50
+    assert client.adapter._pool_block
+    assert client.session.get_adapter(client.base_url) is client.adapter
+    assert client.session.headers['Connection'] == 'close'
+
+
+def test_session_per_thread():
+    client = Client('TAMIZI', PKEY, '12345678', session_per_thread=True)
+    sessions = []
+    threads = [
+        threading.Thread(target=lambda: sessions.append(client.session))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.session is client.session
+    assert len({id(session) for session in sessions + [client.session]}) == 3
+    for session in sessions:
+        assert session.get_adapter(client.base_url) is client.adapter
+
+
+def test_connection_stats():
+    client = Client('TAMIZI', PKEY, '12345678')
+    assert client.connection_stats() == dict(
+        requests=0, new_connections=0, reused_connections=0
+    )
+    pool = client.adapter.poolmanager.connection_from_url(client.base_url)
+    pool.num_requests = 10
+    pool.num_connections = 3
+    assert client.connection_stats() == dict(
+        requests=10, new_connections=3, reused_connections=7
+    )
@@ -0,0 +1,59 @@
+import sys
+
+import pytest
+import requests_mock
+
+from stpmex import Client
+from stpmex.codec import JsonCodec, OrjsonCodec, default_codec
+from stpmex.types import TipoCuenta, TipoOperacion
+
+from .conftest import PKEY
+
+OBJ = dict(
+    estado=TipoOperacion.enviada,
+    tipoCuentaBeneficiario=TipoCuenta.clabe,
+    monto=1.2,
+    nombre='Ñandú',
+    lst=[1, None, True],
+)
+DECODED = dict(
+    estado='E',
+    tipoCuentaBeneficiario=40,
+    monto=1.2,
+    nombre='Ñandú',
+    lst=[1, None, True],
+)
+
+
+@pytest.mark.parametrize('codec', [JsonCodec(), OrjsonCodec()])
+def test_codec(codec: JsonCodec):
+    encoded = codec.dumps(OBJ)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == DECODED
+    assert codec.loads(encoded.decode('utf-8')) == DECODED
+
+
+def test_default_codec(monkeypatch):
+    assert isinstance(default_codec(), OrjsonCodec)
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    assert type(default_codec()) is JsonCodec
+
+
+class CountingCodec(JsonCodec):
+    def __init__(self):
+        self.loads_calls = 0
+
+    def loads(self, data):
+        self.loads_calls += 1
+        return super().loads(data)
+
+
+def test_response_decoded_once():
+    codec = CountingCodec()
+    client = Client('TAMIZI', PKEY, '12345678', codec=codec)
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        assert client.put('/ordenPago/registra', OBJ) == dict(id=1)
+        assert m.last_request.json() == DECODED
+        assert m.last_request.headers['Content-Type'] == 'application/json'
+    assert codec.loads_calls == 1
@@ -0,0 +1,52 @@
+import clabe
+import pytest
+from pydantic import ValidationError
+
+from stpmex import instituciones, types
+from stpmex.bulk import valida_ordenes
+from stpmex.instituciones import BLOCKED_INSTITUTIONS, Catalogo
+
+
+@pytest.fixture
+def recarga():
+    yield instituciones.recarga
+    clabe.remove_bank('90717')
+    instituciones.recarga()
+
+
+def test_catalogo():
+    catalogo = instituciones.catalogo()
+    assert catalogo.por_prefijo['072'] == '40072'
+    assert catalogo.nombres['40072'] == clabe.BANK_NAMES['40072']
+    assert '40072' in catalogo.codigos
+    assert catalogo.bloqueadas == BLOCKED_INSTITUTIONS
+    # no se ignoran cambios a la constante, se hacen con recarga
+    with pytest.raises(AttributeError):
+        types.BLOCKED_INSTITUTIONS.add('40072')  # type: ignore
+
+
+def test_recarga(client, orden_dict, recarga):
+    orden_dict['institucionContraparte'] = '90717'
+    with pytest.raises(ValidationError):
+        client.ordenes(**orden_dict)
+    anterior = instituciones.catalogo()
+
+    clabe.add_bank('90717', 'Nuevo Banco')
+    nuevo = recarga()
+    assert instituciones.catalogo() is nuevo
+    assert '90717' not in anterior.codigos  # sin cambios
+    assert client.ordenes(**orden_dict)
+
+    recarga(bloqueadas={'40072'})
+    orden_dict['institucionContraparte'] = '40072'
+    with pytest.raises(ValidationError) as exc_info:
+        client.ordenes(**orden_dict)
+    assert 'has been blocked by STP' in str(exc_info.value)
+    resultado = valida_ordenes({k: [v] for k, v in orden_dict.items()})
+    assert resultado.mask[0]
+
+
+def test_recarga_catalogo(recarga):
+    catalogo = Catalogo({'072': '40072'}, {'40072': 'BANORTE'}, [])
+    assert recarga(catalogo_nuevo=catalogo) is catalogo
+    assert instituciones.catalogo().codigos == {'40072'}
@@ -0,0 +1,218 @@
+from typing import List
+
+import pytest
+import requests_mock
+from pydantic import ValidationError
+
+from stpmex import AsyncClient
+from stpmex.exc import ClaveRastreoAlreadyInUse
+from stpmex.instrumentacion import (
+    Instrumentacion,
+    Medicion,
+    Observer,
+    OpenTelemetryObserver,
+    actual,
+    fase,
+)
+
+FASES_REGISTRA = [
+    'validacion',
+    'cadena',
+    'firma',
+    'serializacion',
+    'codificacion',
+    'red',
+    'decodificacion',
+]
+
+
+class Lista(Observer):
+    def __init__(self):
+        self.iniciadas: List[Medicion] = []
+        self.mediciones: List[Medicion] = []
+
+    def al_iniciar(self, medicion: Medicion) -> None:
+        self.iniciadas.append(medicion)
+
+    def al_terminar(self, medicion: Medicion) -> None:
+        self.mediciones.append(medicion)
+
+
+@pytest.fixture
+def lista(client):
+    lista = Lista()
+    client.instrumentacion.agrega(lista)
+    yield lista
+
+
+def test_registra_orden(client, lista, orden_dict):
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        client.ordenes.registra(**orden_dict)
+    (medicion,) = lista.mediciones
+    assert lista.iniciadas == [medicion]
+    assert medicion.operacion == 'ordenes.registra'
+    assert [i[0] for i in medicion.intervalos] == FASES_REGISTRA
+    assert sum(medicion.fases.values()) <= medicion.duracion
+    datos = medicion.to_dict()
+    assert datos['metodo'] == 'PUT'
+    assert datos['endpoint'] == '/ordenPago/registra'
+    assert datos['status'] == 200
+    assert datos['tamano_respuesta'] == len(b'{"resultado": {"id": 1}}')
+    assert datos['excepcion'] is None
+    assert actual() is None
+
+
+def test_excepcion(client, lista, orden_dict):
+    error = dict(
+        resultado=dict(
+            descripcionError='La clave de rastreo CR1 ya fue utilizada', id=-1
+        )
+    )
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=error)
+        with pytest.raises(ClaveRastreoAlreadyInUse):
+            client.ordenes.registra(**orden_dict)
+    (medicion,) = lista.mediciones
+    assert isinstance(medicion.excepcion, ClaveRastreoAlreadyInUse)
+    assert medicion.to_dict()['excepcion'] == 'ClaveRastreoAlreadyInUse'
+    assert 'decodificacion' in medicion.fases
+
+
+def test_operaciones(client, lista, cuenta_dict):
+    with requests_mock.mock() as m:
+        m.put(
+            requests_mock.ANY,
+            json=dict(descripcion='Cuenta en revisión.', id=0),
+        )
+        m.post(
+            requests_mock.ANY,
+            json=dict(resultado=dict(id=1, lst=[], saldos=[])),
+        )
+        client.cuentas.alta(**cuenta_dict)
+        client.ordenes.consulta_enviadas()
+        client.saldos.consulta_saldo_env_rec()
+    alta, consulta, saldos = lista.mediciones
+    assert alta.operacion == 'cuentas.alta'
+    assert 'firma' in alta.fases
+    assert consulta.operacion == 'ordenes.consulta_fecha'
+    assert 'conversion' in consulta.fases
+    assert saldos.operacion == saldos.endpoint == '/ordenPago/consSaldoEnvRec'
+
+
+def test_registra_lote(client, lista, orden_dict):
+    lote = [{**orden_dict, 'claveRastreo': f'CR{i}'} for i in range(3)]
+    lote[1]['monto'] = -1.0
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        resultados = dict(client.ordenes.registra_lote(lote, concurrency=2))
+    assert isinstance(resultados[1], ValidationError)
+    mediciones = sorted(lista.mediciones, key=lambda m: m.status or 0)
+    assert [m.operacion for m in mediciones] == ['ordenes.registra'] * 3
+    invalida, *registradas = mediciones
+    assert isinstance(invalida.excepcion, ValidationError)
+    for medicion in registradas:
+        assert [i[0] for i in medicion.intervalos] == FASES_REGISTRA
+
+
+def test_sin_observers(client, orden_dict):
+    assert client.instrumentacion.operacion('x').__enter__() is None
+    assert fase('firma').__enter__() is None
+    lista = Lista()
+    client.instrumentacion.agrega(lista)
+    client.instrumentacion.quita(lista)
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        client.ordenes.registra(**orden_dict)
+    assert lista.mediciones == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/ordenPago/registra': dict(resultado=dict(id=1)),
+            '/cuentaModule/fisica': dict(
+                descripcion='Cuenta en revisión.', id=0
+            ),
+            '/ordenPago/consOrdenesFech': dict(resultado=dict(id=1, lst=[])),
+        }
+    ],
+    indirect=True,
+)
+async def test_async_client(
+    async_client_mock: AsyncClient, orden_dict, cuenta_dict
+):
+    lista = Lista()
+    async_client_mock.instrumentacion.agrega(lista)
+    await async_client_mock.ordenes.registra(**orden_dict)
+    await async_client_mock.cuentas.alta(**cuenta_dict)
+    await async_client_mock.ordenes.consulta_enviadas()
+    registra, alta, consulta = lista.mediciones
+    assert [i[0] for i in registra.intervalos] == FASES_REGISTRA
+    assert alta.status == 200
+    assert consulta.operacion == 'ordenes.consulta_fecha'
+    async for _ in async_client_mock.ordenes.registra_lote([orden_dict]):
+        ...
+    lote = lista.mediciones[-1]
+    assert [i[0] for i in lote.intervalos] == FASES_REGISTRA
+
+
+class Span:
+    def __init__(self, nombre, start_time, attributes):
+        self.nombre = nombre
+        self.start_time = start_time
+        self.attributes = attributes
+        self.eventos = []
+        self.excepciones = []
+
+    def add_event(self, nombre, attributes, timestamp):
+        self.eventos.append((nombre, timestamp))
+
+    def record_exception(self, exc):
+        self.excepciones.append(exc)
+
+    def end(self, end_time):
+        self.end_time = end_time
+
+
+class Tracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, nombre, start_time, attributes):
+        span = Span(nombre, start_time, attributes)
+        self.spans.append(span)
+        return span
+
+
+def test_opentelemetry(client, orden_dict):
+    tracer = Tracer()
+    client.instrumentacion.agrega(OpenTelemetryObserver(tracer))
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        m.post(requests_mock.ANY, status_code=500)
+        client.ordenes.registra(**orden_dict)
+        with pytest.raises(Exception):
+            client.saldos.consulta_saldo_env_rec()
+    registra, saldos = tracer.spans
+    assert registra.nombre == 'stpmex.ordenes.registra'
+    assert registra.attributes['http.status_code'] == 200
+    assert registra.attributes['http.method'] == 'PUT'
+    assert 'stpmex.fase.firma' in registra.attributes
+    assert [e[0] for e in registra.eventos] == FASES_REGISTRA
+    assert registra.start_time <= registra.eventos[0][1] <= registra.end_time
+    assert saldos.attributes['error.type'] == 'HTTPError'
+    assert saldos.excepciones
+
+
+def test_instrumentacion_anidada():
+    lista = Lista()
+    instrumentacion = Instrumentacion([Observer(), lista])
+    with instrumentacion.operacion('externa') as medicion:
+        assert instrumentacion.operacion('interna').__enter__() is None
+        with fase('a'):
+            ...
+    assert lista.mediciones == [medicion]
+    assert medicion.to_dict()['metodo'] is None
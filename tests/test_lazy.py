@@ -0,0 +1,74 @@
+import subprocess
+import sys
+
+import pytest
+
+import stpmex
+from stpmex.client import Client
+
+from .conftest import PKEY
+
+CLIENT = f'Client("TAMIZI", {PKEY!r}, "12345678")'
+
+
+def modulos_cargados(codigo: str) -> set:
+    """
+    Módulos en sys.modules después de correr `codigo` en un proceso nuevo
+    """
+    proceso = subprocess.run(
+        [sys.executable, '-c', f'{codigo}\nimport sys; print(*sys.modules)'],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return set(proceso.stdout.split())
+
+
+def test_import_stpmex_es_ligero():
+    cargados = modulos_cargados('import stpmex')
+    for pesado in [
+        'clabe',
+        'cryptography',
+        'cuenca_validations',
+        'pydantic',
+        'requests',
+        'stpmex.client',
+        'stpmex.paises',
+    ]:
+        assert pesado not in cargados
+
+
+def test_recursos_se_importan_al_usarlos():
+    cargados = modulos_cargados(
+        f'import stpmex.exc\nfrom stpmex import Client\n{CLIENT}'
+    )
+    assert 'requests' in cargados
+    assert 'pydantic' not in cargados
+    assert 'stpmex.resources.ordenes' not in cargados
+    cargados = modulos_cargados(f'from stpmex import Client\n{CLIENT}.saldos')
+    assert 'stpmex.resources.saldos' in cargados
+    assert 'stpmex.resources.cuentas' not in cargados
+    assert 'stpmex.paises' not in cargados
+
+
+def test_lazy_attributes():
+    assert stpmex.Client is Client
+    assert 'Client' in dir(stpmex)
+    with pytest.raises(AttributeError):
+        stpmex.NoExiste
+    from stpmex.exc import BlockedInstitutionError
+    from stpmex.types import Pais
+
+    assert Pais.MX == 187
+    assert BlockedInstitutionError.code == 'clabe.bank_code'
+
+
+def test_lazy_resource(client):
+    from stpmex.resources import Saldo
+
+    assert Client.saldos is Saldo
+    saldos = client.saldos
+    assert issubclass(saldos, Saldo) and saldos._client is client
+    # otro thread lo ligó primero
+    assert vars(Client)['saldos'].__get__(client, Client) is saldos
+    assert client.recibidas_cache is client.recibidas_cache
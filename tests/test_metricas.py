@@ -0,0 +1,187 @@
+import pytest
+import requests_mock
+
+from stpmex import AsyncClient, Client
+from stpmex.exc import ClaveRastreoAlreadyInUse, NoOrdenesEncontradas
+from stpmex.instrumentacion import Medicion
+from stpmex.metricas import Histograma, Metricas
+
+from .conftest import PKEY
+
+CLAVE_EN_USO = dict(
+    resultado=dict(
+        descripcionError='La clave de rastreo CR1 ya fue utilizada', id=-1
+    )
+)
+
+
+@pytest.fixture
+def cliente():
+    yield Client('TAMIZI', PKEY, '12345678', demo=True, metricas=True)
+
+
+def test_sin_metricas(client):
+    assert client.metricas is None
+    assert client.instrumentacion.observers == []
+
+
+def test_metricas(cliente, orden_dict):
+    with requests_mock.mock() as m:
+        m.put(
+            requests_mock.ANY,
+            [dict(json=dict(resultado=dict(id=1))), dict(json=CLAVE_EN_USO)],
+        )
+        m.post(requests_mock.ANY, json=dict(resultado=dict(lst=[], id=1)))
+        cliente.ordenes.registra(**orden_dict)
+        with pytest.raises(ClaveRastreoAlreadyInUse):
+            cliente.ordenes.registra(**orden_dict)
+        cliente.ordenes.consulta_enviadas()
+        cliente.ordenes.consulta_enviadas()
+        for _ in range(2):
+            with pytest.raises(NoOrdenesEncontradas):
+                cliente.ordenes.consulta_clave_rastreo('CR1', 40072)
+    datos = cliente.metricas.to_dict()
+
+    peticiones = {
+        p['etiquetas']['endpoint']: p['valor']
+        for p in datos['stpmex_peticiones_total']
+    }
+    assert peticiones == {
+        '/ordenPago/registra': 2,
+        '/ordenPago/consOrdenesFech': 3,
+    }
+    (registra,) = [
+        s
+        for s in datos['stpmex_latencia_segundos']
+        if s['etiquetas']['operacion'] == 'ordenes.registra'
+    ]
+    assert registra['total'] == registra['buckets']['+Inf'] == 2
+    assert datos['stpmex_errores_total'] == [
+        dict(
+            etiquetas=dict(
+                operacion='ordenes.registra',
+                excepcion='ClaveRastreoAlreadyInUse',
+            ),
+            valor=1,
+        )
+    ]
+    # las consultas por fecha se firman una vez, luego salen del cache
+    assert datos['stpmex_firmas_total'] == [dict(etiquetas={}, valor=3)]
+    hits = {
+        h['etiquetas']['cache']: h['valor']
+        for h in datos['stpmex_cache_hits_total']
+    }
+    assert hits == dict(firmas=2, recibidas=1)
+    conexiones = {
+        c['etiquetas']['tipo']: c['valor']
+        for c in datos['stpmex_conexiones_total']
+    }
+    assert set(conexiones) == {'nuevas', 'reusadas'}
+
+
+def test_firmas_lotes(cliente, orden_dict, cuenta_dict):
+    lote = [{**orden_dict, 'claveRastreo': f'CR{i}'} for i in range(5)]
+    cuentas = [cliente.cuentas(**cuenta_dict) for _ in range(2)]
+    with requests_mock.mock() as m:
+        m.put(
+            cliente.base_url + '/ordenPago/registra',
+            json=dict(resultado=dict(id=1)),
+        )
+        m.put(
+            cliente.base_url + '/cuentaModule/fisicas',
+            json=[dict(descripcion='Cuenta en revisión.', id=0)] * 2,
+        )
+        cliente.ordenes.registra(**orden_dict)
+        list(cliente.ordenes.registra_lote(lote))
+        cliente.cuentas.alta_lote(cuentas)
+    cuentas[0].to_dict()
+    datos = cliente.metricas.to_dict()
+    assert datos['stpmex_peticiones_total'][0]['valor'] == 6
+    assert datos['stpmex_firmas_total'][0]['valor'] == 6 + 2 + 1
+
+    ordenes = [cliente.ordenes(**orden) for orden in lote]
+    with cliente.bulk_signer(max_workers=1) as signer:
+        signer.to_dicts(ordenes)
+        signer.sign_many(['a', 'b'])
+        signer.sign('c')
+    datos = cliente.metricas.to_dict()
+    assert datos['stpmex_firmas_total'][0]['valor'] == 9 + 5 + 2 + 1
+
+
+def test_prometheus(cliente, orden_dict):
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        cliente.ordenes.registra(**orden_dict)
+    texto = cliente.metricas.prometheus()
+    assert texto.endswith('\n')
+    lineas = texto.splitlines()
+    assert '# TYPE stpmex_latencia_segundos histogram' in lineas
+    assert '# TYPE stpmex_peticiones_total counter' in lineas
+    assert (
+        'stpmex_peticiones_total{endpoint="/ordenPago/registra",'
+        'metodo="PUT",status="200"} 1'
+    ) in lineas
+    assert (
+        'stpmex_latencia_segundos_bucket{operacion="ordenes.registra",'
+        'le="+Inf"} 1'
+    ) in lineas
+    assert (
+        'stpmex_latencia_segundos_count{operacion="ordenes.registra"} 1'
+        in (lineas)
+    )
+    assert 'stpmex_firmas_total 1' in lineas
+    assert 'stpmex_cache_hits_total{cache="firmas"} 0' in lineas
+
+    cliente.metricas.reinicia()
+    datos = cliente.metricas.to_dict()
+    assert datos['stpmex_peticiones_total'] == []
+    # los contadores del cliente también empiezan de cero
+    assert datos['stpmex_firmas_total'] == [dict(etiquetas={}, valor=0)]
+    assert {c['valor'] for c in datos['stpmex_cache_misses_total']} == {0}
+    assert {c['valor'] for c in datos['stpmex_conexiones_total']} == {0}
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        cliente.ordenes.registra(**orden_dict)
+    assert 'stpmex_firmas_total 1' in cliente.metricas.prometheus()
+
+
+def test_histograma():
+    histograma = Histograma('latencia', 'Latencia', ('op',), [1, 0.5])
+    for valor in (0.1, 0.5, 0.7, 3):
+        histograma.observa(('a"b\n\\',), valor)
+    (serie,) = histograma.to_dict()
+    assert serie['buckets'] == {'0.5': 2, '1': 3, '+Inf': 4}
+    assert serie['suma'] == pytest.approx(4.3)
+    assert histograma.lineas() == [
+        'latencia_bucket{op="a\\"b\\n\\\\",le="0.5"} 2',
+        'latencia_bucket{op="a\\"b\\n\\\\",le="1"} 3',
+        'latencia_bucket{op="a\\"b\\n\\\\",le="+Inf"} 4',
+        'latencia_sum{op="a\\"b\\n\\\\"} 4.3',
+        'latencia_count{op="a\\"b\\n\\\\"} 4',
+    ]
+
+
+def test_metricas_sin_cliente():
+    metricas = Metricas()
+    medicion = Medicion('validacion')
+    medicion.excepcion = ValueError()
+    metricas.al_terminar(medicion)
+    datos = metricas.to_dict()
+    assert 'stpmex_cache_hits_total' not in datos
+    assert datos['stpmex_peticiones_total'] == []
+    assert datos['stpmex_errores_total'][0]['valor'] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [{'/ordenPago/registra': dict(resultado=dict(id=1))}],
+    indirect=True,
+)
+async def test_async_client(async_client_mock: AsyncClient, orden_dict):
+    metricas = Metricas(async_client_mock)
+    async_client_mock.instrumentacion.agrega(metricas)
+    await async_client_mock.ordenes.registra(**orden_dict)
+    datos = metricas.to_dict()
+    assert datos['stpmex_peticiones_total'][0]['valor'] == 1
+    assert 'stpmex_conexiones_total' not in datos
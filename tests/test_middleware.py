@@ -0,0 +1,178 @@
+from typing import Any, Dict, List
+
+import pytest
+import requests_mock
+
+from stpmex import AsyncClient, Client
+from stpmex.exc import NoServiceResponse
+from stpmex.instrumentacion import Medicion, Observer
+from stpmex.middleware import Peticion, Siguiente
+
+from .conftest import PKEY
+from .test_async_client import SALDO_SOAP, SOAP_PATH
+
+SIN_RESPUESTA = dict(
+    resultado=dict(
+        descripcionError='No se recibió respuesta del servicio', id=0
+    )
+)
+CUENTA = '646180157000000004'
+
+
+class Reintentos:
+    def __init__(self, intentos: int = 2):
+        self.intentos = intentos
+
+    def __call__(self, peticion: Peticion, siguiente: Siguiente) -> Any:
+        for _ in range(self.intentos - 1):
+            try:
+                return siguiente(peticion)
+            except NoServiceResponse:
+                pass
+        return siguiente(peticion)
+
+
+class Cache:
+    def __init__(self):
+        self.respuestas: Dict[Any, Any] = {}
+
+    def __call__(self, peticion: Peticion, siguiente: Siguiente) -> Any:
+        try:
+            return self.respuestas[peticion.llave]
+        except KeyError:
+            respuesta = self.respuestas[peticion.llave] = siguiente(peticion)
+            return respuesta
+
+
+@pytest.fixture
+def llamadas():
+    yield []
+
+
+@pytest.fixture
+def cliente(llamadas: List[str]):
+    def registra(nombre):
+        def middleware(peticion, siguiente):
+            llamadas.append(f'{nombre}:{peticion.endpoint}')
+            return siguiente(peticion)
+
+        return middleware
+
+    yield Client(
+        'TAMIZI',
+        PKEY,
+        '12345678',
+        demo=True,
+        middlewares=[registra('externo'), registra('interno')],
+    )
+
+
+def test_orden_de_middlewares(cliente, llamadas, orden_dict):
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        cliente.ordenes.registra(**orden_dict)
+    assert llamadas == [
+        'externo:/ordenPago/registra',
+        'interno:/ordenPago/registra',
+    ]
+
+
+def test_cambia_peticion(client):
+    def header(peticion, siguiente):
+        peticion.headers['X-Prueba'] = '1'
+        return siguiente(peticion)
+
+    client.middlewares.append(header)
+    with requests_mock.mock() as m:
+        m.post(requests_mock.ANY, json=dict(resultado=dict(saldos=[])))
+        client.saldos.consulta_saldo_env_rec()
+    request = m.request_history[0]
+    assert request.headers['X-Prueba'] == '1'
+    assert request.headers['Content-Type'] == 'application/json'
+
+
+def test_reintentos(client):
+    client.middlewares.append(Reintentos())
+    with requests_mock.mock() as m:
+        m.post(
+            requests_mock.ANY,
+            [
+                dict(json=SIN_RESPUESTA),
+                dict(json=dict(resultado=dict(saldos=[]))),
+            ],
+        )
+        assert client.saldos.consulta_saldo_env_rec() == []
+    assert m.call_count == 2
+
+
+def test_cache(client):
+    client.middlewares.append(Cache())
+    with requests_mock.mock() as m:
+        m.post(client.soap_url, text=SALDO_SOAP)
+        assert client.saldos.consulta(CUENTA) == 10000.0
+        assert client.saldos.consulta(CUENTA) == 10000.0
+    assert m.call_count == 1
+
+
+def test_soap(cliente, llamadas):
+    peticiones: List[Peticion] = []
+
+    def guarda(peticion, siguiente):
+        peticiones.append(peticion)
+        return siguiente(peticion)
+
+    cliente.middlewares.append(guarda)
+    with requests_mock.mock() as m:
+        m.post(cliente.soap_url, text=SALDO_SOAP)
+        assert cliente.saldos.consulta(CUENTA) == 10000.0
+    assert llamadas == [
+        'externo:consultaSaldoCuenta',
+        'interno:consultaSaldoCuenta',
+    ]
+    (peticion,) = peticiones
+    assert peticion.soap
+    assert peticion.url == cliente.soap_url
+    assert f'<cuenta>{CUENTA}</cuenta>'.encode() in peticion.cuerpo
+    assert repr(peticion) == 'Peticion(POST consultaSaldoCuenta)'
+
+
+def test_soap_instrumentado(client):
+    mediciones: List[Medicion] = []
+
+    class Lista(Observer):
+        def al_terminar(self, medicion):
+            mediciones.append(medicion)
+
+    client.instrumentacion.agrega(Lista())
+    with requests_mock.mock() as m:
+        m.post(client.soap_url, text=SALDO_SOAP)
+        client.saldos.consulta(CUENTA)
+    (medicion,) = mediciones
+    assert medicion.operacion == 'saldos.consulta'
+    assert medicion.endpoint == 'consultaSaldoCuenta'
+    assert medicion.status == 200
+    assert list(medicion.fases) == ['firma', 'red', 'conversion']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'async_client_mock',
+    [
+        {
+            '/ordenPago/registra': dict(resultado=dict(id=1)),
+            SOAP_PATH: SALDO_SOAP,
+        }
+    ],
+    indirect=True,
+)
+async def test_async_client(async_client_mock: AsyncClient, orden_dict):
+    llamadas = []
+
+    async def registra(peticion, siguiente):
+        llamadas.append(peticion.endpoint)
+        return await siguiente(peticion)
+
+    async_client_mock.middlewares.append(registra)
+    await async_client_mock.ordenes.registra(**orden_dict)
+    assert await async_client_mock.saldos.consulta(CUENTA) == 10000.0
+    assert llamadas == ['/ordenPago/registra', 'consultaSaldoCuenta']
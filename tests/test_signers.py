@@ -0,0 +1,247 @@
+import asyncio
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests_mock
+from cryptography.hazmat.primitives import serialization
+
+from stpmex import Client
+from stpmex.auth import ORDEN_FIELDNAMES, compute_signature, join_fields
+from stpmex.exc import SignerError
+from stpmex.signers import (
+    BatchSigner,
+    BulkSigner,
+    RsaSigner,
+    Signer,
+    SignerServer,
+    SocketSigner,
+    _init_worker,
+    _sign_worker,
+)
+
+
+class FallaSigner(Signer):
+    fingerprint = 'falla'
+
+    def sign(self, text: str) -> str:
+        raise RuntimeError(text)
+
+
+@pytest.fixture
+def signer(client):
+    yield client.signer
+
+
+@pytest.fixture
+def signer_server(signer, tmp_path):
+    path = str(tmp_path / 'signer.sock')
+    server = SignerServer(signer, path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_rsa_signer(client, orden):
+    signer = client.signer
+    assert isinstance(signer, RsaSigner)
+    texto = join_fields(orden, ORDEN_FIELDNAMES)
+    assert signer.sign(texto) == compute_signature(client.pkey, texto)
+    assert orden.firma == signer.sign(texto)
+    assert signer.sign_many(['a', 'b']) == [signer.sign(t) for t in 'ab']
+
+
+@pytest.mark.asyncio
+async def test_sign_async(signer):
+    assert await signer.sign_async('a') == signer.sign('a')
+
+
+def test_client_requires_key_or_signer():
+    with pytest.raises(ValueError):
+        Client('TAMIZI')
+
+
+def test_client_with_signer(signer, orden_dict):
+    client = Client('TAMIZI', signer=SocketSigner('/no/existe'), demo=True)
+    assert client.pkey is None
+    with pytest.raises(ValueError):
+        client.bulk_signer()
+    client.signer = signer
+    with requests_mock.mock() as m:
+        m.put(requests_mock.ANY, json=dict(resultado=dict(id=1)))
+        orden = client.ordenes.registra(**orden_dict)
+    assert m.last_request.json()['firma'] == orden.firma
+
+
+def test_bulk_signer(client, orden_dict):
+    ordenes = [
+        client.ordenes(**{**orden_dict, 'claveRastreo': f'CR{i}'})
+        for i in range(10)
+    ]
+    texts = [join_fields(orden, ORDEN_FIELDNAMES) for orden in ordenes]
+    with client.bulk_signer(max_workers=2) as signer:
+        assert isinstance(signer, BulkSigner)
+        assert signer.fingerprint == client.signer.fingerprint
+        signer.chunksize = 3
+        firmas = signer.sign_many(texts)
+        datos = signer.to_dicts(ordenes)
+        assert signer.sign(texts[0]) == firmas[0]
+        assert asyncio.run(signer.sign_async(texts[1])) == firmas[1]
+    assert firmas == [compute_signature(client.pkey, t) for t in texts]
+    assert datos == [orden.to_dict() for orden in ordenes]
+
+
+def test_sign_worker(client):
+    # corre en los procesos del pool, donde no lo ve coverage
+    der = client.pkey.private_bytes(
+        serialization.Encoding.DER,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    _init_worker(der)
+    assert _sign_worker('a') == compute_signature(client.pkey, 'a')
+
+
+def test_batch_signer(signer):
+    lotes = []
+
+    class Contador(RsaSigner):
+        def sign_many(self, texts):
+            texts = list(texts)
+            lotes.append(len(texts))
+            return super().sign_many(texts)
+
+    texts = [str(i) for i in range(50)]
+    with BatchSigner(Contador(signer.pkey), max_batch=8) as batch:
+        assert batch.fingerprint == signer.fingerprint
+        with ThreadPoolExecutor(10) as pool:
+            firmas = list(pool.map(batch.sign, texts))
+        assert batch.sign_many(['a']) == [signer.sign('a')]
+    assert firmas == [signer.sign(t) for t in texts]
+    assert max(lotes) <= 8
+    assert sum(lotes) == len(texts) + 1
+
+
+@pytest.mark.asyncio
+async def test_batch_signer_async(signer):
+    batch = BatchSigner(signer, max_batch=4, max_delay=0.05)
+    firmas = await asyncio.gather(*[batch.sign_async(t) for t in 'abcdef'])
+    batch.close()
+    assert firmas == [signer.sign(t) for t in 'abcdef']
+
+
+def test_batch_signer_close_with_pending(signer):
+    batch = BatchSigner(signer, max_delay=1.0)
+    future = batch._submit('a')
+    batch.close()
+    assert future.result() == signer.sign('a')
+
+
+def test_batch_signer_cerrado(signer):
+    batch = BatchSigner(signer)
+    batch.close()
+    batch.close()
+    with pytest.raises(SignerError):
+        batch.sign('a')
+    with pytest.raises(SignerError):
+        asyncio.run(batch.sign_async('a'))
+
+
+def test_batch_signer_falla_pendientes(signer):
+    firmando = threading.Event()
+    continua = threading.Event()
+
+    class Termina(RsaSigner):
+        def sign_many(self, texts):
+            firmando.set()
+            continua.wait(5)
+            raise SystemExit  # termina el thread del BatchSigner
+
+    batch = BatchSigner(Termina(signer.pkey), max_batch=1)
+    primera = batch._submit('a')
+    firmando.wait(5)
+    segunda = batch._submit('b')  # queda en la cola
+    continua.set()
+    batch._thread.join(5)
+    assert not batch._thread.is_alive()
+    with pytest.raises(SystemExit):
+        primera.result(timeout=5)
+    with pytest.raises(SignerError):
+        segunda.result(timeout=5)
+    with pytest.raises(SignerError):
+        batch.sign('c')
+
+
+def test_batch_signer_error():
+    with BatchSigner(FallaSigner()) as batch:
+        with pytest.raises(RuntimeError):
+            batch.sign('a')
+
+
+def test_socket_signer(signer, signer_server):
+    assert oct(os.stat(signer_server.server_address).st_mode & 0o777) == (
+        '0o600'
+    )
+    with SocketSigner(signer_server.server_address) as remoto:
+        assert remoto.fingerprint == signer.fingerprint
+        assert remoto.sign('a') == signer.sign('a')
+        assert remoto.sign_many(['b', 'c']) == signer.sign_many(['b', 'c'])
+        # el servidor cierra la conexión y el cliente se reconecta
+        remoto._sock.shutdown(socket.SHUT_RDWR)
+        assert remoto.sign('d') == signer.sign('d')
+        # o la cierra sin responder
+        remoto.close()
+        remoto._sock, servidor = socket.socketpair()
+        remoto._file = remoto._sock.makefile('rwb')
+        servidor.shutdown(socket.SHUT_WR)
+        assert remoto.sign('e') == signer.sign('e')
+        servidor.close()
+
+
+def test_socket_signer_client(signer, signer_server, orden_dict):
+    remoto = SocketSigner(signer_server.server_address)
+    client = Client('TAMIZI', signer=remoto, demo=True)
+    with requests_mock.mock() as m:
+        m.post(requests_mock.ANY, json=dict(resultado=dict(id=1, lst=[])))
+        client.ordenes.consulta_enviadas()
+    assert m.last_request.json()['firma']
+    remoto.close()
+
+
+def test_socket_signer_error(tmp_path):
+    path = str(tmp_path / 'signer.sock')
+    server = SignerServer(FallaSigner(), path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with SocketSigner(path) as remoto:
+        with pytest.raises(SignerError) as exc_info:
+            remoto.sign('a')
+    assert 'RuntimeError' in exc_info.value.error
+    server.shutdown()
+    server.server_close()
+    assert not os.path.exists(path)
+    # reemplaza un socket que quedó de otro proceso
+    open(path, 'w').close()
+    SignerServer(FallaSigner(), path).server_close()
+
+
+def test_signer_server_activo(signer, signer_server):
+    path = signer_server.server_address
+    with pytest.raises(SignerError):
+        SignerServer(signer, path)
+    # el servidor activo sigue firmando
+    with SocketSigner(path) as remoto:
+        assert remoto.sign('a') == signer.sign('a')
+
+
+def test_signer_server_bind_error(signer, tmp_path):
+    with pytest.raises(OSError):
+        SignerServer(signer, str(tmp_path / 'no' / 'signer.sock'))
+
+
+def test_socket_signer_connection_error(tmp_path):
+    with pytest.raises(OSError):
+        SocketSigner(str(tmp_path / 'no.sock')).sign('a')
@@ -0,0 +1,200 @@
+import datetime as dt
+import threading
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from requests import HTTPError
+
+from stpmex import Client
+from stpmex.exc import (
+    ClaveRastreoAlreadyInUse,
+    DuplicatedAccount,
+    NoOrdenesEncontradas,
+    NoServiceResponse,
+    SignatureValidationError,
+    StpmexException,
+)
+from stpmex.signers import RsaSigner
+from stpmex.simulador import (
+    REST_PATH,
+    Simulador,
+    SimuladorServer,
+    crea_servidor,
+)
+
+from .conftest import PKEY
+
+CUENTA_ORDENANTE = '646180110400000007'
+
+
+@pytest.fixture
+def simulador(client):
+    yield Simulador(
+        client.pkey.public_key(), saldos={CUENTA_ORDENANTE: 100.0}, semilla=0
+    )
+
+
+@pytest.fixture
+def servidor(simulador):
+    servidor = SimuladorServer(simulador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def cliente(servidor):
+    yield Client(
+        'TAMIZI',
+        PKEY,
+        '12345678',
+        base_url=servidor.base_url,
+        soap_url=servidor.soap_url,
+    )
+
+
+def test_ordenes(cliente, simulador, orden_dict):
+    orden = cliente.ordenes.registra(**orden_dict)
+    assert orden.id == 1
+    with pytest.raises(ClaveRastreoAlreadyInUse):
+        cliente.ordenes.registra(**orden_dict)
+    assert simulador.saldos[CUENTA_ORDENANTE] == pytest.approx(98.8)
+
+    enviadas = cliente.ordenes.consulta_enviadas()
+    assert [o.claveRastreo for o in enviadas] == [orden.claveRastreo]
+    assert enviadas[0].fechaOperacion == dt.date.today()
+    assert cliente.ordenes.consulta_enviadas(dt.date(2020, 1, 1)) == []
+    consultada = cliente.ordenes.consulta_clave_rastreo(
+        orden.claveRastreo, 90646, dt.date.today()
+    )
+    assert consultada.monto == 1.2
+    with pytest.raises(NoOrdenesEncontradas):
+        cliente.ordenes.consulta_clave_rastreo('NOEXISTE', 90646)
+
+    assert cliente.ordenes.consulta_recibidas() == []
+    recibida = dict(simulador.ordenes[orden.claveRastreo], claveRastreo='R1')
+    simulador.recibidas.append(recibida)
+    assert len(cliente.ordenes.consulta_recibidas()) == 1
+
+    saldos = cliente.saldos.consulta_saldo_env_rec()
+    assert [s.totalOperaciones for s in saldos] == [1, 1]
+    assert cliente.saldos.consulta(CUENTA_ORDENANTE) == 98.8
+
+
+def test_orden_sin_clave_rastreo(simulador):
+    simulador.llave_publica = None
+    status, _, cuerpo = simulador.responde(
+        'PUT', REST_PATH + '/ordenPago/registra', b'{"monto": 1.0}'
+    )
+    assert status == 200 and b'es obligatorio' in cuerpo
+
+
+def test_saldo_cuenta_no_encontrada(cliente):
+    with pytest.raises(HTTPError) as exc_info:
+        cliente.saldos.consulta('646180157000000004')
+    assert exc_info.value.response.status_code == 500
+
+
+def test_cuentas(cliente, cuenta_dict):
+    cuenta = cliente.cuentas.alta(**cuenta_dict)
+    with pytest.raises(DuplicatedAccount):
+        cliente.cuentas.alta(**cuenta_dict)
+    assert cuenta.baja()['id'] == 0
+    with pytest.raises(StpmexException):
+        cuenta.baja()
+    resultado = cliente.cuentas.alta_lote([cuenta])
+    assert resultado == {
+        cuenta.cuenta: dict(descripcion='Cuenta en revisión.', id=0)
+    }
+
+
+def test_firma_invalida(servidor, simulador, orden_dict, cuenta_dict):
+    otra = rsa.generate_private_key(public_exponent=65537, key_size=1024)
+    cliente = Client(
+        'TAMIZI',
+        signer=RsaSigner(otra),
+        base_url=servidor.base_url,
+        soap_url=servidor.soap_url,
+    )
+    with pytest.raises(SignatureValidationError):
+        cliente.ordenes.registra(**orden_dict)
+    with pytest.raises(SignatureValidationError):
+        cliente.ordenes.consulta_enviadas()
+    with pytest.raises(SignatureValidationError):
+        cliente.ordenes.consulta_clave_rastreo('CR1', 90646)
+    with pytest.raises(SignatureValidationError):
+        cliente.saldos.consulta_saldo_env_rec()
+    with pytest.raises(StpmexException):
+        cliente.cuentas.alta(**cuenta_dict)
+    with pytest.raises(StpmexException):
+        cliente.cuentas(**cuenta_dict).baja()
+    with pytest.raises(HTTPError):
+        cliente.saldos.consulta(CUENTA_ORDENANTE)
+    simulador.responde(
+        'POST', REST_PATH + '/ordenPago/consSaldoEnvRec', b'{"firma": "no"}'
+    )
+    assert simulador.contadores['firmas_invalidas'] == 8
+
+
+def test_errores_inyectados(cliente, simulador):
+    simulador.tasa_errores = 1.0
+    with pytest.raises(NoServiceResponse):
+        cliente.ordenes.consulta_enviadas()
+    with pytest.raises(HTTPError):
+        cliente.saldos.consulta(CUENTA_ORDENANTE)
+    simulador.codigo_error = 503
+    with pytest.raises(HTTPError) as exc_info:
+        cliente.ordenes.consulta_enviadas()
+    assert exc_info.value.response.status_code == 503
+    assert simulador.contadores['errores_inyectados'] == 3
+
+
+def test_throttling(cliente, simulador):
+    simulador.max_por_segundo = 1
+    simulador._tokens = 1
+    cliente.ordenes.consulta_enviadas()
+    with pytest.raises(HTTPError) as exc_info:
+        cliente.ordenes.consulta_enviadas()
+    response = exc_info.value.response
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+    assert simulador.contadores['limitadas'] == 1
+
+
+def test_latencia(cliente, simulador):
+    simulador.latencia = 0.05
+    simulador.variacion = 0.01
+    inicio = time.monotonic()
+    cliente.ordenes.consulta_enviadas()
+    assert time.monotonic() - inicio >= 0.05
+
+
+def test_rutas_invalidas(simulador):
+    assert simulador.responde('GET', '/otra', b'')[0] == 404
+    ruta = REST_PATH + '/ordenPago/registra'
+    assert simulador.responde('PUT', ruta, b'{')[0] == 400
+
+
+def test_crea_servidor(client, tmp_path):
+    llave = tmp_path / 'llave.pub'
+    llave.write_bytes(
+        client.pkey.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+    argv = ['--port', '0', '--llave-publica', str(llave)]
+    argv += ['--saldo', f'{CUENTA_ORDENANTE}=10.5', '--tasa-errores', '0.1']
+    servidor = crea_servidor(argv)
+    simulador = servidor.simulador
+    assert simulador.saldos == {CUENTA_ORDENANTE: 10.5}
+    assert simulador.tasa_errores == 0.1
+    assert simulador.llave_publica is not None
+    assert servidor.base_url.startswith('http://127.0.0.1:')
+    servidor.server_close()
+    servidor = crea_servidor(['--port', '0'])
+    assert servidor.simulador.llave_publica is None
+    servidor.server_close()
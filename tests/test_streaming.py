@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from stpmex.streaming import JsonArrayStream
+
+LST = [
+    dict(claveRastreo='CR1', conceptoPago='[lst]: "x"', monto=1.2),
+    {},
+    dict(claveRastreo='CR2', nombreBeneficiario='Ñandú', monto=10),
+]
+DOCUMENTO = json.dumps(
+    dict(resultado=dict(id=1, lst=LST)), ensure_ascii=False
+).encode('utf-8')
+
+
+def _parse(documento: bytes, chunk_size: int, key: str = 'lst'):
+    arreglo = JsonArrayStream(key)
+    elementos = []
+    for inicio in range(0, len(documento), chunk_size):
+        fin = inicio + chunk_size
+        elementos.extend(arreglo.feed(documento[inicio:fin]))
+    return elementos, arreglo.close()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, len(DOCUMENTO)])
+def test_json_array_stream(chunk_size: int):
+    assert _parse(DOCUMENTO, chunk_size) == (LST, None)
+
+
+def test_json_array_stream_numeros():
+    documento = b'{"lst": [1, 23, 456], "id": 1}'
+    assert _parse(documento, 1) == ([1, 23, 456], None)
+
+
+def test_json_array_stream_sin_arreglo():
+    documento = json.dumps(
+        dict(resultado=dict(id=-100, descripcionError='No se encontraron'))
+    ).encode()
+    elementos, resto = _parse(documento, 3)
+    assert elementos == []
+    assert resto == json.loads(documento)
+
+
+def test_json_array_stream_incompleto():
+    with pytest.raises(json.JSONDecodeError):
+        _parse(DOCUMENTO[:-10], 5)
@@ -1,6 +1,15 @@
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 
-from stpmex.utils import strftime, strptime
+import pytest
+
+from stpmex.utils import (
+    MAX_CLAVE_RASTREO,
+    ClaveRastreoGenerator,
+    base36,
+    strftime,
+    strptime,
+)
 
 
 def test_strftime():
@@ -9,3 +18,26 @@ def test_strftime():
 
 def test_strptime():
     assert strptime('20200420') == dt.date(2020, 4, 20)
+
+
+def test_base36():
+    assert base36(0, 3) == '000'
+    assert base36(36 ** 2 + 35, 3) == '10Z'
+    assert base36(36 ** 3, 3) == '000'  # se trunca al ancho
+
+
+def test_clave_rastreo_generator():
+    generador = ClaveRastreoGenerator()
+    with ThreadPoolExecutor(8) as executor:
+        claves = list(executor.map(lambda _: generador(), range(10_000)))
+    assert len(set(claves)) == len(claves)
+    for clave in claves:
+        assert clave.startswith('CR')
+        assert clave.isalnum()
+        assert len(clave) <= MAX_CLAVE_RASTREO
+
+
+def test_clave_rastreo_generator_prefijo():
+    assert ClaveRastreoGenerator('PAGO')().startswith('PAGO')
+    with pytest.raises(ValueError):
+        ClaveRastreoGenerator('X' * 10)
@@ -2,7 +2,8 @@ import clabe
 import pytest
 from pydantic import ValidationError
 
-from stpmex.resources import Orden
+from stpmex.resources import CuentaFisica, Orden
+from stpmex.types import _normalize, _stp_format, unicode_to_ascii
 
 ORDEN_KWARGS = dict(
     institucionContraparte='40072',
@@ -112,6 +113,14 @@ def test_defaults():
     orden = Orden(**orden_kwargs)
     assert orden.claveRastreo
     assert orden.referenciaNumerica
+    assert Orden(**orden_kwargs).claveRastreo != orden.claveRastreo
+
+
+def test_generador_clave_rastreo(client):
+    client.ordenes.generador_clave_rastreo = lambda: 'CR123'
+    orden_kwargs = {**ORDEN_KWARGS, 'claveRastreo': None}
+    assert client.ordenes(**orden_kwargs).claveRastreo == 'CR123'
+    assert Orden(**orden_kwargs).claveRastreo != 'CR123'
 
 
 def test_zero_referencia_numerica():
@@ -157,3 +166,20 @@ def test_invalid_card_number_cuenta_beneficiario():
     error = errors[2]
     assert error['loc'] == ('cuentaBeneficiario',)
     assert error['type'] == 'value_error.any_str.max_length'
+
+
+def test_unicode_to_ascii_cache():
+    texto = 'Ñandú'
+    assert unicode_to_ascii('Pago') == 'Pago'
+    assert unicode_to_ascii(texto) == 'Nandu'
+    hits = _normalize.cache_info().hits
+    assert unicode_to_ascii(texto) == 'Nandu'
+    assert _normalize.cache_info().hits == hits + 1
+
+
+def test_stp_str_cache(cuenta_dict):
+    cuenta_dict['nombre'] = 'josé-maría'
+    assert CuentaFisica(**cuenta_dict).nombre == 'JOSE MARIA'
+    hits = _stp_format.cache_info().hits
+    assert CuentaFisica(**cuenta_dict).nombre == 'JOSE MARIA'
+    assert _stp_format.cache_info().hits > hits